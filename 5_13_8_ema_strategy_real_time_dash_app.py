@@ -1,14 +1,38 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import plotly.graph_objs as go
 from datetime import datetime, timedelta
-from dash import Dash, dcc, html
+from dash import Dash, Patch, dcc, html, no_update
 from dash.dependencies import Input, Output, State
-import socket
 import os
 import traceback
 
+from figures import price_figure
+from health import default_monitor, register_health_routes
+from indicators import EMAState
+from intraday import IntradayFeed, is_intraday
+from price_store import default_store
+from signals import crossover_indices, crossover_masks, signal_points
+
+# EMA spans shown on the chart
+SPANS = (5, 8, 13)
+
+# How often the chart polls for new bars
+LIVE_INTERVAL_MS = int(os.environ.get("LIVE_INTERVAL_MS", 60_000))
+
+# Data-provider reachability, probed in the background
+health = default_monitor()
+
+# Local OHLCV store; only bars missing from disk are downloaded, and nothing
+# is fetched while the provider is down
+store = default_store(health=health)
+
+# Recent 1m/5m bars per ticker in fixed-size ring buffers, for intraday mode
+feed = IntradayFeed(provider=store.provider, health=health)
+
+# Bar intervals offered in the UI
+INTERVAL_OPTIONS = [{'label': 'Daily', 'value': '1d'}, {'label': '5 min', 'value': '5m'}, {'label': '1 min', 'value': '1m'}]
+
 # Initialize the Dash app
 app = Dash(__name__)
 
@@ -16,56 +40,86 @@ app = Dash(__name__)
 app.layout = html.Div([
     html.H1("Stock Prices with 5, 13, and 8-day EMAs and Buy/Sell Signals"),
     dcc.Input(id='ticker-input', type='text', value='SOL-USD', style={'marginRight': '10px'}),
+    dcc.Dropdown(id='interval-input', options=INTERVAL_OPTIONS, value='1d', clearable=False,
+                 style={'width': '150px', 'display': 'inline-block', 'verticalAlign': 'middle', 'marginRight': '10px'}),
     html.Button(id='submit-button', n_clicks=0, children='Submit'),
     dcc.Graph(id='price-graph'),
     html.Div(id='current-price', style={'marginTop': '20px'}),
+    dcc.Store(id='live-state'),
+    dcc.Interval(id='live-interval', interval=LIVE_INTERVAL_MS),
 ])
 
-# Test internet connection
-def test_internet():
-    try:
-        socket.create_connection(("www.google.com", 80), timeout=5)
-        print("Internet connection: OK")
-        return True
-    except OSError:
-        print("Internet connection: FAILED")
-        return False
+# Trace order in the figure; the live callback extends traces by position
+CLOSE_TRACE, EMA_5_TRACE, EMA_13_TRACE, EMA_8_TRACE, BUY_TRACE, SELL_TRACE = range(6)
+
+
+# Plotly would encode numpy arrays as binary blobs, which cannot be extended
+# in place, so the streamed traces are built from plain lists
+def _dates(index):
+    return [ts.isoformat() for ts in index]
+
+
+def _live_state(ticker, data, state):
+    return {
+        'ticker': ticker,
+        'last': data.index[-1].isoformat(),
+        'ema': state.values([ticker])[0].tolist(),
+        'count': state.count(ticker),
+    }
+
+
+# Intraday chart, read from the ticker's ring buffer. The window has a fixed
+# number of bars and its newest bar may be revised, so each update redraws
+# the whole (small) figure instead of patching it.
+def intraday_chart(ticker, interval):
+    series = feed.series(ticker, interval)
+    if series.empty:
+        return go.Figure(), f"No {interval} bars available for the selected ticker.", None
+    fig = price_figure(series, ticker, signals=crossover_indices(series['EMA_5'], series['EMA_13']))
+    fig.update_layout(title=f"{ticker} {interval} Prices with 5, 13, and 8-bar EMAs and Buy/Sell Signals",
+                      xaxis_title="Time")
+    message = f"Current Price: {float(series['Close'][-1]):.2f}"
+    if not health.is_up():
+        message += " (data provider unreachable, showing buffered prices)"
+    live = {'ticker': ticker, 'interval': interval, 'last': series.last_date().isoformat()}
+    return fig, message, live
+
 
 # Callback to update the graph
 @app.callback(
     [Output('price-graph', 'figure'),
-     Output('current-price', 'children')],
+     Output('current-price', 'children'),
+     Output('live-state', 'data')],
     [Input('submit-button', 'n_clicks')],
-    [State('ticker-input', 'value')]
+    [State('ticker-input', 'value'),
+     State('interval-input', 'value')]
 )
+def update_graph(n_clicks, ticker, interval='1d'):
+    ticker = ticker.upper()
+
+    if is_intraday(interval):
+        print(f"Fetching {interval} bars for {ticker}...")
+        feed.poll(ticker, interval)
+        return intraday_chart(ticker, interval)
 
-def update_graph(n, n_clicks, ticker):
     # Calculate date range
     end_date = datetime.now().date()
     start_date = end_date - timedelta(days=60)
     
     # Fetch data
     print(f"Fetching data for {ticker}...")
-    data = yf.download(ticker, start=start_date, end=end_date, interval='1d')
+    data = store.get(ticker, start_date, end_date, interval='1d')
     
-    if data.empty or 'Close' not in data.columns:
-        print("No data retrieved or 'Close' column missing.")
-        return go.Figure(), "No valid data available for the selected ticker."
-    
-    # Drop NaNs
-    data = data.dropna(subset=['Close'])
     if data.empty:
-        print("No valid data remaining after dropping NaN values.")
-        return go.Figure(), "No valid data available for the selected ticker."
-
-    # Validate index
-    if not isinstance(data.index, pd.DatetimeIndex):
-        data.index = pd.to_datetime(data.index)
+        print("No valid data retrieved.")
+        return go.Figure(), "No valid data available for the selected ticker.", None
 
-    # Compute EMAs
-    data['EMA_5'] = data['Close'].ewm(span=5, adjust=False).mean()
-    data['EMA_13'] = data['Close'].ewm(span=13, adjust=False).mean()
-    data['EMA_8'] = data['Close'].ewm(span=8, adjust=False).mean()
+    # Compute EMAs with the same state the live updates continue from
+    state = EMAState(SPANS)
+    emas = state.update_batch(ticker, data['Close'].to_numpy())
+    data['EMA_5'] = emas[:, SPANS.index(5)]
+    data['EMA_8'] = emas[:, SPANS.index(8)]
+    data['EMA_13'] = emas[:, SPANS.index(13)]
     
     # Debug prints
     print("Close prices:")
@@ -74,21 +128,21 @@ def update_graph(n, n_clicks, ticker):
     print(data['EMA_5'].tail())
     
     # Create figure
+    dates = _dates(data.index)
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=data.index, y=data['Close'], mode='lines', name='Close'))
-    fig.add_trace(go.Scatter(x=data.index, y=data['EMA_5'], mode='lines', name='EMA 5'))
-    fig.add_trace(go.Scatter(x=data.index, y=data['EMA_13'], mode='lines', name='EMA 13'))
-    fig.add_trace(go.Scatter(x=data.index, y=data['EMA_8'], mode='lines', name='EMA 8'))
+    fig.add_trace(go.Scatter(x=dates, y=data['Close'].tolist(), mode='lines', name='Close'))
+    fig.add_trace(go.Scatter(x=dates, y=data['EMA_5'].tolist(), mode='lines', name='EMA 5'))
+    fig.add_trace(go.Scatter(x=dates, y=data['EMA_13'].tolist(), mode='lines', name='EMA 13'))
+    fig.add_trace(go.Scatter(x=dates, y=data['EMA_8'].tolist(), mode='lines', name='EMA 8'))
     
-    # Add buy/sell signals (dummy example for now)
-    buy_signals = [(data.index[-5], data['Close'].iloc[-5])]
-    sell_signals = [(data.index[-3], data['Close'].iloc[-3])]
-    for signal in buy_signals:
-        fig.add_trace(go.Scatter(x=[signal[0]], y=[signal[1]], mode='markers', name='Buy Signal',
-                                 marker=dict(symbol='triangle-up', size=10, color='green')))
-    for signal in sell_signals:
-        fig.add_trace(go.Scatter(x=[signal[0]], y=[signal[1]], mode='markers', name='Sell Signal',
-                                 marker=dict(symbol='triangle-down', size=10, color='red')))
+    # Add buy/sell signals from 5/13 EMA crossovers
+    buy_signals, sell_signals = signal_points(data, 'EMA_5', 'EMA_13')
+    fig.add_trace(go.Scatter(x=[signal[0].isoformat() for signal in buy_signals], y=[float(signal[1]) for signal in buy_signals],
+                             mode='markers', name='Buy Signal',
+                             marker=dict(symbol='triangle-up', size=10, color='green')))
+    fig.add_trace(go.Scatter(x=[signal[0].isoformat() for signal in sell_signals], y=[float(signal[1]) for signal in sell_signals],
+                             mode='markers', name='Sell Signal',
+                             marker=dict(symbol='triangle-down', size=10, color='red')))
     
     # Update layout
     fig.update_layout(
@@ -99,10 +153,74 @@ def update_graph(n, n_clicks, ticker):
     
     # Current price
     current_price = float(data['Close'].iloc[-1])
-    return fig, f"Current Price: {current_price:.2f}"
+    message = f"Current Price: {current_price:.2f}"
+    if not health.is_up():
+        message += " (data provider unreachable, showing stored prices)"
+    return fig, message, _live_state(ticker, data, state)
+
+
+# Live updates: on each interval tick append only bars newer than the last one
+# shown. The figure is changed with a Patch, so only the new points are sent
+# to the browser, and the EMAs continue from the state kept in live-state.
+@app.callback(
+    [Output('price-graph', 'figure', allow_duplicate=True),
+     Output('current-price', 'children', allow_duplicate=True),
+     Output('live-state', 'data', allow_duplicate=True)],
+    [Input('live-interval', 'n_intervals')],
+    [State('live-state', 'data')],
+    prevent_initial_call=True
+)
+def stream_bars(n_intervals, live):
+    if not live:
+        return no_update, no_update, no_update
+    ticker = live['ticker']
+    if is_intraday(live.get('interval', '1d')):
+        if not feed.poll(ticker, live['interval']):
+            return no_update, no_update, no_update
+        return intraday_chart(ticker, live['interval'])
+    last = pd.Timestamp(live['last'])
+
+    end_date = datetime.now().date()
+    data = store.get(ticker, last.date(), end_date, interval='1d')
+    data = data[data.index > last]
+    if data.empty:
+        return no_update, no_update, no_update
+    print(f"Appending {len(data)} new bar(s) for {ticker}...")
+
+    # Continue the EMAs from the last shown values
+    state = EMAState(SPANS)
+    state.restore(ticker, live['ema'], live['count'])
+    prev = np.asarray(live['ema'])
+    emas = state.update_batch(ticker, data['Close'].to_numpy())
+
+    # Crossovers between the last shown bar and the new ones
+    fast_col, slow_col = SPANS.index(5), SPANS.index(13)
+    fast = np.concatenate([[prev[fast_col]], emas[:, fast_col]])
+    slow = np.concatenate([[prev[slow_col]], emas[:, slow_col]])
+    buy, sell = crossover_masks(fast, slow)
+    buy, sell = buy[1:], sell[1:]
+
+    dates = _dates(data.index)
+    closes = data['Close'].tolist()
+    patched = Patch()
+    for trace, values in ((CLOSE_TRACE, closes),
+                          (EMA_5_TRACE, emas[:, fast_col].tolist()),
+                          (EMA_13_TRACE, emas[:, slow_col].tolist()),
+                          (EMA_8_TRACE, emas[:, SPANS.index(8)].tolist())):
+        patched['data'][trace]['x'].extend(dates)
+        patched['data'][trace]['y'].extend(values)
+    for trace, mask in ((BUY_TRACE, buy), (SELL_TRACE, sell)):
+        if mask.any():
+            patched['data'][trace]['x'].extend([date for date, hit in zip(dates, mask) if hit])
+            patched['data'][trace]['y'].extend([close for close, hit in zip(closes, mask) if hit])
+
+    return patched, f"Current Price: {closes[-1]:.2f}", _live_state(ticker, data, state)
+
+# Provider reachability on /healthz
+register_health_routes(app.server, health)
 
 # Run the app
 if __name__ == '__main__':
     print("Starting Dash app...")
     port = int(os.environ.get("PORT", 8080))
-    app.run_server(debug=False, host='0.0.0.0', port=port)
+    app.run(debug=False, host='0.0.0.0', port=port)
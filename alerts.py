@@ -0,0 +1,370 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from indicators import EMAState
+
+# Crossover alert daemon: keeps fast/slow EMA state per ticker, feeds every
+# new bar through the same 5/13 rule update_graph draws,
+#     buy  when fast > slow and it was fast <= slow on the previous bar
+#     sell when fast < slow and it was fast >= slow on the previous bar
+# and emits an event for each crossover to one or more sinks.
+#
+#     python alerts.py --replay --synthetic 5000 --bars 252 --sink log:alerts.jsonl
+#     python alerts.py --file tickers.txt --sink webhook:http://localhost:9000/alerts --state alerts_state.npz
+
+
+# Appends events as JSON lines
+class LogFileSink:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a')
+
+    def emit(self, events):
+        for event in events:
+            self._file.write(json.dumps(event) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+# Puts events on a queue.Queue for an in-process consumer
+class QueueSink:
+    def __init__(self, events_queue=None):
+        self.queue = events_queue if events_queue is not None else queue.Queue()
+
+    def emit(self, events):
+        for event in events:
+            self.queue.put(event)
+
+    def close(self):
+        pass
+
+
+# POSTs each batch of events as one JSON list. emit() only puts the batch on
+# a bounded queue; a background thread does the delivery, so a slow or dead
+# receiver cannot stall the bar loop. When `max_pending` batches are already
+# waiting, new ones are dropped (and counted); delivery failures are logged
+# and dropped too. close() waits up to `timeout` for what is queued.
+class WebhookSink:
+    def __init__(self, url, timeout=5.0, max_pending=1000):
+        self.url = url
+        self.timeout = timeout
+        self.failures = 0
+        self.dropped = 0
+        self.delivered = 0
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._deliver_forever, name='webhook-sink', daemon=True)
+        self._thread.start()
+
+    def emit(self, events):
+        try:
+            self._pending.put_nowait(events)
+        except queue.Full:
+            self.dropped += 1
+            logging.warning(f"Alert queue for {self.url} is full, dropping {len(events)} alert(s)")
+
+    def _deliver(self, events):
+        request = urllib.request.Request(self.url, data=json.dumps(events).encode(),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+            self.delivered += 1
+        except OSError as e:
+            self.failures += 1
+            logging.error(f"Delivering {len(events)} alert(s) to {self.url} failed: {e}")
+
+    def _deliver_forever(self):
+        while True:
+            events = self._pending.get()
+            if events is None:
+                return
+            self._deliver(events)
+
+    def close(self):
+        try:
+            self._pending.put(None, timeout=self.timeout)
+        except queue.Full:
+            logging.warning(f"Closing with undelivered alerts for {self.url}")
+            return
+        self._thread.join(self.timeout)
+
+
+# Local webhook receiver that records what it is sent, for trying the daemon
+# (or WebhookSink) without a real endpoint
+class WebhookStub:
+    def __init__(self, host='127.0.0.1', port=0):
+        self.events = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                stub.events.extend(json.loads(body))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/alerts"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# Sink from a command-line spec: log:<path>, webhook:<url>, queue or stub
+def make_sink(spec):
+    kind, _, target = spec.partition(':')
+    if kind == 'log':
+        return LogFileSink(target or 'alerts.jsonl')
+    if kind == 'webhook':
+        return WebhookSink(target)
+    if kind == 'queue':
+        return QueueSink()
+    if kind == 'stub':
+        stub = WebhookStub().start()
+        logging.info(f"Webhook stub listening on {stub.url}")
+        sink = WebhookSink(stub.url)
+        sink.stub = stub
+        return sink
+    raise ValueError(f"Unknown sink {spec!r}; use log:<path>, webhook:<url>, queue or stub")
+
+
+# Per-ticker fast/slow EMA state and crossover detection.
+# Bars arrive as one step per timestamp: a close (or NaN for no bar) for each
+# of a set of tickers. A step costs O(tickers in it), i.e. O(1) per bar,
+# whatever the history length, and is vectorized across tickers.
+class CrossoverDetector:
+    def __init__(self, fast_span=5, slow_span=13, state=None):
+        self.fast_span = fast_span
+        self.slow_span = slow_span
+        self.state = state if state is not None else EMAState((fast_span, slow_span))
+        self._fast = self.state.spans.index(fast_span)
+        self._slow = self.state.spans.index(slow_span)
+
+    def rows(self, tickers):
+        return self.state.rows(tickers)
+
+    # Feed one step (timestamped `stamp`, int64 ns); returns (positions,
+    # is_buy) of the crossovers, where positions index into `rows`/`closes`
+    def step(self, rows, closes, stamp=None):
+        closes = np.asarray(closes, dtype=np.float64)
+        valid = np.flatnonzero(~np.isnan(closes))
+        rows = rows[valid]
+        prev = self.state.row_values(rows).copy()
+        seen = self.state.row_counts(rows) > 0
+        new = self.state.update_rows(rows, closes[valid], stamp)
+        fast, slow = new[:, self._fast], new[:, self._slow]
+        prev_fast, prev_slow = prev[:, self._fast], prev[:, self._slow]
+        buy = seen & (fast > slow) & (prev_fast <= prev_slow)
+        sell = seen & (fast < slow) & (prev_fast >= prev_slow)
+        hits = np.flatnonzero(buy | sell)
+        return valid[hits], buy[hits]
+
+    def ema(self, rows):
+        values = self.state.row_values(rows)
+        return values[:, self._fast], values[:, self._slow]
+
+
+# Runs bars through a CrossoverDetector and sends events to the sinks.
+# Per-step processing times are kept in a fixed-size window for latency stats.
+class AlertDaemon:
+    def __init__(self, sinks, fast_span=5, slow_span=13, state=None, latency_window=100_000):
+        self.sinks = list(sinks)
+        self.detector = CrossoverDetector(fast_span, slow_span, state)
+        self.bars = 0
+        self.steps = 0
+        self.events = 0
+        self._latencies = np.zeros(latency_window)
+
+    # One timestamp's bars: `tickers` with their `closes` (NaN = no bar).
+    # Crossovers of tickers where the boolean mask `silent` is set update the
+    # state but emit nothing (e.g. while seeding from history).
+    def on_bars(self, tickers, closes, date, rows=None, silent=None):
+        started = time.perf_counter()
+        if rows is None:
+            rows = self.detector.rows(tickers)
+        positions, is_buy = self.detector.step(rows, closes, pd.Timestamp(date).value)
+        if silent is not None and len(positions):
+            loud = ~silent[positions]
+            positions, is_buy = positions[loud], is_buy[loud]
+        if len(positions):
+            fast, slow = self.detector.ema(rows[positions])
+            date_text = pd.Timestamp(date).isoformat()
+            events = [{
+                'ticker': tickers[p],
+                'signal': 'buy' if buy else 'sell',
+                'date': date_text,
+                'close': float(closes[p]),
+                'ema_fast': float(f),
+                'ema_slow': float(s),
+            } for p, buy, f, s in zip(positions.tolist(), is_buy.tolist(), fast.tolist(), slow.tolist())]
+            for sink in self.sinks:
+                sink.emit(events)
+            self.events += len(events)
+        self._latencies[self.steps % len(self._latencies)] = time.perf_counter() - started
+        self.steps += 1
+        self.bars += int(np.count_nonzero(~np.isnan(closes)))
+        return len(positions)
+
+    def on_bar(self, ticker, close, date):
+        return self.on_bars([ticker], np.array([close], dtype=np.float64), date)
+
+    def latency(self):
+        recorded = self._latencies[:min(self.steps, len(self._latencies))]
+        if not len(recorded):
+            return {}
+        p50, p99 = np.percentile(recorded, [50, 99])
+        return {'p50_ms': p50 * 1000, 'p99_ms': p99 * 1000, 'max_ms': recorded.max() * 1000}
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+# Push a bars x tickers frame of closes through the daemon as fast as it
+# will go; returns bars per second
+def replay(daemon, closes):
+    tickers = [str(ticker) for ticker in closes.columns]
+    rows = daemon.detector.rows(tickers)
+    values = np.ascontiguousarray(closes.to_numpy(dtype=np.float64))
+    dates = closes.index
+    started = time.perf_counter()
+    for i in range(len(values)):
+        daemon.on_bars(tickers, values[i], dates[i], rows=rows)
+    elapsed = time.perf_counter() - started
+    return daemon.bars / elapsed if elapsed > 0 else float('inf')
+
+
+# Poll the price store for new bars every `poll_seconds` and feed, in time
+# order, the bars newer than the last one the state holds for each ticker
+# (kept with the state, so a restart carries on where the last run stopped).
+# Tickers the state knows nothing about are seeded from the `days` of history
+# first, without alerting on old crossovers. With `state_path` the state is
+# saved after every poll.
+def run_live(daemon, tickers, store, interval='1d', days=30, poll_seconds=60.0, stop=None, state_path=None):
+    from screener import load_closes
+
+    stop = stop or threading.Event()
+    state = daemon.detector.state
+    rows = daemon.detector.rows(tickers)
+    while not stop.is_set():
+        closes = load_closes(tickers, days=days, interval=interval, store=store).reindex(columns=tickers)
+        values = closes.to_numpy(dtype=np.float64)
+        stamps = closes.index.values.astype('datetime64[ns]').view(np.int64)
+        last_seen = state.row_stamps(rows).copy()
+        seeding = state.row_counts(rows) == 0
+        for i in range(len(values)):
+            row = values[i].copy()
+            row[stamps[i] <= last_seen] = np.nan
+            if np.isnan(row).all():
+                continue
+            daemon.on_bars(tickers, row, closes.index[i], rows=rows, silent=seeding)
+        if seeding.any():
+            logging.info(f"Seeded {int(np.count_nonzero(seeding & (state.row_counts(rows) > 0)))} ticker(s) from history")
+        logging.info(f"{daemon.bars} bars, {daemon.events} alerts so far")
+        if state_path:
+            state.save(state_path)
+        stop.wait(poll_seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Emit alerts for fresh fast/slow EMA crossovers.")
+    parser.add_argument('tickers', nargs='*', help="Tickers to watch")
+    parser.add_argument('--file', help="File with one ticker per line")
+    parser.add_argument('--fast', type=int, default=5, help="Fast EMA span (default: 5)")
+    parser.add_argument('--slow', type=int, default=13, help="Slow EMA span (default: 13)")
+    parser.add_argument('--sink', action='append', default=[],
+                        help="log:<path>, webhook:<url>, queue or stub; repeatable (default: log:alerts.jsonl)")
+    parser.add_argument('--interval', default='1d', help="Bar interval for live mode (default: 1d)")
+    parser.add_argument('--poll', type=float, default=60.0, help="Seconds between live polls (default: 60)")
+    parser.add_argument('--state', help="EMA state file, loaded at start and saved after every poll")
+    parser.add_argument('--replay', action='store_true', help="Replay history at full speed, then exit")
+    parser.add_argument('--synthetic', type=int, help="Replay this many synthetic tickers")
+    parser.add_argument('--bars', type=int, default=252, help="Bars per synthetic ticker (default: 252)")
+    parser.add_argument('--history', help="Replay a CSV or Parquet file of closes (dates x tickers)")
+    parser.add_argument('--days', type=int, default=365, help="Days of stored history to replay (default: 365)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    state = EMAState.load(args.state) if args.state and os.path.exists(args.state) else None
+    sinks = [make_sink(spec) for spec in args.sink or ['log:alerts.jsonl']]
+    daemon = AlertDaemon(sinks, args.fast, args.slow, state=state)
+
+    tickers = list(args.tickers)
+    if args.file:
+        from screener import read_ticker_file
+        tickers += read_ticker_file(args.file)
+
+    try:
+        if args.replay:
+            if args.synthetic:
+                from synthetic import gbm_closes
+                closes = gbm_closes(args.bars, args.synthetic)
+            elif args.history:
+                if args.history.endswith('.parquet'):
+                    closes = pd.read_parquet(args.history)
+                else:
+                    closes = pd.read_csv(args.history, index_col=0)
+                closes.index = pd.to_datetime(closes.index)
+            elif tickers:
+                from price_store import default_store
+                from screener import load_closes
+                closes = load_closes(tickers, days=args.days, store=default_store())
+            else:
+                parser.error("replay needs --synthetic, --history or tickers")
+            bars_per_second = replay(daemon, closes)
+            latency = daemon.latency()
+            print(f"Replayed {daemon.bars:,} bars for {closes.shape[1]:,} tickers over {len(closes):,} steps: "
+                  f"{bars_per_second:,.0f} bars/s, {daemon.events:,} alerts, "
+                  f"step latency p50 {latency['p50_ms']:.3f} ms, p99 {latency['p99_ms']:.3f} ms, "
+                  f"max {latency['max_ms']:.3f} ms")
+            return 0
+
+        if not tickers:
+            parser.error("no tickers given")
+        from health import default_monitor
+        from price_store import default_store
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            run_live(daemon, tickers, default_store(health=default_monitor()), interval=args.interval,
+                     poll_seconds=args.poll, stop=stop, state_path=args.state)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # Only live state is saved: a replay must not overwrite it
+            if args.state:
+                daemon.detector.state.save(args.state)
+        return 0
+    finally:
+        daemon.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
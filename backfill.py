@@ -0,0 +1,121 @@
+import argparse
+import glob
+import logging
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+from price_store import COLUMNS, PriceStore, DEFAULT_STORE_DIR
+
+# Bulk import of historical bars into the price store, so long windows (1y,
+# 5y, max) are served from disk instead of being downloaded on request.
+#
+#     python backfill.py history/                       # every .csv/.parquet under history/
+#     python backfill.py AAPL_1d.csv MSFT_5m.parquet
+#     python backfill.py --interval 1d all_daily.csv    # long format with a Ticker column
+#
+# Accepted files:
+#   <TICKER>_<interval>.csv|.parquet  one ticker (the CsvProvider naming)
+#   <TICKER>.csv|.parquet             one ticker, interval from --interval
+#   any name with a Ticker/Symbol column holding many tickers
+# Dates come from a Date/Datetime/Timestamp column or the first column;
+# column names are matched case-insensitively. Imported bars are merged with
+# what the store already holds, imported values winning on overlap.
+
+EXTENSIONS = ('.csv', '.parquet')
+FILE_NAME = re.compile(r'^(?P<ticker>.+?)(?:_(?P<interval>\d+(?:m|h|d|wk|mo)))?$')
+DATE_COLUMNS = ('date', 'datetime', 'timestamp', 'time')
+TICKER_COLUMNS = ('ticker', 'symbol')
+
+
+def find_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for ext in EXTENSIONS:
+                files += glob.glob(os.path.join(path, '**', f'*{ext}'), recursive=True)
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def read_file(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+# Title-case the OHLCV, date and ticker columns and index by date
+def standardize(data):
+    rename = {}
+    for col in data.columns:
+        key = str(col).strip().lower()
+        if key in DATE_COLUMNS:
+            rename[col] = 'Date'
+        elif key in TICKER_COLUMNS:
+            rename[col] = 'Ticker'
+        else:
+            for name in COLUMNS:
+                if key == name.lower():
+                    rename[col] = name
+    data = data.rename(columns=rename)
+    if 'Date' not in data.columns:
+        if isinstance(data.index, pd.DatetimeIndex):
+            data.index.name = 'Date'
+            return data
+        data = data.rename(columns={data.columns[0]: 'Date'})
+    data['Date'] = pd.to_datetime(data['Date'], utc=True).dt.tz_localize(None)
+    return data.set_index('Date')
+
+
+# Import one file; returns {ticker: bars written}
+def import_file(store, path, interval=None):
+    name = os.path.splitext(os.path.basename(path))[0]
+    match = FILE_NAME.match(name)
+    interval = interval or match.group('interval') or '1d'
+    data = standardize(read_file(path))
+    if 'Close' not in data.columns:
+        raise ValueError(f"{path} has no Close column")
+    if 'Ticker' in data.columns:
+        groups = data.groupby('Ticker', sort=False)
+    else:
+        groups = [(match.group('ticker'), data)]
+    return {str(ticker).upper(): store.write(str(ticker), frame, interval) for ticker, frame in groups}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import historical bars from CSV or Parquet files into the price store.")
+    parser.add_argument('paths', nargs='+', help="Files or directories to import")
+    parser.add_argument('--interval', help="Bar interval when the file name does not say (default: 1d)")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help=f"Store directory (default: {DEFAULT_STORE_DIR})")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = PriceStore(args.store, offline=True)
+    files = find_files(args.paths)
+    if not files:
+        parser.error("no .csv or .parquet files found")
+
+    started = time.perf_counter()
+    tickers, bars, failed = set(), 0, 0
+    for path in files:
+        try:
+            written = import_file(store, path, args.interval)
+        except Exception as e:
+            logging.error(f"Importing {path} failed: {e}")
+            failed += 1
+            continue
+        tickers.update(written)
+        bars += sum(written.values())
+        logging.info(f"{path}: {sum(written.values()):,} bars for {len(written)} ticker(s)")
+    elapsed = time.perf_counter() - started
+    print(f"Imported {bars:,} bars for {len(tickers):,} tickers from {len(files) - failed} file(s) "
+          f"in {elapsed:.1f}s ({bars / elapsed if elapsed else 0:,.0f} bars/s)")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import argparse
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from signals import crossover_masks, ema
+
+# Bars per year used to annualize returns (daily bars)
+BARS_PER_YEAR = 252
+
+METRIC_COLUMNS = ['Total Return %', 'CAGR %', 'Max Drawdown %', 'Trades', 'Hit Rate %', 'Exposure %']
+
+
+# Long/flat position per bar from crossover masks: enter at the close of a buy
+# bar, exit at the close of a sell bar. Vectorized forward fill of the last
+# signal seen in each column.
+def positions(buy, sell):
+    n_bars = buy.shape[0]
+    event = buy | sell
+    steps = np.arange(n_bars).reshape((-1,) + (1,) * (buy.ndim - 1))
+    last_event = np.maximum.accumulate(np.where(event, steps, -1), axis=0)
+    held = np.take_along_axis(buy, np.maximum(last_event, 0), axis=0)
+    return held & (last_event >= 0)
+
+
+# Simple returns per bar of a bars x tickers array of closes; gaps (NaN
+# closes) count as flat bars
+def bar_returns(closes):
+    filled = pd.DataFrame(closes).ffill().to_numpy()
+    returns = np.zeros_like(filled)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[1:] = filled[1:] / filled[:-1] - 1.0
+    returns[~np.isfinite(returns)] = 0.0
+    return returns
+
+
+# Metrics for one (fast, slow) pair given bar_returns() of the closes and the
+# matching fast/slow EMA arrays. Returns a dict of arrays, one value per
+# ticker. `fee_bps` is charged on every entry and every exit.
+def evaluate(returns, fast, slow, fee_bps=0.0):
+    buy, sell = crossover_masks(fast, slow)
+    held = positions(buy, sell)
+
+    # A position decided at bar t earns bar t+1's return
+    exposure = np.zeros_like(held)
+    exposure[1:] = held[:-1]
+    changes = np.zeros(held.shape, dtype=np.float64)
+    changes[0] = held[0]
+    changes[1:] = held[1:] != held[:-1]
+    strategy = np.where(exposure, returns, 0.0) - changes * (fee_bps / 10_000.0)
+
+    equity = np.cumprod(1.0 + strategy, axis=0)
+    peak = np.maximum.accumulate(equity, axis=0)
+    drawdown = equity / peak - 1.0
+
+    n_bars, n_tickers = returns.shape
+    total = equity[-1] - 1.0
+    years = max(n_bars - 1, 1) / BARS_PER_YEAR
+    with np.errstate(invalid='ignore'):
+        cagr = np.where(equity[-1] > 0, equity[-1] ** (1.0 / years) - 1.0, -1.0)
+
+    # Per-trade returns: number every entry, then sum log returns of the bars
+    # each trade was exposed to with one bincount over (ticker, trade) ids
+    entries = buy & held
+    trade_number = np.cumsum(entries, axis=0)
+    n_trades = trade_number[-1]
+    max_trades = int(n_trades.max()) if n_tickers else 0
+    log_growth = np.log1p(strategy)
+    exposed_trade = np.zeros_like(trade_number)
+    exposed_trade[1:] = np.where(exposure[1:], trade_number[:-1], 0)
+    # The entry bar carries the entry fee
+    exposed_trade = np.where(entries, trade_number, exposed_trade)
+    ids = exposed_trade + np.arange(n_tickers) * (max_trades + 1)
+    sums = np.bincount(ids.ravel(), weights=log_growth.ravel(), minlength=n_tickers * (max_trades + 1))
+    trade_returns = np.expm1(sums.reshape(n_tickers, max_trades + 1)[:, 1:])
+    trade_exists = np.arange(1, max_trades + 1) <= n_trades[:, None]
+    wins = ((trade_returns > 0) & trade_exists).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hit_rate = np.where(n_trades > 0, wins / n_trades, np.nan)
+
+    return {
+        'Total Return %': 100.0 * total,
+        'CAGR %': 100.0 * cagr,
+        'Max Drawdown %': 100.0 * drawdown.min(axis=0),
+        'Trades': n_trades,
+        'Hit Rate %': 100.0 * hit_rate,
+        'Exposure %': 100.0 * exposure.mean(axis=0),
+    }
+
+
+# Backtest one (fast, slow) pair on a Series or bars x tickers DataFrame of closes
+def backtest(closes, fast_span=5, slow_span=13, fee_bps=0.0):
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame()
+    metrics = evaluate(bar_returns(closes.to_numpy(dtype=np.float64)), ema(closes, fast_span).to_numpy(),
+                       ema(closes, slow_span).to_numpy(), fee_bps)
+    return pd.DataFrame(metrics, index=pd.Index(closes.columns, name='Ticker'))[METRIC_COLUMNS]
+
+
+# List the round-trip trades of one ticker: entry/exit dates and prices and
+# the trade return. A position still open at the end is marked to the last close.
+def trades(close, fast_span=5, slow_span=13):
+    close = close.dropna()
+    buy, sell = crossover_masks(ema(close, fast_span).to_numpy(), ema(close, slow_span).to_numpy())
+    entries = np.flatnonzero(buy)
+    exits = np.flatnonzero(sell)
+    rows = []
+    for entry in entries:
+        later = exits[exits > entry]
+        exit_ = int(later[0]) if len(later) else len(close) - 1
+        rows.append({
+            'Entry Date': close.index[entry], 'Entry Price': close.iloc[entry],
+            'Exit Date': close.index[exit_], 'Exit Price': close.iloc[exit_],
+            'Return %': 100.0 * (close.iloc[exit_] / close.iloc[entry] - 1.0),
+            'Open': not len(later),
+        })
+    return pd.DataFrame(rows, columns=['Entry Date', 'Entry Price', 'Exit Date', 'Exit Price', 'Return %', 'Open'])
+
+
+def span_pairs(fast_spans, slow_spans):
+    return [(fast, slow) for fast, slow in itertools.product(fast_spans, slow_spans) if fast < slow]
+
+
+# Run every (fast, slow) pair over one chunk of tickers. Each span's EMA is
+# computed once for the whole chunk and reused by every pair that needs it.
+def _sweep_chunk(args):
+    closes, pairs, fee_bps = args
+    returns = bar_returns(closes.to_numpy(dtype=np.float64))
+    spans = sorted({span for pair in pairs for span in pair})
+    emas = {span: ema(closes, span).to_numpy() for span in spans}
+    frames = []
+    for fast, slow in pairs:
+        metrics = evaluate(returns, emas[fast], emas[slow], fee_bps)
+        frame = pd.DataFrame(metrics, index=closes.columns)
+        frame.insert(0, 'Slow', slow)
+        frame.insert(0, 'Fast', fast)
+        frames.append(frame)
+    return pd.concat(frames).rename_axis('Ticker').reset_index()
+
+
+# Evaluate a grid of (fast, slow) spans for every ticker in a bars x tickers
+# DataFrame of closes. Tickers are split across a process pool; within a
+# worker each pair is one batched array computation over all its tickers.
+def sweep(closes, fast_spans, slow_spans, fee_bps=0.0, workers=None):
+    pairs = span_pairs(fast_spans, slow_spans)
+    if not pairs:
+        raise ValueError("no (fast, slow) pairs with fast < slow")
+    workers = workers or os.cpu_count() or 1
+    n_tickers = closes.shape[1]
+    workers = min(workers, n_tickers)
+    if workers <= 1:
+        table = _sweep_chunk((closes, pairs, fee_bps))
+    else:
+        chunks = np.array_split(np.arange(n_tickers), workers)
+        jobs = [(closes.iloc[:, chunk], pairs, fee_bps) for chunk in chunks]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            table = pd.concat(pool.map(_sweep_chunk, jobs), ignore_index=True)
+    return table[['Fast', 'Slow', 'Ticker'] + METRIC_COLUMNS]
+
+
+# Average each pair's metrics across tickers, best total return first
+def summarize_sweep(table):
+    summary = table.groupby(['Fast', 'Slow'])[METRIC_COLUMNS].mean()
+    return summary.sort_values('Total Return %', ascending=False).reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest EMA crossover spans over a ticker universe.")
+    parser.add_argument('tickers', nargs='*', help="Tickers to backtest")
+    parser.add_argument('--file', help="File with one ticker per line")
+    parser.add_argument('--years', type=float, default=10, help="Years of history (default: 10)")
+    parser.add_argument('--fast', type=int, nargs='+', default=[5], help="Fast spans (default: 5)")
+    parser.add_argument('--slow', type=int, nargs='+', default=[13], help="Slow spans (default: 13)")
+    parser.add_argument('--fee-bps', type=float, default=0.0, help="Fee per entry/exit in basis points")
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument('--store', action='store_true', help="Read prices through the local price store")
+    args = parser.parse_args(argv)
+
+    from screener import load_closes, read_ticker_file
+
+    logging.basicConfig(level=logging.INFO)
+    tickers = list(args.tickers)
+    if args.file:
+        tickers += read_ticker_file(args.file)
+    if not tickers:
+        parser.error("no tickers given")
+    store = None
+    if args.store:
+        from price_store import default_store
+        store = default_store()
+
+    closes = load_closes([ticker.upper() for ticker in tickers], days=int(args.years * 365), store=store)
+    started = time.perf_counter()
+    table = sweep(closes, args.fast, args.slow, args.fee_bps, args.workers)
+    elapsed = time.perf_counter() - started
+
+    print(summarize_sweep(table).to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    n_pairs = len(span_pairs(args.fast, args.slow))
+    print(f"\n{n_pairs} span pairs x {closes.shape[1]} tickers x {len(closes)} bars in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
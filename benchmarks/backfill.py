@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from backfill import import_file
+from price_store import PriceStore
+from synthetic import gbm_ohlcv
+
+# Import throughput of backfill.py and read latency of fixed-size windows as
+# the stored history grows. Each history is written as a CSV, imported, and
+# then windows of the last `--window` bars are read back through
+# PriceStore.read_series (as update_graph does, Close only) and
+# PriceStore.read (a full OHLCV frame). With the memory-mapped columnar
+# layout the window reads should stay flat while the history grows 100x.
+#
+#     python -m benchmarks.backfill
+#     python -m benchmarks.backfill --bars 10000 1000000 10000000 --window 1260
+#
+# import:  CSV parse plus store write, in bars/s
+# series:  best read_series time for the window, in microseconds
+# frame:   best read time for the window, in microseconds
+
+
+def best_of(call, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure backfill import speed and window read latency.")
+    parser.add_argument('--bars', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--window', type=int, default=252, help="Bars per window read (default: 252, about 1y)")
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for n_bars in args.bars:
+        print(f"{n_bars:,} bars...", file=sys.stderr)
+        source = tempfile.mkdtemp()
+        frame = gbm_ohlcv(n_bars, freq='min' if n_bars > 50_000 else 'D')
+        path = os.path.join(source, 'SYN_1d.csv')
+        frame.to_csv(path)
+
+        store = PriceStore(tempfile.mkdtemp(), offline=True)
+        started = time.perf_counter()
+        import_file(store, path)
+        import_s = time.perf_counter() - started
+
+        # Windows spread over the history, so pages are not all hot
+        dates = frame.index
+        starts = np.linspace(0, n_bars - args.window, num=8, dtype=int)
+        windows = [(dates[i], dates[i + args.window - 1] + pd.Timedelta(1, 'ns')) for i in starts]
+        lengths = {len(store.read_series('SYN', '1d', start, end)) for start, end in windows}
+        assert lengths == {args.window}, lengths
+
+        series_s = min(best_of(lambda: store.read_series('SYN', '1d', start, end), args.repeat)
+                       for start, end in windows)
+        frame_s = min(best_of(lambda: store.read('SYN', '1d', start, end), args.repeat) for start, end in windows)
+        rows.append({'bars': n_bars, 'file_mb': os.path.getsize(store.path('SYN')) / 1e6,
+                     'import_bars_s': n_bars / import_s, 'series_us': series_s * 1e6, 'frame_us': frame_s * 1e6})
+    table = pd.DataFrame(rows)
+    print(f"Window of {args.window} bars")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:,.1f}"))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from fetch import AsyncFetcher, HttpChartProvider, StandInChartServer
+from synthetic import synthetic_tickers
+
+# Load test of the async fetch layer against the in-process stand-in chart
+# server (no network). For each concurrency level N tickers are fetched over
+# pooled HTTP connections; the stand-in adds `--latency` seconds per request
+# and fails `--failure-rate` of them so retries are exercised.
+#
+#     python -m benchmarks.fetch_load
+#     python -m benchmarks.fetch_load --tickers 2000 --latency 0.05 --concurrency 1 8 32 64
+
+
+def run_case(url, tickers, concurrency, days, timeout, retries, backoff):
+    provider = HttpChartProvider(url, pool_size=concurrency, timeout=timeout)
+    fetcher = AsyncFetcher(provider, concurrency=concurrency, timeout=timeout, retries=retries, backoff=backoff)
+    end = date(2024, 1, 1)
+    requests = [(ticker, end - timedelta(days=days), end, '1d') for ticker in tickers]
+    started = time.perf_counter()
+    results = fetcher.fetch_many_sync(requests)
+    elapsed = time.perf_counter() - started
+    provider.close()
+    failed = sum(isinstance(result, Exception) for result in results.values())
+    bars = sum(len(result) for result in results.values() if not isinstance(result, Exception))
+    return {
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'tickers/s': len(tickers) / elapsed,
+        'bars': bars,
+        'attempts': fetcher.attempts,
+        'failed': failed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the async fetch layer against a local stand-in server.")
+    parser.add_argument('--tickers', type=int, default=500, help="Number of synthetic tickers (default: 500)")
+    parser.add_argument('--days', type=int, default=60, help="Calendar days per request (default: 60)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64], help="Concurrency levels")
+    parser.add_argument('--latency', type=float, default=0.02, help="Stand-in delay per request in seconds")
+    parser.add_argument('--failure-rate', type=float, default=0.02, help="Share of stand-in requests answered 503")
+    parser.add_argument('--timeout', type=float, default=5.0, help="Per-attempt timeout in seconds")
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--backoff', type=float, default=0.05, help="First retry delay in seconds")
+    args = parser.parse_args(argv)
+
+    tickers = synthetic_tickers(args.tickers)
+    rows = []
+    with StandInChartServer(latency=args.latency, failure_rate=args.failure_rate) as server:
+        for concurrency in args.concurrency:
+            print(f"{args.tickers:,} tickers at concurrency {concurrency}...", file=sys.stderr)
+            rows.append(run_case(server.url, tickers, concurrency, args.days, args.timeout, args.retries, args.backoff))
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import argparse
+import base64
+import gzip
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+from plotly.io.json import to_json_plotly
+
+from figures import price_figure_dict
+from signals import signal_points
+from synthetic import gbm_closes
+
+# Compare the figure payload and server-side build/serialize time of:
+#   legacy     the original update_graph figure (one trace per signal, SVG,
+#              every point, dates and prices as JSON lists)
+#   lists      figures.price_figure_dict's traces (one per signal type,
+#              WebGL, LTTB) sent as JSON lists of date strings and decimals
+#   binary f8  figures.price_figure_dict with float64 typed arrays
+#   binary f4  figures.price_figure_dict as the apps send it (float32 prices,
+#              float64 epoch-millisecond dates)
+# Serialization is plotly's JSON encoder, which Dash uses for responses;
+# gzip_kb is the size on the wire behind a compressing proxy.
+#
+#     python -m benchmarks.figure_payload --sizes 60 1000 10000 100000
+#     python -m benchmarks.figure_payload --no-downsample
+
+
+def legacy_figure(data, ticker):
+    buy_signals, sell_signals = signal_points(data, 'EMA_5', 'EMA_13')
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=data.index, y=data['Close'], mode='lines', name='Close'))
+    fig.add_trace(go.Scatter(x=data.index, y=data['EMA_5'], mode='lines', name='EMA 5'))
+    fig.add_trace(go.Scatter(x=data.index, y=data['EMA_13'], mode='lines', name='EMA 13'))
+    fig.add_trace(go.Scatter(x=data.index, y=data['EMA_8'], mode='lines', name='EMA 8'))
+    for signal in buy_signals:
+        fig.add_trace(go.Scatter(
+            x=[signal[0]], y=[signal[1]], mode='markers+text', name='Buy Signal',
+            marker=dict(symbol='triangle-up', size=15, color='green'),
+            text=[f'Buy: {signal[1]:.2f}'], textposition='top center'
+        ))
+    for signal in sell_signals:
+        fig.add_trace(go.Scatter(
+            x=[signal[0]], y=[signal[1]], mode='markers+text', name='Sell Signal',
+            marker=dict(symbol='triangle-down', size=15, color='red'),
+            text=[f'Sell: {signal[1]:.2f}'], textposition='bottom center'
+        ))
+    fig.update_layout(
+        title=f"{ticker.upper()} Prices with 5, 13, and 8-day EMAs and Buy/Sell Signals",
+        xaxis_title="Date",
+        yaxis_title="Price",
+        template="plotly_white"
+    )
+    return fig
+
+
+# The binary figure with every typed array turned back into a JSON list, as
+# the figures were sent before typed arrays
+def list_figure(data, ticker, max_points):
+    fig = price_figure_dict(data, ticker, max_points=max_points, dtype=np.float64)
+    for trace in fig['data']:
+        x = np.frombuffer(base64.b64decode(trace['x']['bdata']), dtype=np.float64)
+        trace['x'] = [ts.isoformat() for ts in pd.to_datetime(x, unit='ms')]
+        trace['y'] = np.frombuffer(base64.b64decode(trace['y']['bdata']), dtype=np.float64).tolist()
+    return go.Figure(fig)
+
+
+def _length(values):
+    if isinstance(values, dict):
+        return len(base64.b64decode(values['bdata'])) // np.dtype(values['dtype']).itemsize
+    return len(values)
+
+
+def measure(builder, data, repeat):
+    build_s, serialize_s = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fig = builder(data, 'SYN')
+        built = time.perf_counter()
+        payload = to_json_plotly(fig)
+        serialized = time.perf_counter()
+        build_s.append(built - started)
+        serialize_s.append(serialized - built)
+    traces = fig['data'] if isinstance(fig, dict) else fig.data
+    points = sum(_length(trace['y']) for trace in traces)
+    return {
+        'traces': len(traces),
+        'points': points,
+        'payload_kb': len(payload) / 1024,
+        'gzip_kb': len(gzip.compress(payload.encode(), 6)) / 1024,
+        'build_ms': 1000 * min(build_s),
+        'serialize_ms': 1000 * min(serialize_s),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark price figure construction and payload size.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[60, 1_000, 10_000, 100_000], help="Bars per chart")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-downsample', action='store_true', help="Send every point (no LTTB)")
+    args = parser.parse_args(argv)
+    max_points = None if args.no_downsample else 2000
+
+    rows = []
+    for n_bars in args.sizes:
+        data = gbm_closes(n_bars).rename(columns=lambda _: 'Close')
+        for span in (5, 13, 8):
+            data[f'EMA_{span}'] = data['Close'].ewm(span=span, adjust=False).mean()
+        builders = (
+            ('legacy', legacy_figure),
+            ('lists', lambda data, ticker: list_figure(data, ticker, max_points)),
+            ('binary f8', lambda data, ticker: price_figure_dict(data, ticker, max_points=max_points,
+                                                                 dtype=np.float64)),
+            ('binary f4', lambda data, ticker: price_figure_dict(data, ticker, max_points=max_points)),
+        )
+        for label, builder in builders:
+            rows.append({'bars': n_bars, 'builder': label, **measure(builder, data, args.repeat)})
+
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f"{x:.1f}"))
+
+
+if __name__ == '__main__':
+    main()
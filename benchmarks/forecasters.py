@@ -0,0 +1,79 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from forecast import HoltForecaster, get_forecaster, get_suggested_prices
+from synthetic import gbm_paths
+
+# Compare forecaster backends on synthetic GBM series: fit on `history` daily
+# bars, forecast `periods` days ahead, and check how often the realised close
+# at the horizon lands inside [yhat_lower, yhat_upper].
+#
+#     python -m benchmarks.forecasters --series 200 --prophet-series 20
+
+
+def run_backend(name, paths, history, periods):
+    forecaster = get_forecaster(name)
+    dates = pd.date_range('2020-01-01', periods=history, freq='D')
+    bands = []
+    started = time.perf_counter()
+    for i in range(paths.shape[1]):
+        data = pd.DataFrame({'Date': dates, 'Close': paths[:history, i]})
+        bands.append(get_suggested_prices(forecaster.forecast(data, periods=periods)))
+    elapsed = time.perf_counter() - started
+    return np.asarray(bands, dtype=np.float64), elapsed
+
+
+def run_holt_batched(paths, history, periods):
+    started = time.perf_counter()
+    _, lower, upper = HoltForecaster().forecast_many(paths[:history], periods)
+    elapsed = time.perf_counter() - started
+    return np.column_stack([lower[-1], upper[-1]]), elapsed
+
+
+def summarize(label, bands, elapsed, actual, last_close):
+    lower, upper = bands[:, 0], bands[:, 1]
+    return {
+        'backend': label,
+        'series': len(bands),
+        'total_s': elapsed,
+        'ms_per_series': 1000.0 * elapsed / len(bands),
+        'coverage': float(np.mean((actual >= lower) & (actual <= upper))),
+        'band_width_pct': float(np.mean(100.0 * (upper - lower) / last_close)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark forecaster backends for suggested prices.")
+    parser.add_argument('--series', type=int, default=200, help="Series for the Holt backend (default: 200)")
+    parser.add_argument('--prophet-series', type=int, default=20, help="Series for the Prophet backend (default: 20, 0 to skip)")
+    parser.add_argument('--history', type=int, default=60, help="Bars of history per fit (default: 60)")
+    parser.add_argument('--periods', type=int, default=30, help="Forecast horizon in days (default: 30)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    logging.getLogger('prophet').setLevel(logging.WARNING)
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+    paths = gbm_paths(args.history + args.periods, args.series, seed=args.seed)
+    actual = paths[-1]
+    last_close = paths[args.history - 1]
+
+    rows = []
+    bands, elapsed = run_holt_batched(paths, args.history, args.periods)
+    rows.append(summarize('holt (batched)', bands, elapsed, actual, last_close))
+    bands, elapsed = run_backend('holt', paths, args.history, args.periods)
+    rows.append(summarize('holt (per series)', bands, elapsed, actual, last_close))
+    if args.prophet_series:
+        n = min(args.prophet_series, args.series)
+        bands, elapsed = run_backend('prophet', paths[:, :n], args.history, args.periods)
+        rows.append(summarize('prophet', bands, elapsed, actual[:n], last_close[:n]))
+
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+
+
+if __name__ == '__main__':
+    main()
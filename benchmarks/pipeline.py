@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from plotly.io.json import to_json_plotly
+
+from figures import price_figure_dict
+from price_store import PriceStore
+from signals import crossover_indices, ema_values
+from synthetic import gbm_closes, gbm_ohlcv
+
+# Offline benchmark of the update_graph pipeline on deterministic synthetic
+# prices. Each stage is timed separately:
+#   load       read the stored closes as a series.PriceSeries
+#              (PriceStore.read_series, from a yf.download-shaped frame
+#              written to a temporary store beforehand)
+#   ema        the three EMA columns, on the series' arrays
+#   crossovers 5/13 crossover detection
+#   figure     figures.price_figure_dict
+#   serialize  figure JSON encoding (plotly's encoder, as Dash uses)
+# Multi-ticker cases time the 2-D EMA + crossover path used by the screener.
+#
+#     python -m benchmarks.pipeline                   # default sizes
+#     python -m benchmarks.pipeline --full            # adds 10M bars
+#     python -m benchmarks.pipeline --save-baseline   # record a new baseline
+#
+# Results are written to benchmarks/results/; the run is compared with
+# benchmarks/baseline.json and exits with status 1 on regressions.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, 'baseline.json')
+RESULTS_DIR = os.path.join(HERE, 'results')
+
+SINGLE_TICKER_BARS = (60, 1_000, 10_000, 100_000, 1_000_000)
+FULL_SINGLE_TICKER_BARS = SINGLE_TICKER_BARS + (10_000_000,)
+MULTI_TICKER_COUNTS = (1, 10, 100, 1_000, 5_000)
+MULTI_TICKER_BARS = 252
+
+
+# Shape the synthetic frame like a single-ticker yf.download result:
+# (field, ticker) MultiIndex columns and a Date index
+def download_shaped(n_bars, seed=0):
+    data = gbm_ohlcv(n_bars, seed=seed, freq='min' if n_bars > 50_000 else 'D')
+    data.columns = pd.MultiIndex.from_tuples([(col, 'SYN') for col in data.columns], names=['Price', 'Ticker'])
+    return data
+
+
+def add_emas(series):
+    close = series['Close']
+    for span in (5, 13, 8):
+        series[f'EMA_{span}'] = ema_values(close, span)
+    return series
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def bench_single(n_bars, repeat):
+    root = tempfile.mkdtemp(prefix='pipeline-')
+    try:
+        store = PriceStore(root, offline=True)
+        store.write('SYN', download_shaped(n_bars))
+        best = {}
+        for _ in range(repeat):
+            series, t_load = timed(store.read_series, 'SYN', '1d')
+            series, t_ema = timed(add_emas, series)
+            signals, t_cross = timed(crossover_indices, series['EMA_5'], series['EMA_13'])
+            fig, t_figure = timed(lambda: price_figure_dict(series, 'SYN', signals=signals))
+            payload, t_serialize = timed(to_json_plotly, fig)
+            for stage, seconds in (('load', t_load), ('ema', t_ema), ('crossovers', t_cross),
+                                   ('figure', t_figure), ('serialize', t_serialize)):
+                best[stage] = min(best.get(stage, float('inf')), seconds)
+        best['payload_bytes'] = len(payload)
+        return best
+    finally:
+        shutil.rmtree(root)
+
+
+def bench_multi(n_tickers, n_bars, repeat):
+    closes = gbm_closes(n_bars, n_tickers)
+    best = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fast = closes.ewm(span=5, adjust=False).mean().to_numpy()
+        slow = closes.ewm(span=13, adjust=False).mean().to_numpy()
+        closes.ewm(span=8, adjust=False).mean()
+        emas_done = time.perf_counter()
+        crossover_indices(fast, slow)
+        finished = time.perf_counter()
+        best['ema'] = min(best.get('ema', float('inf')), emas_done - started)
+        best['crossovers'] = min(best.get('crossovers', float('inf')), finished - emas_done)
+    return best
+
+
+def run(single_bars, ticker_counts, repeat):
+    results = {}
+    for n_bars in single_bars:
+        print(f"single ticker, {n_bars:,} bars...", file=sys.stderr)
+        for stage, value in bench_single(n_bars, repeat if n_bars < 1_000_000 else 1).items():
+            results[f"single/{n_bars}/{stage}"] = value
+    for n_tickers in ticker_counts:
+        print(f"{n_tickers:,} tickers, {MULTI_TICKER_BARS} bars...", file=sys.stderr)
+        for stage, value in bench_multi(n_tickers, MULTI_TICKER_BARS, repeat).items():
+            results[f"multi/{n_tickers}x{MULTI_TICKER_BARS}/{stage}"] = value
+    return results
+
+
+# Timings slower than baseline * (1 + tolerance) and by more than min_seconds
+# (to ignore jitter on sub-millisecond stages) are regressions
+def compare(results, baseline, tolerance, min_seconds):
+    rows, regressions = [], []
+    for key, value in results.items():
+        base = baseline.get(key)
+        row = {'case': key, 'value': value, 'baseline': base, 'ratio': np.nan, 'status': 'new'}
+        if base is not None and base > 0:
+            row['ratio'] = value / base
+            if key.endswith('payload_bytes'):
+                regressed = value > base * (1 + tolerance)
+            else:
+                regressed = value > base * (1 + tolerance) and value - base > min_seconds
+            row['status'] = 'REGRESSION' if regressed else 'ok'
+            if regressed:
+                regressions.append(key)
+        rows.append(row)
+    return pd.DataFrame(rows), regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the update_graph compute and rendering pipeline.")
+    parser.add_argument('--full', action='store_true', help="Include the 10M-bar case")
+    parser.add_argument('--bars', type=int, nargs='+', help="Override single-ticker sizes")
+    parser.add_argument('--tickers', type=int, nargs='+', help="Override multi-ticker counts")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per case; the fastest is kept (default: 3)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline file to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Write this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown before flagging (default: 0.25)")
+    parser.add_argument('--min-seconds', type=float, default=0.002, help="Ignore slowdowns smaller than this (default: 0.002)")
+    args = parser.parse_args(argv)
+
+    single_bars = args.bars or (FULL_SINGLE_TICKER_BARS if args.full else SINGLE_TICKER_BARS)
+    ticker_counts = args.tickers or MULTI_TICKER_COUNTS
+    results = run(single_bars, ticker_counts, args.repeat)
+
+    record = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"pipeline-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(record, f, indent=2)
+    print(f"Results written to {path}", file=sys.stderr)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    table, regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(record, f, indent=2)
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
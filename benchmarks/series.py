@@ -0,0 +1,103 @@
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from figures import price_figure
+from price_store import FrameProvider, PriceStore
+from signals import crossover_indices, ema_values
+from synthetic import gbm_ohlcv
+
+# Per-request latency and peak memory of the update_graph data path on long
+# histories: the DataFrame path (store.get, reset_index, column rebuild,
+# set_index, dropna, EMA columns, frame dumps at INFO) against the
+# series.PriceSeries path (store.get_series, Close only, EMAs on arrays).
+# Bars are read from a local PriceStore, as on a warm server.
+#
+#     python -m benchmarks.series
+#     python -m benchmarks.series --bars 100000 1000000 5000000
+#
+# data:  read through crossovers (what the representation affects)
+# total: data plus the figure and its dict conversion
+# peak:  tracemalloc peak over the data part and over the whole request, in MB
+
+
+def frame_request(store, ticker):
+    data = store.get(ticker, None, None)
+    str(data.head())
+    str(data)
+    data = data.reset_index()
+    data.columns = [col[0] if isinstance(col, tuple) else col for col in data.columns]
+    data.set_index('Date', inplace=True)
+    data = data.dropna(subset=['Close'])
+    data['EMA_5'] = data['Close'].ewm(span=5, adjust=False).mean()
+    data['EMA_13'] = data['Close'].ewm(span=13, adjust=False).mean()
+    data['EMA_8'] = data['Close'].ewm(span=8, adjust=False).mean()
+    str(data['Close'].tail())
+    str(data['EMA_5'].tail())
+    signals = crossover_indices(data['EMA_5'].to_numpy(), data['EMA_13'].to_numpy())
+    return data, signals
+
+
+def series_request(store, ticker, dtype=np.float64):
+    series = store.get_series(ticker, None, None, dtype=dtype)
+    close = series['Close']
+    series['EMA_5'] = ema_values(close, 5)
+    series['EMA_13'] = ema_values(close, 13)
+    series['EMA_8'] = ema_values(close, 8)
+    signals = crossover_indices(series['EMA_5'], series['EMA_13'])
+    return series, signals
+
+
+def measure(request, repeat):
+    best_data = best_total = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        data, signals = request()
+        data_done = time.perf_counter()
+        price_figure(data, 'SYN', signals=signals).to_dict()
+        finished = time.perf_counter()
+        best_data = min(best_data, data_done - started)
+        best_total = min(best_total, finished - started)
+
+    tracemalloc.start()
+    data, signals = request()
+    data_peak = tracemalloc.get_traced_memory()[1]
+    price_figure(data, 'SYN', signals=signals).to_dict()
+    total_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best_data, best_total, data_peak, total_peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the DataFrame and PriceSeries update_graph data paths.")
+    parser.add_argument('--bars', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for n_bars in args.bars:
+        print(f"{n_bars:,} bars...", file=sys.stderr)
+        frame = gbm_ohlcv(n_bars, freq='min' if n_bars > 50_000 else 'D')
+        store = PriceStore(tempfile.mkdtemp(), provider=FrameProvider({('SYN', '1d'): frame}), offline=True)
+        store.write('SYN', frame)
+        cases = (
+            ('frame', lambda: frame_request(store, 'SYN')),
+            ('series f8', lambda: series_request(store, 'SYN')),
+            ('series f4', lambda: series_request(store, 'SYN', np.float32)),
+        )
+        for name, request in cases:
+            data_s, total_s, data_peak, total_peak = measure(request, args.repeat)
+            rows.append({'bars': n_bars, 'path': name, 'data_ms': data_s * 1000, 'total_ms': total_s * 1000,
+                         'data_peak_mb': data_peak / 1e6, 'total_peak_mb': total_peak / 1e6})
+    table = pd.DataFrame(rows)
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.1f}"))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from synthetic import gbm_ohlcv
+
+# Startup time and throughput of the chart app served by `python
+# working_version.py` (Flask's built-in server, one process) against gunicorn
+# with pre-forked, preloaded workers (wsgi.create_app). Prices come from CSV
+# files in a temporary EMA_OFFLINE_DIR, so no network is needed.
+#
+#     python -m benchmarks.serving
+#     python -m benchmarks.serving --workers 1 2 4 --clients 16 --seconds 15
+#
+# startup: seconds from launching the server until /healthz answers
+# first:   latency of the first chart callback (cold caches in that worker)
+# rps:     chart callbacks per second from --clients keep-alive connections
+#          cycling through --tickers tickers
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+
+
+def write_prices(directory, tickers, days=400):
+    start = (pd.Timestamp.now().normalize() - pd.Timedelta(days=days - 1)).date()
+    for i, ticker in enumerate(tickers):
+        gbm_ohlcv(days, seed=i, start=str(start)).to_csv(os.path.join(directory, f"{ticker}_1d.csv"))
+
+
+def callback_body(ticker, n_clicks):
+    return json.dumps({
+        'output': '..price-graph.figure...current-price.children..',
+        'outputs': [{'id': 'price-graph', 'property': 'figure'}, {'id': 'current-price', 'property': 'children'}],
+        'inputs': [{'id': 'submit-button', 'property': 'n_clicks', 'value': n_clicks}],
+        'changedPropIds': ['submit-button.n_clicks'],
+        'state': [{'id': 'ticker-input', 'property': 'value', 'value': ticker}],
+    })
+
+
+def request(conn, method, path, body=None):
+    headers = {'Content-Type': 'application/json'} if body else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def wait_until_up(port, timeout=120):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            if request(conn, 'GET', '/healthz') == 200:
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+
+def load(port, tickers, clients, seconds):
+    counts = [0] * clients
+    errors = [0] * clients
+    deadline = time.perf_counter() + seconds
+
+    def client(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        n = 0
+        while time.perf_counter() < deadline:
+            ticker = tickers[(i + n) % len(tickers)]
+            n += 1
+            try:
+                ok = request(conn, 'POST', '/_dash-update-component', callback_body(ticker, n)) == 200
+            except OSError:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                ok = False
+            counts[i] += ok
+            errors[i] += not ok
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - started), sum(errors)
+
+
+def run_case(name, command, env, port, tickers, clients, seconds):
+    print(f"{name}...", file=sys.stderr)
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=REPO, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(port)
+        startup = time.perf_counter() - started
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        first_started = time.perf_counter()
+        request(conn, 'POST', '/_dash-update-component', callback_body(tickers[0], 1))
+        first = time.perf_counter() - first_started
+        rps, errors = load(port, tickers, clients, seconds)
+    finally:
+        process.terminate()
+        process.wait()
+    return {'server': name, 'startup_s': startup, 'first_ms': first * 1000, 'rps': rps, 'errors': errors}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare app.run with pre-forked gunicorn workers.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="gunicorn worker counts")
+    parser.add_argument('--clients', type=int, default=8, help="Concurrent client connections (default: 8)")
+    parser.add_argument('--seconds', type=float, default=10, help="Load duration per case (default: 10)")
+    parser.add_argument('--tickers', type=int, default=20, help="Distinct tickers requested (default: 20)")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    tickers = [f"SYN{i:03d}" for i in range(args.tickers)]
+    rows = []
+    with tempfile.TemporaryDirectory() as prices, tempfile.TemporaryDirectory() as store:
+        write_prices(prices, tickers)
+        env = dict(os.environ, EMA_OFFLINE_DIR=prices, EMA_STORE_DIR=store, PORT=str(args.port), PYTHONPATH=REPO)
+        rows.append(run_case('app.run', [sys.executable, 'working_version.py'], env, args.port,
+                             tickers, args.clients, args.seconds))
+        for workers in args.workers:
+            command = [sys.executable, '-m', 'gunicorn', '--preload', '--workers', str(workers),
+                       '--bind', f'127.0.0.1:{args.port}', 'wsgi:create_app()']
+            rows.append(run_case(f'gunicorn -w {workers}', command, dict(env, EMA_PRELOAD_TICKERS=','.join(tickers)),
+                                 args.port, tickers, args.clients, args.seconds))
+    print(f"{os.cpu_count()} CPU(s)")
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from fetch import HttpChartProvider, StandInChartServer
+from price_store import PriceStore
+from shared_cache import SharedArrayCache
+from timeframes import TimeframeCache
+
+# Load test of a multi-process deployment with and without the host-wide
+# shared cache. N worker processes (forked, like gunicorn workers) start
+# together and each serves the same charts, every ticker at three timeframes
+# over its full history, in its own random order. Upstream fetches go to a
+# local stand-in for the Yahoo chart API, which counts them.
+#
+#     python -m benchmarks.shared_cache
+#     python -m benchmarks.shared_cache --workers 1 2 4 8 --tickers 50 --latency 0.05
+#
+# fetches:   requests the upstream server saw
+# pss_mb:    total proportional set size of the workers once every chart is
+#            served (pages shared by k workers count 1/k to each), i.e. the
+#            memory the workers use between them
+# shared_mb: size of the shared cache files (in /dev/shm when available);
+#            the pages workers have mapped are also part of pss_mb
+# seconds:   wall time until every worker had served every chart
+
+TIMEFRAMES = ('1d', '1wk', '1mo')
+HISTORY_START = date(2000, 1, 1)
+
+
+def _pss_kb(pid):
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Pss:'):
+                return int(line.split()[1])
+    return 0
+
+
+def _worker(root, shared_root, url, tickers, seed, start, done, release):
+    provider = HttpChartProvider(url)
+    shared = SharedArrayCache(shared_root) if shared_root else None
+    store = PriceStore(root, provider=provider.fetch_sync, shared=shared)
+    timeframes = TimeframeCache(store, max_entries=len(tickers) * len(TIMEFRAMES))
+    order = list(tickers)
+    random.Random(seed).shuffle(order)
+    end = datetime.now().date()
+    held = []
+    start.wait()
+    for ticker in order:
+        store.refresh(ticker, HISTORY_START, end, '1d')
+        for timeframe in TIMEFRAMES:
+            # Keep the chart data referenced, as a worker's caches would
+            held.append(timeframes.series(ticker, timeframe, end - timedelta(days=5 * 365), end))
+    done.put(os.getpid())
+    release.wait()
+    provider.close()
+
+
+def run(n_workers, tickers, shared, server):
+    root = tempfile.mkdtemp(prefix='store-')
+    shared_root = tempfile.mkdtemp(prefix='shared-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None) \
+        if shared else None
+    ctx = multiprocessing.get_context('fork')
+    start, release, done = ctx.Event(), ctx.Event(), ctx.Queue()
+    before = server.requests
+    procs = [ctx.Process(target=_worker, args=(root, shared_root, server.url, tickers, seed, start, done, release))
+             for seed in range(n_workers)]
+    for proc in procs:
+        proc.start()
+    started = time.perf_counter()
+    start.set()
+    for _ in procs:
+        done.get()
+    elapsed = time.perf_counter() - started
+    pss = sum(_pss_kb(proc.pid) for proc in procs) / 1024
+    release.set()
+    for proc in procs:
+        proc.join()
+    shared_mb = 0.0
+    if shared_root:
+        shared_mb = sum(entry.stat().st_size for entry in os.scandir(shared_root) if entry.is_file()) / 2**20
+        shutil.rmtree(shared_root)
+    shutil.rmtree(root)
+    return {'workers': n_workers, 'cache': 'shared' if shared else 'per-process',
+            'fetches': server.requests - before, 'pss_mb': pss, 'shared_mb': shared_mb, 'seconds': elapsed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test workers with and without the shared cache.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--tickers', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.05, help="Upstream latency per request in seconds")
+    args = parser.parse_args(argv)
+
+    tickers = [f"SYN{i:03d}" for i in range(args.tickers)]
+    rows = []
+    with StandInChartServer(latency=args.latency) as server:
+        for n_workers in args.workers:
+            for shared in (False, True):
+                print(f"{n_workers} workers, {'shared' if shared else 'per-process'} cache...", file=sys.stderr)
+                rows.append(run(n_workers, tickers, shared, server))
+    table = pd.DataFrame(rows)
+    print(f"{args.tickers} tickers x {len(TIMEFRAMES)} timeframes, full daily history since {HISTORY_START}")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.1f}"))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from price_store import COLUMNS, yfinance_provider
+
+YAHOO_CHART_URL = 'https://query1.finance.yahoo.com'
+
+
+# Raised by ThreadedProvider when every worker thread is taken
+class ProviderBusy(RuntimeError):
+    pass
+
+
+# Async provider interface: `await provider.fetch(ticker, start, end, interval)`
+# returns a Date-indexed OHLCV frame. Blocking providers (yfinance_provider,
+# CsvProvider, ...) are adapted with ThreadedProvider.
+#
+# A blocking call cannot be cancelled: when AsyncFetcher gives up on an
+# attempt (asyncio.wait_for timing out) the thread running it carries on
+# until the provider itself returns or times out. So that such calls cannot
+# pile up, at most `max_workers` are outstanding, abandoned or not, and an
+# attempt made while all of them are taken fails straight away with
+# ProviderBusy (which AsyncFetcher retries after its backoff) instead of
+# queueing behind them. Give the wrapped provider its own timeout (as
+# yfinance_provider does) to bound how long a thread can stay stuck.
+class ThreadedProvider:
+    def __init__(self, provider=yfinance_provider, max_workers=8):
+        self.provider = provider
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fetch')
+
+    async def fetch(self, ticker, start, end, interval):
+        if not self._slots.acquire(blocking=False):
+            raise ProviderBusy(f"All {self.max_workers} fetch threads are busy")
+        try:
+            future = self._executor.submit(self.provider, ticker, start, end, interval)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is freed when the call returns, not when the caller stops waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+# Turn a Yahoo v8 chart JSON response into a Date-indexed OHLCV frame
+def parse_chart(payload):
+    chart = payload.get('chart', {})
+    if chart.get('error'):
+        raise ValueError(f"Chart error: {chart['error']}")
+    results = chart.get('result') or []
+    if not results or not results[0].get('timestamp'):
+        return pd.DataFrame(columns=list(COLUMNS), index=pd.DatetimeIndex([], name='Date'))
+    result = results[0]
+    quote = result['indicators']['quote'][0]
+    index = pd.DatetimeIndex(pd.to_datetime(np.asarray(result['timestamp'], dtype=np.int64), unit='s'), name='Date')
+    return pd.DataFrame({col: np.asarray(quote[col.lower()], dtype=np.float64) for col in COLUMNS}, index=index)
+
+
+# Provider that talks to a Yahoo-style chart HTTP API directly. Requests go
+# through one requests.Session whose connection pool is sized to the fetch
+# concurrency, so connections are kept alive and reused across tickers.
+class HttpChartProvider:
+    def __init__(self, base_url=YAHOO_CHART_URL, pool_size=8, timeout=10.0):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'Mozilla/5.0 (ema_strategy)'
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='http-fetch')
+
+    def fetch_sync(self, ticker, start, end, interval):
+        params = {
+            'period1': int(pd.Timestamp(start).timestamp()),
+            'period2': int(pd.Timestamp(end).timestamp()),
+            'interval': interval,
+        }
+        response = self.session.get(f"{self.base_url}/v8/finance/chart/{ticker}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return parse_chart(response.json())
+
+    async def fetch(self, ticker, start, end, interval):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.fetch_sync, ticker, start, end, interval)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+# Fetches many tickers concurrently through an async provider.
+# At most `concurrency` requests are in flight; each attempt is bounded by
+# `timeout` seconds and failed attempts are retried up to `retries` times with
+# exponential backoff (backoff, 2*backoff, 4*backoff, ... plus jitter).
+class AsyncFetcher:
+    def __init__(self, provider, concurrency=8, timeout=10.0, retries=3, backoff=0.5):
+        self.provider = provider
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.attempts = 0
+        self.failures = 0
+
+    async def _fetch_one(self, semaphore, ticker, start, end, interval):
+        for attempt in range(self.retries + 1):
+            async with semaphore:
+                self.attempts += 1
+                try:
+                    return await asyncio.wait_for(self.provider.fetch(ticker, start, end, interval), self.timeout)
+                except Exception as e:
+                    error = e
+            if attempt < self.retries:
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+                logging.info(f"Fetching {ticker} failed ({error!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        self.failures += 1
+        raise error
+
+    # {ticker: frame or exception}; one ticker failing does not stop the rest
+    async def fetch_many(self, requests):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [self._fetch_one(semaphore, ticker, start, end, interval) for ticker, start, end, interval in requests]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return {request: result for request, result in zip(requests, results)}
+
+    # Blocking entry point for synchronous callers such as Dash callbacks
+    def fetch_many_sync(self, requests):
+        return asyncio.run(self.fetch_many(list(requests)))
+
+
+# In-process HTTP stand-in for the Yahoo chart API, serving synthetic (or any
+# provider's) bars. `latency` adds a fixed delay per request and `failure_rate`
+# makes that share of requests answer 503, for load- and retry-testing
+# without network access.
+class StandInChartServer:
+    def __init__(self, provider=None, host='127.0.0.1', port=0, latency=0.0, failure_rate=0.0):
+        if provider is None:
+            from synthetic import SyntheticProvider
+            provider = SyntheticProvider()
+        self.provider = provider
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests += 1
+                url = urlparse(self.path)
+                if not url.path.startswith('/v8/finance/chart/'):
+                    self.send_error(404)
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.failure_rate and random.random() < server.failure_rate:
+                    self._send(503, b'{"chart": {"result": null, "error": "unavailable"}}')
+                    return
+                ticker = url.path.rsplit('/', 1)[-1]
+                query = parse_qs(url.query)
+                start = pd.Timestamp(int(query['period1'][0]), unit='s')
+                end = pd.Timestamp(int(query['period2'][0]), unit='s')
+                data = server.provider(ticker, start, end, query.get('interval', ['1d'])[0])
+                body = {
+                    'chart': {
+                        'result': [{
+                            'timestamp': (data.index.values.astype('datetime64[s]').astype(np.int64)).tolist(),
+                            'indicators': {'quote': [{col.lower(): data[col].tolist() for col in COLUMNS}]},
+                        }],
+                        'error': None,
+                    }
+                }
+                self._send(200, json.dumps(body).encode())
+
+            def _send(self, status, payload):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
@@ -0,0 +1,171 @@
+import base64
+import os
+from functools import lru_cache
+
+import numpy as np
+import plotly.graph_objs as go
+
+from signals import crossover_indices
+
+# Series longer than this are drawn with WebGL (Scattergl) instead of SVG
+WEBGL_MIN_POINTS = 1000
+
+# Line series longer than this are downsampled with LTTB before plotting;
+# a chart is rarely more than a couple of thousand pixels wide
+DEFAULT_MAX_POINTS = 2000
+
+# (column, trace name) of the lines drawn over the close
+EMA_LINES = (('EMA_5', 'EMA 5'), ('EMA_13', 'EMA 13'), ('EMA_8', 'EMA 8'))
+
+# Float type prices are sent to the browser in; float32 keeps about seven
+# significant digits, well past what a chart can show, at half the bytes
+CHART_DTYPE = np.dtype(os.environ.get('EMA_CHART_DTYPE', 'float32'))
+
+# Typed-array codes plotly.js decodes (it has no 64-bit integer arrays)
+TYPED_ARRAY_CODES = {'float32': 'f4', 'float64': 'f8', 'int32': 'i4', 'uint32': 'u4',
+                     'int16': 'i2', 'uint16': 'u2', 'int8': 'i1', 'uint8': 'u1'}
+
+
+# A plotly typed-array spec ({'dtype', 'bdata'}): the little-endian buffer
+# of `values` as `dtype`, base64-encoded straight from NumPy. plotly.js
+# decodes it into a typed array without parsing any numbers.
+def typed_array(values, dtype=np.float64):
+    values = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': TYPED_ARRAY_CODES[values.dtype.name], 'bdata': base64.b64encode(values.data).decode('ascii')}
+
+
+# Dates as float64 milliseconds since the epoch, which a plotly date axis
+# reads like date strings (and which float64 holds exactly)
+def epoch_ms(dates):
+    return np.asarray(dates).astype('datetime64[ns]').view(np.int64) / 1e6
+
+
+# Buckets up to this many points wide are searched for every possible
+# previously kept point at once (see lttb_indices); wider ones one by one
+LTTB_TABLE_MAX_BUCKET = 16
+
+
+# Largest-Triangle-Three-Buckets downsampling (Steinarsson, 2013).
+# Returns the positions of `n_out` points that keep the visual shape of
+# (x, y): the first and last points are always kept, and from each bucket in
+# between the point forming the largest triangle with the previously kept
+# point and the average of the next bucket is chosen.
+def lttb_indices(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket edges over the points between the first and the last, and the
+    # average of each bucket's successor (the last one's is the last point)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(np.r_[edges[1:], n])
+    avg_x = np.add.reduceat(x, edges[1:]) / counts
+    avg_y = np.add.reduceat(y, edges[1:]) / counts
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    if np.diff(edges).max() <= LTTB_TABLE_MAX_BUCKET:
+        out[1:-1] = _lttb_table(x, y, edges, avg_x, avg_y)
+        return out
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        area = np.abs((x[prev] - avg_x[b]) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y[b] - y[prev]))
+        prev = lo + int(np.argmax(area))
+        out[b + 1] = prev
+    return out
+
+
+# The points lttb_indices keeps from each bucket, with no Python loop: the
+# best point of every bucket is found for each point of the bucket before
+# it that could have been kept, as one (buckets, width, width) array, and
+# those choices are then chained from the first point by composing them
+# (a prefix scan in log2(buckets) steps)
+def _lttb_table(x, y, edges, avg_x, avg_y):
+    lo, size = edges[:-1], np.diff(edges)
+    width = int(size.max())
+    offsets = np.arange(width)
+    valid = offsets < size[:, None]
+    points = np.where(valid, lo[:, None] + offsets, lo[:, None])
+    px, py = np.empty(points.shape), np.empty(points.shape)
+    px[0], py[0] = x[0], y[0]
+    px[1:], py[1:] = x[points[:-1]], y[points[:-1]]
+    px, py = px[:, :, None], py[:, :, None]
+    cx, cy = x[points][:, None, :], y[points][:, None, :]
+    area = np.abs((px - avg_x[:, None, None]) * (cy - py) - (px - cx) * (avg_y[:, None, None] - py))
+    # choice[b, p]: offset kept in bucket b after offset p was kept in b - 1
+    choice = np.where(valid[:, None, :], area, -1.0).argmax(axis=2)
+    step = 1
+    while step < len(choice):
+        choice[step:] = np.take_along_axis(choice[step:], choice[:-step], axis=1)
+        step *= 2
+    return lo + choice[:, 0]
+
+
+def _line(trace_type, x_ms, values, name, keep, dtype):
+    if keep is not None:
+        x_ms, values = x_ms[keep], values[keep]
+    return {'type': trace_type, 'x': typed_array(x_ms), 'y': typed_array(values, dtype), 'mode': 'lines', 'name': name}
+
+
+# Layout shared by every price chart, with the plotly_white template expanded
+# (plotly.js does not know templates by name); built once
+@lru_cache(maxsize=1)
+def _base_layout():
+    layout = go.Layout(xaxis_title="Date", yaxis_title="Price", template="plotly_white").to_plotly_json()
+    layout['xaxis']['type'] = 'date'
+    return layout
+
+
+# Build the price chart used by the Dash apps, as a plain figure dict, from a
+# frame or a series.PriceSeries holding Close and the EMA_5/EMA_13/EMA_8
+# columns. Buy and sell crossovers are drawn as one marker trace each,
+# Scattergl is used for long series, and line series longer than
+# `max_points` are LTTB-downsampled (pass max_points=None to disable): the
+# points are picked on the close and the EMA lines, being smoother, are drawn
+# through the same ones.
+# `signals` is an optional precomputed (buy_idx, sell_idx) pair.
+#
+# Every x and y array is a binary typed array (see typed_array): dates as
+# float64 epoch milliseconds and prices as `dtype`. The dict is built
+# directly, without plotly's per-property validation, and Dash sends it as
+# it is, so no series ever becomes a Python list or a decimal string.
+def price_figure_dict(data, ticker, dates=None, max_points=DEFAULT_MAX_POINTS, webgl_min_points=WEBGL_MIN_POINTS,
+                      signals=None, dtype=CHART_DTYPE):
+    dates = np.asarray(data.index if dates is None else dates)
+    x_ms = epoch_ms(dates)
+    close = np.asarray(data['Close'], dtype=np.float64)
+    trace_type = 'scattergl' if len(close) > webgl_min_points else 'scatter'
+    keep = lttb_indices(x_ms, close, max_points) if max_points and len(close) > max_points else None
+
+    traces = [_line(trace_type, x_ms, close, 'Close', keep, dtype)]
+    for column, name in EMA_LINES:
+        traces.append(_line(trace_type, x_ms, np.asarray(data[column], dtype=np.float64), name, keep, dtype))
+
+    # Signals are sparse, so they are never downsampled
+    if signals is None:
+        signals = crossover_indices(data['EMA_5'], data['EMA_13'])
+    buy_idx, sell_idx = signals
+    traces.append({
+        'type': trace_type, 'x': typed_array(x_ms[buy_idx]), 'y': typed_array(close[buy_idx], dtype),
+        'mode': 'markers+text', 'name': 'Buy Signal',
+        'marker': {'symbol': 'triangle-up', 'size': 15, 'color': 'green'},
+        'text': [f'Buy: {price:.2f}' for price in close[buy_idx]], 'textposition': 'top center',
+    })
+    traces.append({
+        'type': trace_type, 'x': typed_array(x_ms[sell_idx]), 'y': typed_array(close[sell_idx], dtype),
+        'mode': 'markers+text', 'name': 'Sell Signal',
+        'marker': {'symbol': 'triangle-down', 'size': 15, 'color': 'red'},
+        'text': [f'Sell: {price:.2f}' for price in close[sell_idx]], 'textposition': 'bottom center',
+    })
+
+    layout = dict(_base_layout())
+    layout['title'] = {'text': f"{ticker.upper()} Prices with 5, 13, and 8-day EMAs and Buy/Sell Signals"}
+    return {'data': traces, 'layout': layout}
+
+
+# price_figure_dict() as a go.Figure, for callers that want to modify it
+def price_figure(data, ticker, dates=None, max_points=DEFAULT_MAX_POINTS, webgl_min_points=WEBGL_MIN_POINTS,
+                 signals=None, dtype=CHART_DTYPE):
+    return go.Figure(price_figure_dict(data, ticker, dates, max_points, webgl_min_points, signals, dtype))
@@ -0,0 +1,261 @@
+import itertools
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from metrics import stage
+
+# Backend used by predict_future_prices when none is given
+DEFAULT_FORECASTER = os.environ.get('EMA_FORECASTER', 'prophet')
+
+
+# Forecaster backends take a frame with 'Date' and 'Close' columns and return
+# a frame with 'ds', 'yhat', 'yhat_lower' and 'yhat_upper' whose last row is
+# the forecast `periods` calendar days past the last bar.
+class ProphetForecaster:
+    name = 'prophet'
+
+    def forecast(self, data, periods=30):
+        # Prophet (and its Stan backend) takes about a second to import, so it
+        # is only loaded once a Prophet forecast is actually requested
+        from prophet import Prophet
+
+        # Prepare data for Prophet
+        df = data[['Date', 'Close']].rename(columns={'Date': 'ds', 'Close': 'y'})
+
+        # Initialize and fit the model
+        model = Prophet()
+        model.fit(df)
+
+        # Make future predictions
+        future = model.make_future_dataframe(periods=periods)
+        forecast = model.predict(future)
+
+        return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+
+
+# Holt's linear trend method (additive level + trend exponential smoothing)
+# with a prediction interval from the one-step residuals, i.e. ETS(A,A,N).
+# With log=True it runs on log prices, giving an exponential trend and
+# strictly positive bands. Smoothing parameters are picked per series from
+# a small grid by one-step squared error. Everything is vectorized across
+# series, so forecast_many fits a whole universe in one pass.
+class HoltForecaster:
+    name = 'holt'
+
+    ALPHAS = (0.1, 0.2, 0.3, 0.5, 0.7, 0.9, 1.0)
+    BETAS = (0.01, 0.05, 0.1, 0.2)
+
+    def __init__(self, interval_width=0.8, log=True, alpha=None, beta=None):
+        # interval_width matches Prophet's default 80% band
+        self.interval_width = interval_width
+        self.log = log
+        self.alpha = alpha
+        self.beta = beta
+
+    # Fit every (alpha, beta) candidate on a bars x series array at once.
+    # Returns level, trend and residual std per series for the best candidate,
+    # plus the chosen alpha and beta.
+    def _fit(self, y):
+        alphas = self.ALPHAS if self.alpha is None else (self.alpha,)
+        betas = self.BETAS if self.beta is None else (self.beta,)
+        grid = np.array(list(itertools.product(alphas, betas)))
+        alpha = grid[:, 0, None]
+        beta = grid[:, 1, None]
+
+        # Start from the first close with a flat trend; seeding the trend from
+        # the first difference lets one noisy bar skew the whole forecast
+        n_bars, n_series = y.shape
+        level = np.broadcast_to(y[0], (len(grid), n_series)).copy()
+        trend = np.zeros((len(grid), n_series))
+        sse = np.zeros((len(grid), n_series))
+        for t in range(1, n_bars):
+            error = y[t] - (level + trend)
+            sse += error * error
+            new_level = level + trend + alpha * error
+            trend = trend + alpha * beta * error
+            level = new_level
+
+        best = np.argmin(sse, axis=0)
+        cols = np.arange(n_series)
+        dof = max(n_bars - 3, 1)
+        sigma = np.sqrt(sse[best, cols] / dof)
+        return level[best, cols], trend[best, cols], sigma, grid[best, 0], grid[best, 1]
+
+    # Forecast a bars x series array of closes `horizon` bars ahead.
+    # Returns (yhat, yhat_lower, yhat_upper), each of shape (horizon, series).
+    def forecast_many(self, closes, horizon):
+        closes = np.asarray(closes, dtype=np.float64)
+        if closes.ndim == 1:
+            closes = closes[:, None]
+        y = np.log(closes) if self.log else closes
+        level, trend, sigma, alpha, beta = self._fit(y)
+
+        steps = np.arange(1, horizon + 1)[:, None]
+        mean = level + steps * trend
+        # ETS(A,A,N) h-step variance: sigma^2 * (1 + sum_{j<h} (alpha + alpha*beta*j)^2)
+        j = np.arange(horizon)[:, None]
+        c = np.where(j == 0, 0.0, (alpha + alpha * beta * j) ** 2)
+        spread = NormalDist().inv_cdf(0.5 + self.interval_width / 2) * sigma * np.sqrt(1.0 + np.cumsum(c, axis=0))
+        lower, upper = mean - spread, mean + spread
+        if self.log:
+            return np.exp(mean), np.exp(lower), np.exp(upper)
+        return mean, lower, upper
+
+    def forecast(self, data, periods=30):
+        dates = pd.to_datetime(data['Date'])
+        closes = data['Close'].to_numpy(dtype=np.float64)
+        # Convert the calendar-day horizon into bars using the average bar spacing
+        # (about 1.4 days for stocks, 1 day for crypto)
+        spacing_days = (dates.iloc[-1] - dates.iloc[0]) / pd.Timedelta(days=1) / (len(dates) - 1) if len(dates) > 1 else 1.0
+        horizon = max(1, int(round(periods / max(spacing_days, 1e-9))))
+        yhat, lower, upper = self.forecast_many(closes, horizon)
+        ds = pd.date_range(dates.iloc[-1], periods=horizon + 1, freq=pd.Timedelta(days=periods / horizon))[1:]
+        return pd.DataFrame({'ds': ds, 'yhat': yhat[:, 0], 'yhat_lower': lower[:, 0], 'yhat_upper': upper[:, 0]})
+
+
+FORECASTERS = {
+    ProphetForecaster.name: ProphetForecaster,
+    HoltForecaster.name: HoltForecaster,
+}
+
+
+def get_forecaster(name=None):
+    name = name or DEFAULT_FORECASTER
+    if name not in FORECASTERS:
+        raise ValueError(f"Unknown forecaster {name!r}, expected one of {sorted(FORECASTERS)}")
+    return FORECASTERS[name]()
+
+
+# `forecaster` is a backend name or instance; defaults to DEFAULT_FORECASTER
+def predict_future_prices(data, periods=30, forecaster=None):
+    if forecaster is None or isinstance(forecaster, str):
+        forecaster = get_forecaster(forecaster)
+    return forecaster.forecast(data, periods=periods)
+
+
+def get_suggested_prices(forecast):
+    # Get the last predicted price
+    last_prediction = forecast.iloc[-1]
+    suggested_buy_price = last_prediction['yhat_lower']
+    suggested_sell_price = last_prediction['yhat_upper']
+
+    return suggested_buy_price, suggested_sell_price
+
+
+# The Date/Close frame the forecasters take, from a Date-column frame or a
+# series.PriceSeries
+def _date_close_frame(data):
+    if isinstance(data, pd.DataFrame):
+        return data[['Date', 'Close']].copy()
+    return pd.DataFrame({'Date': data.index, 'Close': data['Close']})
+
+
+# Cache key for a forecast: the same ticker, last bar and horizon always
+# produce the same suggestion, so a new bar is what invalidates it
+def forecast_key(ticker, data, periods=30):
+    if isinstance(data, pd.DataFrame):
+        last_date = pd.Timestamp(data['Date'].iloc[-1]).isoformat()
+    else:
+        last_date = data.last_date().isoformat()
+    return (ticker.upper(), last_date, int(periods))
+
+
+# Fits forecasts off the request path.
+# Jobs run on a thread pool (Prophet's Stan fit runs in a cmdstan subprocess,
+# so threads are enough to keep the Dash workers free). Finished suggestions
+# are kept in an LRU cache of at most `max_entries` keys, and a key that is
+# already being fitted is never submitted twice.
+# With a shared_cache.SharedArrayCache, finished suggestions are published
+# there too, so the workers of a multi-process server see each other's
+# results (a poll rarely lands on the worker that queued the fit).
+class ForecastWorker:
+    def __init__(self, forecast_fn=predict_future_prices, max_workers=2, max_entries=256, shared=None):
+        self.forecast_fn = forecast_fn
+        self.max_entries = max_entries
+        self.shared = shared
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='forecast')
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _shared_key(key):
+        return 'forecast-' + '-'.join(str(part) for part in key)
+
+    # (found, suggestion) from this process's cache or else the shared one;
+    # call with the lock held
+    def _cached(self, key):
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return True, self._cache[key]
+        if self.shared is not None:
+            published = self.shared.get(self._shared_key(key))
+            if published is not None:
+                suggestion = None if np.isnan(published).any() else (float(published[0]), float(published[1]))
+                self._store(key, suggestion)
+                return True, suggestion
+        return False, None
+
+    def _store(self, key, suggestion):
+        self._cache[key] = suggestion
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    # Cached (buy, sell) suggestion for `key`, or None when not ready or failed
+    def get(self, key):
+        with self._lock:
+            return self._cached(key)[1]
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    # Like get_or_submit() without queueing anything: ('missing', None) when
+    # `key` is neither cached nor being fitted in this process
+    def poll(self, key):
+        with self._lock:
+            found, suggestion = self._cached(key)
+            if found:
+                return ('ready', suggestion) if suggestion is not None else ('failed', None)
+            if key in self._pending:
+                return 'pending', None
+        return 'missing', None
+
+    # Return ('ready', (buy, sell)), ('pending', None) or ('failed', None) for
+    # `key`, queueing a fit when the cache is cold
+    def get_or_submit(self, key, data, periods=30):
+        with self._lock:
+            found, suggestion = self._cached(key)
+            if found:
+                return ('ready', suggestion) if suggestion is not None else ('failed', None)
+            if key not in self._pending:
+                data = _date_close_frame(data)
+                self._pending[key] = self._executor.submit(self._run, key, data, periods)
+        return 'pending', None
+
+    def _run(self, key, data, periods):
+        try:
+            with stage('forecast', 'fit'):
+                suggestion = get_suggested_prices(self.forecast_fn(data, periods=periods))
+        except Exception as e:
+            logging.error(f"Forecast for {key[0]} failed: {e}")
+            suggestion = None
+        # Failures are cached as None too, so a bad key is not refitted on every poll
+        with self._lock:
+            self._pending.pop(key, None)
+            self._store(key, suggestion)
+        if self.shared is not None:
+            published = np.full(2, np.nan) if suggestion is None else np.asarray(suggestion, dtype=np.float64)
+            self.shared.put(self._shared_key(key), published)
+        return suggestion
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,154 @@
+import logging
+import os
+import socket
+import threading
+import time
+
+# Host probed for data-provider reachability (yfinance talks to Yahoo's
+# query endpoints over HTTPS)
+PROVIDER_HOST = os.environ.get('EMA_PROVIDER_HOST', 'query1.finance.yahoo.com')
+PROVIDER_PORT = int(os.environ.get('EMA_PROVIDER_PORT', 443))
+
+# Seconds between probes, and how long a probe result is trusted
+PROBE_INTERVAL = float(os.environ.get('EMA_PROBE_INTERVAL', 30))
+PROBE_TTL = float(os.environ.get('EMA_PROBE_TTL', 90))
+
+
+# Probe that opens (and closes) a TCP connection
+def tcp_probe(host=PROVIDER_HOST, port=PROVIDER_PORT, timeout=3.0):
+    def probe():
+        socket.create_connection((host, port), timeout=timeout).close()
+    return probe
+
+
+# Probe for a local provider directory (EMA_OFFLINE_DIR)
+def directory_probe(path):
+    def probe():
+        if not os.path.isdir(path):
+            raise OSError(f"{path} is not a directory")
+    return probe
+
+
+# Tracks whether the data provider is reachable. A daemon thread runs
+# `probe` (a callable that raises on failure) every `interval` seconds and
+# caches the outcome; readers only ever look at the cached result, so no
+# request waits on a connectivity check. A result older than `ttl` is stale
+# and counts as unknown. While the state is unknown the provider is assumed
+# up, so a slow first probe never blocks fetching.
+# The thread is started on first use in each process, which keeps the monitor
+# usable in pre-forked servers.
+class HealthMonitor:
+    def __init__(self, probe=None, interval=PROBE_INTERVAL, ttl=PROBE_TTL, name='provider', clock=time.monotonic):
+        self.probe = probe or tcp_probe()
+        self.interval = interval
+        self.ttl = ttl
+        self.name = name
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._up = None
+        self._checked_at = None
+        self._latency = None
+        self._error = None
+        self.probes = 0
+        self.failures = 0
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name=f'health-{self.name}', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self.check()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    # Run the probe once, synchronously, and cache the outcome
+    def check(self):
+        started = time.perf_counter()
+        try:
+            self.probe()
+            up, error = True, None
+        except Exception as e:
+            up, error = False, str(e)
+        latency = time.perf_counter() - started
+        with self._lock:
+            if up != self._up:
+                logging.info(f"Data provider {self.name}: {'UP' if up else 'DOWN'}" + (f" ({error})" if error else ""))
+            self._up, self._error, self._latency = up, error, latency
+            self._checked_at = self.clock()
+            self.probes += 1
+            self.failures += not up
+        return up
+
+    # Record a failure seen outside the probe (e.g. a fetch error) and probe
+    # again soon rather than waiting for the next interval
+    def report_failure(self, error):
+        with self._lock:
+            self._up, self._error, self._checked_at = False, str(error), self.clock()
+        self._wake.set()
+
+    # True/False from a fresh probe result, None when unknown or stale
+    def state(self):
+        self._ensure_started()
+        with self._lock:
+            if self._checked_at is None or self.clock() - self._checked_at > self.ttl:
+                return None
+            return self._up
+
+    def is_up(self):
+        return self.state() is not False
+
+    def status(self):
+        up = self.state()
+        with self._lock:
+            age = None if self._checked_at is None else self.clock() - self._checked_at
+            return {
+                'name': self.name,
+                'status': {True: 'up', False: 'down', None: 'unknown'}[up],
+                'checked_seconds_ago': age,
+                'probe_latency_seconds': self._latency,
+                'error': self._error,
+                'probes': self.probes,
+                'failures': self.failures,
+            }
+
+
+# Monitor matching default_store(): the local directory when EMA_OFFLINE_DIR
+# is set, otherwise the Yahoo endpoint
+def default_monitor():
+    offline_dir = os.environ.get('EMA_OFFLINE_DIR')
+    if offline_dir:
+        return HealthMonitor(directory_probe(offline_dir), name='csv')
+    return HealthMonitor(tcp_probe(), name='yahoo')
+
+
+# /healthz: always 200 while the app can serve (stored data is used when the
+# provider is down); the body says whether it is running degraded
+def register_health_routes(server, monitor):
+    from flask import jsonify
+
+    @server.route('/healthz')
+    def healthz():
+        provider = monitor.status()
+        return jsonify({
+            'status': 'degraded' if provider['status'] == 'down' else 'ok',
+            'provider': provider,
+        })
+
+
+# Collector for /metrics: 1 when the provider is up, 0 when down, -1 unknown
+def health_collector(monitor):
+    def collect():
+        up = monitor.state()
+        return [
+            ('ema_provider_up', 'gauge', 'Data provider reachability (1 up, 0 down, -1 unknown).',
+             {(('provider', monitor.name),): -1 if up is None else int(up)}),
+        ]
+    return collect
@@ -0,0 +1,167 @@
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_SPANS = (5, 8, 13)
+
+# Timestamp of a row no dated close has been fed to
+NO_STAMP = np.iinfo(np.int64).min
+
+
+# Stateful EMA calculator for many tickers and spans.
+# With adjust=False the EMA is the recurrence
+#     ema[0] = close[0]
+#     ema[t] = (1 - alpha) * ema[t-1] + alpha * close[t],  alpha = 2 / (span + 1)
+# so only the last value per (ticker, span) needs to be kept. Each new close
+# costs O(number of spans) and the results match
+# Series.ewm(span=span, adjust=False).mean() for NaN-free input.
+# NaN closes are skipped and leave the state unchanged.
+# Callers feeding dated bars can pass their int64 timestamps along; the last
+# one per ticker is kept (and saved) so a restarted consumer knows which bars
+# the state already reflects.
+class EMAState:
+    def __init__(self, spans=DEFAULT_SPANS, capacity=16):
+        self.spans = tuple(int(span) for span in spans)
+        self.alphas = 2.0 / (np.asarray(self.spans, dtype=np.float64) + 1.0)
+        self._rows = {}
+        self._tickers = []
+        self._values = np.full((capacity, len(self.spans)), np.nan)
+        self._counts = np.zeros(capacity, dtype=np.int64)
+        self._stamps = np.full(capacity, NO_STAMP, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self._rows
+
+    @property
+    def tickers(self):
+        return list(self._tickers)
+
+    # Row of `ticker` in the state arrays, allocating one if needed
+    def row(self, ticker):
+        row = self._rows.get(ticker)
+        if row is None:
+            row = len(self._tickers)
+            if row == len(self._counts):
+                self._grow()
+            self._rows[ticker] = row
+            self._tickers.append(ticker)
+        return row
+
+    def rows(self, tickers):
+        return np.fromiter((self.row(ticker) for ticker in tickers), dtype=np.int64, count=len(tickers))
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self._counts))
+        values = np.full((capacity, len(self.spans)), np.nan)
+        values[:len(self._counts)] = self._values
+        counts = np.zeros(capacity, dtype=np.int64)
+        counts[:len(self._counts)] = self._counts
+        stamps = np.full(capacity, NO_STAMP, dtype=np.int64)
+        stamps[:len(self._stamps)] = self._stamps
+        self._values, self._counts, self._stamps = values, counts, stamps
+
+    # Apply one close per row. `rows` must not contain duplicates. `stamp`,
+    # the int64 timestamp of the closes, is recorded for the rows updated.
+    def update_rows(self, rows, closes, stamp=None):
+        closes = np.asarray(closes, dtype=np.float64)
+        valid = ~np.isnan(closes)
+        rows, closes = rows[valid], closes[valid]
+        prev = self._values[rows]
+        fresh = self._counts[rows] == 0
+        new = prev + self.alphas * (closes[:, None] - prev)
+        new[fresh] = closes[fresh, None]
+        self._values[rows] = new
+        self._counts[rows] += 1
+        if stamp is not None:
+            self._stamps[rows] = stamp
+        return new
+
+    # Feed one close for one ticker; returns the EMA per span
+    def update(self, ticker, close):
+        row = self.row(ticker)
+        self.update_rows(np.array([row]), [close])
+        return self._values[row].copy()
+
+    # Feed one close for each of many tickers at once (vectorized across tickers)
+    def update_many(self, tickers, closes):
+        rows = self.rows(tickers)
+        if len(np.unique(rows)) != len(rows):
+            raise ValueError("update_many got the same ticker more than once")
+        self.update_rows(rows, closes)
+        return self._values[rows].copy()
+
+    # Feed a batch of consecutive closes for one ticker; returns a
+    # (len(closes), len(spans)) array of EMA values after each close
+    def update_batch(self, ticker, closes):
+        row = self.row(ticker)
+        closes = np.asarray(closes, dtype=np.float64)
+        out = np.empty((len(closes), len(self.spans)))
+        value = self._values[row].copy()
+        count = int(self._counts[row])
+        decay = 1.0 - self.alphas
+        for i, close in enumerate(closes):
+            if close == close:
+                value = np.full_like(value, close) if count == 0 else decay * value + self.alphas * close
+                count += 1
+            out[i] = value
+        self._values[row] = value
+        self._counts[row] = count
+        return out
+
+    # Seed `ticker` with EMA values carried over from elsewhere (e.g. a
+    # previous request); `count` is how many closes they already reflect
+    def restore(self, ticker, values, count=1):
+        row = self.row(ticker)
+        self._values[row] = values
+        self._counts[row] = count
+
+    # Current EMA per span for `ticker`, as {span: value}
+    def value(self, ticker):
+        row = self._rows[ticker]
+        return dict(zip(self.spans, self._values[row].tolist()))
+
+    def values(self, tickers=None):
+        if tickers is None:
+            return self._values[:len(self._tickers)].copy()
+        return self._values[self.rows(tickers)].copy()
+
+    def count(self, ticker):
+        return int(self._counts[self._rows[ticker]])
+
+    # EMA values and close counts for rows from rows()/row(), for callers
+    # that keep row positions instead of tickers
+    def row_values(self, rows):
+        return self._values[rows]
+
+    def row_counts(self, rows):
+        return self._counts[rows]
+
+    # Timestamp of the last dated close per row (NO_STAMP if none)
+    def row_stamps(self, rows):
+        return self._stamps[rows]
+
+    # Saved to exactly `path` (np.savez would append .npz to a bare name),
+    # through a temp file swapped in so a crash never leaves half a state
+    def save(self, path):
+        n = len(self._tickers)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.npz.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, spans=np.asarray(self.spans), tickers=np.asarray(self._tickers, dtype=str),
+                     values=self._values[:n], counts=self._counts[:n], stamps=self._stamps[:n])
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            state = cls(spans=saved['spans'].tolist(), capacity=max(16, len(saved['tickers'])))
+            for ticker in saved['tickers'].tolist():
+                state.row(ticker)
+            n = len(state._tickers)
+            state._values[:n] = saved['values']
+            state._counts[:n] = saved['counts']
+            state._stamps[:n] = saved['stamps']
+        return state
@@ -0,0 +1,205 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from indicators import DEFAULT_SPANS
+from price_store import normalize_download, yfinance_provider
+from series import PriceSeries
+from signals import crossover_indices, ema_values
+
+# Intraday intervals and their bar length in seconds
+INTERVALS = {'1m': 60, '2m': 120, '5m': 300, '15m': 900, '30m': 1800, '60m': 3600, '90m': 5400, '1h': 3600}
+
+# How far back Yahoo serves each intraday interval, in days
+MAX_LOOKBACK_DAYS = {'1m': 7, '60m': 729, '1h': 729}
+DEFAULT_LOOKBACK_DAYS = 59
+
+# Bars kept per (ticker, interval), and how many (ticker, interval) buffers
+DEFAULT_CAPACITY = int(os.environ.get('EMA_INTRADAY_BARS', 1000))
+DEFAULT_MAX_RINGS = int(os.environ.get('EMA_INTRADAY_RINGS', 64))
+
+
+def is_intraday(interval):
+    return interval in INTERVALS
+
+
+# The most recent `capacity` bars of one series, with their EMAs, in
+# preallocated arrays. Every array is twice the capacity and each bar is
+# written to both halves, so the live window is always the contiguous slice
+# [start, start + count): readers get zero-copy views in time order and
+# appending never moves data. Memory is fixed when the ring is created.
+#
+# Appending a bar costs O(spans): its EMAs continue from the previous bar's.
+# A bar with the same timestamp as the newest one replaces it (intraday
+# providers keep revising the bar in progress); older bars are ignored.
+class BarRing:
+    def __init__(self, capacity=DEFAULT_CAPACITY, spans=DEFAULT_SPANS):
+        self.capacity = int(capacity)
+        self.spans = tuple(int(span) for span in spans)
+        self.alphas = {span: 2.0 / (span + 1.0) for span in self.spans}
+        self._dates = np.zeros(2 * self.capacity, dtype=np.int64)
+        self._close = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._ema = {span: np.zeros(2 * self.capacity, dtype=np.float64) for span in self.spans}
+        self.start = 0
+        self.count = 0
+        # Held by IntradayFeed while it appends or snapshots
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return self._dates.nbytes + self._close.nbytes + sum(values.nbytes for values in self._ema.values())
+
+    def last_date(self):
+        return int(self._dates[self.start + self.count - 1]) if self.count else None
+
+    def _put(self, pos, date, close, emas):
+        for i in (pos, pos + self.capacity):
+            self._dates[i] = date
+            self._close[i] = close
+            for span, value in emas.items():
+                self._ema[span][i] = value
+
+    def append(self, date, close):
+        date, close = int(date), float(close)
+        if np.isnan(close):
+            return False
+        last = self.last_date()
+        if last is not None and date < last:
+            return False
+        if last is not None and date == last:
+            if close == self._close[self.start + self.count - 1]:
+                return False
+            # Revise the newest bar: continue from the bar before it
+            pos = (self.start + self.count - 1) % self.capacity
+            prev = self.start + self.count - 2 if self.count > 1 else None
+        else:
+            if self.count < self.capacity:
+                pos = (self.start + self.count) % self.capacity
+                prev = self.start + self.count - 1 if self.count else None
+                self.count += 1
+            else:
+                # Full: overwrite the oldest bar
+                pos = self.start
+                prev = self.start + self.count - 1
+                self.start = (self.start + 1) % self.capacity
+        if prev is None:
+            emas = {span: close for span in self.spans}
+        else:
+            emas = {span: values[prev] + self.alphas[span] * (close - values[prev]) for span, values in self._ema.items()}
+        self._put(pos, date, close, emas)
+        return True
+
+    # Append many bars (int64 ns dates, closes) in time order. Filling an
+    # empty ring computes the EMAs over the whole history at once and keeps
+    # only the last `capacity` bars.
+    def extend(self, dates, closes):
+        dates = np.asarray(dates, dtype=np.int64)
+        closes = np.asarray(closes, dtype=np.float64)
+        valid = ~np.isnan(closes)
+        dates, closes = dates[valid], closes[valid]
+        if self.count == 0 and len(dates) > 1:
+            emas = {span: ema_values(closes, span) for span in self.spans}
+            keep = slice(max(0, len(dates) - self.capacity), len(dates))
+            n = keep.stop - keep.start
+            self.start, self.count = 0, n
+            for half in (0, self.capacity):
+                self._dates[half:half + n] = dates[keep]
+                self._close[half:half + n] = closes[keep]
+                for span in self.spans:
+                    self._ema[span][half:half + n] = emas[span][keep]
+            return n
+        return sum(self.append(date, close) for date, close in zip(dates, closes))
+
+    def dates(self):
+        return self._dates[self.start:self.start + self.count]
+
+    def close(self):
+        return self._close[self.start:self.start + self.count]
+
+    def ema(self, span):
+        return self._ema[span][self.start:self.start + self.count]
+
+    # Buy/sell bar positions within the window for the fast/slow crossover
+    def crossovers(self, fast=5, slow=13):
+        return crossover_indices(self.ema(fast), self.ema(slow))
+
+    # The window as a PriceSeries of views (Close and EMA_<span> columns).
+    # The views alias the ring: take them and use them before the next append.
+    def series(self, ticker, interval):
+        columns = {'Close': self.close()}
+        for span in self.spans:
+            columns[f'EMA_{span}'] = self.ema(span)
+        return PriceSeries(ticker, self.dates(), columns, interval)
+
+
+# Ring buffers for the (ticker, interval) pairs being watched, filled from
+# the provider. The first poll backfills as much history as the provider
+# serves for the interval; later polls only ask for bars since the newest one
+# held. The least recently used ring is dropped beyond `max_rings`, so total
+# memory is bounded by max_rings * capacity however long the server runs.
+# With a health.HealthMonitor nothing is fetched while the provider is down.
+class IntradayFeed:
+    def __init__(self, provider=yfinance_provider, capacity=DEFAULT_CAPACITY, spans=DEFAULT_SPANS,
+                 max_rings=DEFAULT_MAX_RINGS, health=None):
+        self.provider = provider
+        self.capacity = capacity
+        self.spans = spans
+        self.max_rings = max_rings
+        self.health = health
+        self._rings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ring(self, ticker, interval):
+        key = (ticker.upper(), interval)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = BarRing(self.capacity, self.spans)
+                while len(self._rings) > self.max_rings:
+                    self._rings.popitem(last=False)
+            self._rings.move_to_end(key)
+        return ring
+
+    # Fetch new bars into the ring; returns how many bars were added or revised
+    def poll(self, ticker, interval):
+        if not is_intraday(interval):
+            raise ValueError(f"{interval} is not an intraday interval; use one of {', '.join(INTERVALS)}")
+        ticker = ticker.upper()
+        ring = self.ring(ticker, interval)
+        if self.health is not None and not self.health.is_up():
+            return 0
+        end = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=1)
+        last = ring.last_date()
+        if last is None:
+            start = end - timedelta(days=MAX_LOOKBACK_DAYS.get(interval, DEFAULT_LOOKBACK_DAYS))
+        else:
+            # From the newest bar held, which may still have been in progress
+            start = pd.Timestamp(last).to_pydatetime()
+        try:
+            data = normalize_download(self.provider(ticker, start, end, interval))
+        except Exception as e:
+            logging.error(f"Fetching {ticker} {interval} bars failed, keeping buffered bars: {e}")
+            if self.health is not None:
+                self.health.report_failure(e)
+            return 0
+        dates = data.index.values.astype('datetime64[ns]').view(np.int64)
+        with ring.lock:
+            return ring.extend(dates, data['Close'].to_numpy())
+
+    # Snapshot of the window as a PriceSeries. Callbacks run on several
+    # threads, so the (at most `capacity` bar) window is copied out under the
+    # ring's lock rather than handed out as views another poll could change.
+    def series(self, ticker, interval):
+        ring = self.ring(ticker, interval)
+        with ring.lock:
+            view = ring.series(ticker.upper(), interval)
+            return PriceSeries(view.ticker, view.dates.copy(),
+                               {column: values.copy() for column, values in view.columns.items()}, interval)
@@ -0,0 +1,235 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from functools import wraps
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Set EMA_METRICS=0 to turn stage timing into a no-op
+ENABLED = os.environ.get('EMA_METRICS', '1') != '0'
+
+# Set EMA_PROFILING=1 to allow per-request profiling (PROFILE_HEADER and
+# /metrics/profile-next). Off by default: each profiled request writes a file
+# and logs a summary, so on a public app anyone could fill the disk with them.
+PROFILING = os.environ.get('EMA_PROFILING', '0') == '1'
+
+# Where per-request profiles are written
+PROFILE_DIR = os.environ.get('EMA_PROFILE_DIR', 'profiles')
+
+# Request header that turns on profiling for that one request
+PROFILE_HEADER = 'X-Profile'
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        # Linear scan: there are only a dozen buckets and most stages are fast
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+# Process-wide store of stage duration histograms, keyed by (callback, stage),
+# plus collectors that contribute extra Prometheus lines (e.g. cache counters)
+class Registry:
+    def __init__(self):
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def histogram(self, callback, stage):
+        key = (callback, stage)
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(key, Histogram())
+        return hist
+
+    def observe(self, callback, stage, seconds):
+        self.histogram(callback, stage).observe(seconds)
+
+    # `collect` returns an iterable of (name, type, help, {labels: value}) tuples
+    def add_collector(self, collect):
+        with self._lock:
+            self._collectors.append(collect)
+
+    # Everything in Prometheus text exposition format. Callbacks keep adding
+    # histograms while a scrape runs, so it works from a snapshot.
+    def render(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            collectors = list(self._collectors)
+        lines = [
+            '# HELP ema_stage_duration_seconds Time spent in each stage of a Dash callback.',
+            '# TYPE ema_stage_duration_seconds histogram',
+        ]
+        for (callback, stage), hist in histograms:
+            labels = f'callback="{callback}",stage="{stage}"'
+            with hist._lock:
+                counts, total, count = list(hist.counts), hist.sum, hist.count
+            cumulative = 0
+            for bound, n in zip(hist.buckets, counts):
+                cumulative += n
+                lines.append(f'ema_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'ema_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'ema_stage_duration_seconds_sum{{{labels}}} {total}')
+            lines.append(f'ema_stage_duration_seconds_count{{{labels}}} {count}')
+        for collect in collectors:
+            for name, kind, help_text, samples in collect():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples.items():
+                    label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+                    lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class _Stage:
+    __slots__ = ('callback', 'name', 'started')
+
+    def __init__(self, callback, name):
+        self.callback = callback
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registry.observe(self.callback, self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+# Time a block as one stage of a callback:
+#     with stage('update_graph', 'fetch'):
+#         data = store.get(...)
+def stage(callback, name):
+    if not ENABLED:
+        return _NO_STAGE
+    return _Stage(callback, name)
+
+
+_profile_next = threading.Event()
+
+
+# Arm the profiler for the next instrumented callback, whoever sends it
+def profile_next_request():
+    _profile_next.set()
+
+
+def _profiling_requested():
+    if not PROFILING:
+        return False
+    if _profile_next.is_set():
+        _profile_next.clear()
+        return True
+    try:
+        from flask import has_request_context, request
+    except ImportError:
+        return False
+    return has_request_context() and request.headers.get(PROFILE_HEADER) == '1'
+
+
+def _run_profiled(callback, func, args, kwargs):
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{callback}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(20)
+        logging.info(f"Profile of {callback} written to {path}\n{summary.getvalue()}")
+
+
+# Decorator for Dash callbacks: records the whole call as the 'total' stage
+# and, when profiling is enabled (EMA_PROFILING=1) and requested
+# (PROFILE_HEADER: 1 or profile_next_request()), runs that one call under
+# cProfile. With profiling off the only cost is a flag check.
+def instrumented(callback):
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiling_requested():
+                with stage(callback, 'total'):
+                    return _run_profiled(callback, func, args, kwargs)
+            with stage(callback, 'total'):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Expose /metrics on the app's Flask server, plus (with EMA_PROFILING=1)
+# /metrics/profile-next to arm the profiler for the next callback. Dash
+# serializes callback results after the callback returns, so the full HTTP
+# time of each Dash update is recorded too; 'request' minus the callback
+# 'total' is the serialization overhead.
+def register_metrics_routes(server):
+    from flask import Response, g, request
+
+    @server.before_request
+    def _start_timer():
+        g.ema_request_started = time.perf_counter()
+
+    @server.after_request
+    def _record_request(response):
+        started = g.pop('ema_request_started', None)
+        if ENABLED and started is not None and request.path.endswith('_dash-update-component'):
+            registry.observe('dash', 'request', time.perf_counter() - started)
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    if PROFILING:
+        @server.route('/metrics/profile-next', methods=['POST'])
+        def profile_next():
+            profile_next_request()
+            return Response('armed\n', mimetype='text/plain')
+
+
+# Collector for a ResultCache's counters
+def cache_collector(cache, name='chart'):
+    def collect():
+        stats = cache.stats()
+        return [
+            ('ema_result_cache_events_total', 'counter', 'Result cache lookups by outcome.',
+             {(('cache', name), ('event', event)): stats[event]
+              for event in ('hits', 'misses', 'coalesced', 'expired', 'evicted')}),
+            ('ema_result_cache_entries', 'gauge', 'Entries held in the result cache.',
+             {(('cache', name),): stats['entries']}),
+        ]
+    return collect
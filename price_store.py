@@ -0,0 +1,402 @@
+import logging
+import os
+import re
+import tempfile
+import threading
+from contextlib import ExitStack
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+# Columns kept for every bar, in storage order
+COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+DEFAULT_STORE_DIR = os.environ.get('EMA_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.price_store'))
+
+# Seconds a single download may take before it is given up on
+FETCH_TIMEOUT = float(os.environ.get('EMA_FETCH_TIMEOUT', 10))
+
+# Writes remembered per (ticker, interval) for revised_from()
+WRITE_LOG_ROWS = 64
+
+
+# Flatten a yf.download result (which may carry a (field, ticker) column
+# MultiIndex) into a Date-indexed frame holding only COLUMNS.
+def normalize_download(data):
+    if data is None or data.empty:
+        return pd.DataFrame(columns=list(COLUMNS), index=pd.DatetimeIndex([], name='Date'))
+    data = data.copy()
+    data.columns = [col[0] if isinstance(col, tuple) else col for col in data.columns]
+    if 'Date' in data.columns:
+        data = data.set_index('Date')
+    elif 'Datetime' in data.columns:
+        data = data.set_index('Datetime')
+    data.index = pd.to_datetime(data.index)
+    if data.index.tz is not None:
+        data.index = data.index.tz_convert('UTC').tz_localize(None)
+    data.index.name = 'Date'
+    for col in COLUMNS:
+        if col not in data.columns:
+            data[col] = np.nan
+    data = data[list(COLUMNS)].dropna(subset=['Close'])
+    return data[~data.index.duplicated(keep='last')].sort_index()
+
+
+# Default provider: download from Yahoo Finance
+def yfinance_provider(ticker, start, end, interval):
+    import yfinance as yf
+    return yf.download(ticker, start=start, end=end, interval=interval, progress=False, timeout=FETCH_TIMEOUT)
+
+
+# Local stand-in provider that serves bars from <directory>/<ticker>_<interval>.csv
+# files, so the store (and the apps) can run with no network at all.
+class CsvProvider:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, ticker, start, end, interval):
+        path = os.path.join(self.directory, f"{ticker}_{interval}.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        data = pd.read_csv(path, index_col=0, parse_dates=True)
+        data.index.name = 'Date'
+        return data.loc[(data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))]
+
+
+# In-process stand-in provider backed by a dict of {(ticker, interval): frame}.
+# It counts calls so callers can check how often the "network" was hit.
+class FrameProvider:
+    def __init__(self, frames):
+        self.frames = frames
+        self.calls = 0
+
+    def __call__(self, ticker, start, end, interval):
+        self.calls += 1
+        data = self.frames.get((ticker, interval))
+        if data is None:
+            return pd.DataFrame()
+        return data.loc[(data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))]
+
+
+# Stored bars in column-major form: a (1 + len(COLUMNS), n) array of 8-byte
+# words whose row 0 holds the int64 dates and whose other rows hold the
+# float64 COLUMNS (stored as their bit patterns). Every column, and every
+# date range of a column, is a contiguous zero-copy view of the memory map.
+# bars['Close'] returns a column; bars[lo:hi] a Bars view of a range.
+class Bars:
+    __slots__ = ('words',)
+
+    def __init__(self, words):
+        self.words = words
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((1 + len(COLUMNS), 0), dtype=np.int64))
+
+    @classmethod
+    def from_frame(cls, frame):
+        words = np.empty((1 + len(COLUMNS), len(frame)), dtype=np.int64)
+        words[0] = frame.index.values.astype('datetime64[ns]').view(np.int64)
+        for i, col in enumerate(COLUMNS, start=1):
+            words[i] = frame[col].to_numpy(dtype=np.float64).view(np.int64)
+        return cls(words)
+
+    def __len__(self):
+        return self.words.shape[1]
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key == 'Date':
+                return self.words[0]
+            return self.words[1 + COLUMNS.index(key)].view(np.float64)
+        return Bars(self.words[:, key])
+
+    def to_frame(self):
+        index = pd.DatetimeIndex(self['Date'].astype('datetime64[ns]'), name='Date')
+        return pd.DataFrame({col: self[col] for col in COLUMNS}, index=index)
+
+
+# On-disk OHLCV store keyed by (ticker, interval).
+# Each series lives in a single column-major .npy file (see Bars) that is
+# memory-mapped on read. Dates are sorted, so a [start, end) range is found
+# by binary search and returned as views: reading a window costs the same
+# however much history is stored, and only the pages of the requested
+# columns and range are touched. get() tops up a series by fetching just the
+# bars past the last stored one and merging them in. Every fetch goes through
+# a fetch.AsyncFetcher (`fetcher`, by default one running `provider` in
+# threads), so each attempt has a timeout and failures are retried with
+# backoff. With a health.HealthMonitor, fetching is skipped while the
+# provider is known to be down (stored bars are served as they are) and
+# fetch errors are reported back to the monitor.
+#
+# Every process using the same root reads the same files, so the bars
+# themselves are held once per host (in the page cache). With a
+# shared_cache.SharedArrayCache the fetching is coordinated across processes
+# too: a (ticker, interval) is topped up by one process at a time, under a
+# host-wide lock, and the others find the bars already stored once they get
+# the lock; the record of spans already fetched is shared as well.
+class PriceStore:
+    def __init__(self, root=DEFAULT_STORE_DIR, provider=yfinance_provider, offline=False, health=None, shared=None,
+                 fetcher=None):
+        self.root = root
+        self.provider = provider
+        self._fetcher = fetcher
+        self._fetcher_pid = None
+        self.offline = offline
+        self.health = health
+        self.shared = shared
+        self._lock = threading.Lock()
+        # One lock per (ticker, interval), held while it is fetched and written
+        self._key_locks = {}
+        # (start, end) span already fetched per (ticker, interval) in this process,
+        # so repeated requests over weekends or gaps with no bars stay off the network
+        self._fetched = {}
+        # write() log per (ticker, interval) when there is no shared cache
+        self._writes = {}
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, ticker, interval='1d'):
+        safe_ticker = re.sub(r'[^A-Za-z0-9._=^-]', '_', ticker.upper())
+        return os.path.join(self.root, f"{safe_ticker}__{interval}.cols.npy")
+
+    def _load(self, ticker, interval):
+        path = self.path(ticker, interval)
+        if os.path.exists(path):
+            return Bars(np.load(path, mmap_mode='r'))
+        return Bars.empty()
+
+    # Identity of the stored file for (ticker, interval): changes whenever
+    # write() replaces it. None when nothing is stored.
+    def version(self, ticker, interval='1d'):
+        try:
+            stat = os.stat(self.path(ticker, interval))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    # Every write() is logged as a (version written, version replaced,
+    # earliest date written) row, newest last, in the shared cache when
+    # there is one (other processes write too). A write never changes the
+    # bars before the earliest one it writes.
+    def _write_log(self, ticker, interval):
+        name = f"writes-{ticker.upper()}-{interval}"
+        return self.shared.get(name) if self.shared is not None else self._writes.get(name)
+
+    def _log_write(self, ticker, interval, written, replaced, first_date):
+        name = f"writes-{ticker.upper()}-{interval}"
+        row = np.array([[*written, *(replaced or (0, 0, 0)), first_date]], dtype=np.int64)
+        log = self._write_log(ticker, interval)
+        log = row if log is None else np.concatenate([log[-(WRITE_LOG_ROWS - 1):], row])
+        if self.shared is not None:
+            self.shared.put(name, log)
+        else:
+            self._writes[name] = log
+
+    # Earliest bar date (int64 ns) written to (ticker, interval) since its
+    # `version`: the bars before it are exactly as they were then, so a
+    # reader can tell what may have been revised without comparing bars.
+    # None when the write log does not reach back to `version`.
+    def revised_from(self, ticker, interval, version):
+        current = self.version(ticker, interval)
+        log = self._write_log(ticker, interval)
+        if current is None or version is None or log is None:
+            return None
+        links = {tuple(row[:3]): (tuple(row[3:6]), row[6]) for row in log.tolist()}
+        earliest = np.iinfo(np.int64).max
+        while current != tuple(version):
+            link = links.pop(current, None)
+            if link is None:
+                return None
+            current, first_date = link
+            earliest = min(earliest, first_date)
+        return earliest
+
+    # (first, last) stored bar timestamps, or None when nothing is stored
+    def coverage(self, ticker, interval='1d'):
+        bars = self._load(ticker, interval)
+        if len(bars) == 0:
+            return None
+        dates = bars['Date']
+        return pd.Timestamp(int(dates[0])), pd.Timestamp(int(dates[-1]))
+
+    # Bars in [start, end) as a view of the memory map; None means unbounded
+    def slice(self, ticker, interval='1d', start=None, end=None):
+        bars = self._load(ticker, interval)
+        dates = bars['Date']
+        lo = 0 if start is None else int(np.searchsorted(dates, pd.Timestamp(start).value, side='left'))
+        hi = len(bars) if end is None else int(np.searchsorted(dates, pd.Timestamp(end).value, side='left'))
+        return bars[lo:hi]
+
+    # Read bars in [start, end) from disk only
+    def read(self, ticker, interval='1d', start=None, end=None):
+        return self.slice(ticker, interval, start, end).to_frame()
+
+    # Like read(), but as a series.PriceSeries holding only `columns`. With the
+    # default float64 the columns are views of the memory map (no copy at all);
+    # another `dtype` converts each column once.
+    def read_series(self, ticker, interval='1d', start=None, end=None, columns=('Close',), dtype=None):
+        from series import DEFAULT_DTYPE, PriceSeries
+        return PriceSeries.from_records(ticker.upper(), self.slice(ticker, interval, start, end),
+                                        columns=columns, dtype=dtype or DEFAULT_DTYPE, interval=interval)
+
+    # Merge freshly fetched bars into the stored series; new bars win on overlap
+    def write(self, ticker, frame, interval='1d'):
+        new = Bars.from_frame(normalize_download(frame)).words
+        if new.shape[1] == 0:
+            return 0
+        replaced = self.version(ticker, interval)
+        old = self._load(ticker, interval).words
+        if self.version(ticker, interval) != replaced:
+            # Replaced while being read: which version this merges is unknown
+            replaced = None
+        if old.shape[1]:
+            old = old[:, ~np.isin(old[0], new[0])]
+            merged = np.concatenate([old, new], axis=1)
+            merged = merged[:, np.argsort(merged[0], kind='stable')]
+        else:
+            merged = new
+        # Write to a temp file and swap it in so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.npy.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, np.ascontiguousarray(merged))
+        stat = os.stat(tmp_path)
+        os.replace(tmp_path, self.path(ticker, interval))
+        self._log_write(ticker, interval, (stat.st_ino, stat.st_mtime_ns, stat.st_size), replaced, int(new[0][0]))
+        return new.shape[1]
+
+    # Date ranges that still need fetching to cover [start, end)
+    def missing_ranges(self, ticker, start, end, interval='1d'):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        span = self.coverage(ticker, interval)
+        if span is None:
+            return [(start, end)]
+        first, last = span
+        fetched_start, fetched_end = self._fetched_span(ticker, interval) or (first.normalize(), last.normalize() + timedelta(days=1))
+        ranges = []
+        if start < min(first.normalize(), fetched_start):
+            ranges.append((start, first.normalize()))
+        # Re-fetch from the last stored bar's day: it may have been partial
+        if end > max(last.normalize() + timedelta(days=1), fetched_end):
+            ranges.append((max(start, last.normalize()), end))
+        return ranges
+
+    # (start, end) span fetched so far for (ticker, interval), or None
+    def _fetched_span(self, ticker, interval):
+        if self.shared is not None:
+            span = self.shared.get(f"fetched-{ticker}-{interval}")
+            return None if span is None else (pd.Timestamp(int(span[0])), pd.Timestamp(int(span[1])))
+        return self._fetched.get((ticker, interval))
+
+    # Host-wide fetch locks for `tickers`, taken in order so that processes
+    # locking several tickers cannot deadlock; a no-op without a shared cache
+    def _fetch_locks(self, tickers, interval):
+        stack = ExitStack()
+        if self.shared is not None:
+            for ticker in sorted(tickers):
+                stack.enter_context(self.shared.lock(f"fetch-{ticker}-{interval}"))
+        return stack
+
+    def _should_fetch(self):
+        return not self.offline and (self.health is None or self.health.is_up())
+
+    def _report_failure(self, error):
+        if self.health is not None:
+            self.health.report_failure(error)
+
+    # The fetch.AsyncFetcher used for downloads. The default one is created on
+    # first use in each process, as its threads do not survive a fork.
+    @property
+    def fetcher(self):
+        if self._fetcher is None or self._fetcher_pid not in (None, os.getpid()):
+            from fetch import AsyncFetcher, ThreadedProvider
+            self._fetcher = AsyncFetcher(ThreadedProvider(self.provider), timeout=FETCH_TIMEOUT)
+            self._fetcher_pid = os.getpid()
+        return self._fetcher
+
+    def _key_lock(self, ticker, interval):
+        with self._lock:
+            return self._key_locks.setdefault((ticker, interval), threading.Lock())
+
+    def _requests(self, tickers, start, end, interval):
+        return [(ticker, fetch_start, fetch_end, interval)
+                for ticker in tickers
+                for fetch_start, fetch_end in self.missing_ranges(ticker, start, end, interval)]
+
+    # Fetch whatever the stored series of `tickers` are missing for [start,
+    # end), concurrently, and merge in what arrives. What is missing is
+    # checked without locking, so requests for series that are already
+    # stored never wait behind a fetch; only the tickers with something to
+    # fetch are locked (in this process and, with a shared cache, host-wide)
+    # and checked again, as another thread or process may have fetched them
+    # meanwhile.
+    def _top_up(self, tickers, start, end, interval, fetcher=None):
+        pending = sorted({ticker for ticker, *_ in self._requests(tickers, start, end, interval)})
+        if not pending:
+            return
+        with ExitStack() as stack:
+            for ticker in pending:
+                stack.enter_context(self._key_lock(ticker, interval))
+            stack.enter_context(self._fetch_locks(pending, interval))
+            requests = self._requests(pending, start, end, interval)
+            if not requests:
+                return
+            for ticker, fetch_start, fetch_end, _ in requests:
+                logging.info(f"Fetching {ticker} {interval} bars from {fetch_start.date()} to {fetch_end.date()}...")
+            results = (fetcher or self.fetcher).fetch_many_sync(
+                [(ticker, s.date(), e.date(), iv) for ticker, s, e, iv in requests])
+            errors = []
+            for (ticker, fetch_start, fetch_end, _), fetched in zip(requests, results.values()):
+                if isinstance(fetched, Exception):
+                    logging.error(f"Fetching {ticker} failed, serving stored data: {fetched!r}")
+                    errors.append(fetched)
+                    continue
+                self._merge_fetched(ticker, fetched, fetch_start, fetch_end, interval)
+            # One bad symbol is not an outage; every fetch failing is
+            if len(errors) == len(requests):
+                self._report_failure(errors[-1])
+
+    # Fetch whatever the stored series is missing for [start, end)
+    def refresh(self, ticker, start, end, interval='1d'):
+        if self._should_fetch():
+            self._top_up([ticker.upper()], start, end, interval)
+
+    # Top up the stored series for [start, end) and return that slice
+    def get(self, ticker, start, end, interval='1d'):
+        self.refresh(ticker, start, end, interval)
+        return self.read(ticker.upper(), interval, start, end)
+
+    # get() as a series.PriceSeries of `columns` (see read_series)
+    def get_series(self, ticker, start, end, interval='1d', columns=('Close',), dtype=None):
+        self.refresh(ticker, start, end, interval)
+        return self.read_series(ticker, interval, start, end, columns=columns, dtype=dtype)
+
+    def _merge_fetched(self, ticker, fetched, fetch_start, fetch_end, interval):
+        self.write(ticker, fetched, interval)
+        fetched_start, fetched_end = self._fetched_span(ticker, interval) or (fetch_start, fetch_end)
+        span = (min(fetched_start, fetch_start), max(fetched_end, fetch_end))
+        self._fetched[(ticker, interval)] = span
+        if self.shared is not None:
+            self.shared.put(f"fetched-{ticker}-{interval}", np.array([span[0].value, span[1].value], dtype=np.int64))
+
+    # get() for many tickers at once: every missing range is fetched
+    # concurrently (through `fetcher`, by default this store's) and the
+    # results are written as they are merged. Returns {ticker: frame}.
+    def get_many(self, tickers, start, end, interval='1d', fetcher=None):
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        if self._should_fetch():
+            self._top_up(tickers, start, end, interval, fetcher)
+        return {ticker: self.read(ticker, interval, start, end) for ticker in tickers}
+
+
+# Shared store used by the Dash apps. Set EMA_OFFLINE_DIR to a directory of
+# <ticker>_<interval>.csv files to run without network access, and
+# EMA_SHARED_CACHE_DIR to coordinate fetches between server processes.
+def default_store(health=None):
+    from shared_cache import default_shared_cache
+    shared = default_shared_cache()
+    offline_dir = os.environ.get('EMA_OFFLINE_DIR')
+    if offline_dir:
+        return PriceStore(provider=CsvProvider(offline_dir), health=health, shared=shared)
+    return PriceStore(health=health, shared=shared)
+
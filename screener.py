@@ -0,0 +1,223 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from signals import crossover_masks, ema
+
+# Frames with fewer bars x tickers cells than this are screened in-process;
+# below it the pool start-up and pickling cost more than the work itself
+PARALLEL_MIN_CELLS = 5_000_000
+
+TABLE_COLUMNS = ['Ticker', 'Signal', 'Bars Ago', 'Date', 'Close', 'EMA Fast', 'EMA Slow', 'Spread %']
+
+
+# Load a bars x tickers frame of closes.
+# With a PriceStore each ticker is served from disk, with missing bars for all
+# tickers fetched concurrently (see fetch.AsyncFetcher); otherwise all tickers
+# come from one batched yf.download call.
+def load_closes(tickers, days=60, interval='1d', store=None, fetcher=None):
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days)
+    if store is not None:
+        frames = store.get_many(tickers, start_date, end_date, interval=interval, fetcher=fetcher)
+        closes = {ticker: frames[ticker.upper()]['Close'] for ticker in tickers}
+        return pd.DataFrame(closes).sort_index()
+
+    import yfinance as yf
+    data = yf.download(list(tickers), start=start_date, end=end_date, interval=interval,
+                       group_by='column', progress=False, threads=True)
+    if data.empty:
+        return pd.DataFrame(columns=list(tickers))
+    if isinstance(data.columns, pd.MultiIndex):
+        closes = data['Close']
+    else:
+        closes = data[['Close']].rename(columns={'Close': tickers[0]})
+    return closes.dropna(how='all').sort_index()
+
+
+# Screen a bars x tickers frame of closes for fresh fast/slow EMA crossovers.
+# All EMAs and crossovers are computed as 2-D array operations; a ticker is
+# reported when its latest crossover happened within the last `lookback` bars.
+def screen_closes(closes, fast_span=5, slow_span=13, lookback=1):
+    if closes.empty:
+        return pd.DataFrame(columns=TABLE_COLUMNS)
+    fast = ema(closes, fast_span).to_numpy()
+    slow = ema(closes, slow_span).to_numpy()
+    buy, sell = crossover_masks(fast, slow)
+
+    n_bars = len(closes)
+    signal = buy | sell
+    # Position of the latest crossover per column (argmax of the reversed mask)
+    has_signal = signal.any(axis=0)
+    last_signal = n_bars - 1 - np.argmax(signal[::-1], axis=0)
+    # Bars since then are counted on each ticker's own bars: the union index
+    # of a mixed universe has weekend rows on which stocks have no close
+    valid = closes.notna().to_numpy()
+    later = np.cumsum(valid[::-1], axis=0)[::-1] - valid
+    bars_ago = later[last_signal, np.arange(closes.shape[1])]
+    fresh = has_signal & (bars_ago < lookback)
+    if not fresh.any():
+        return pd.DataFrame(columns=TABLE_COLUMNS)
+
+    cols = np.flatnonzero(fresh)
+    rows = last_signal[cols]
+    last_fast = fast[-1, cols]
+    last_slow = slow[-1, cols]
+    last_close = closes.ffill().to_numpy()[-1, cols]
+    table = pd.DataFrame({
+        'Ticker': closes.columns[cols],
+        'Signal': np.where(buy[rows, cols], 'Buy', 'Sell'),
+        'Bars Ago': bars_ago[cols],
+        'Date': closes.index[rows],
+        'Close': last_close,
+        'EMA Fast': last_fast,
+        'EMA Slow': last_slow,
+        'Spread %': 100.0 * (last_fast - last_slow) / last_slow,
+    })
+    # Freshest crossovers first, then the widest fast/slow spread
+    table['_strength'] = table['Spread %'].abs()
+    table = table.sort_values(['Bars Ago', '_strength'], ascending=[True, False])
+    return table.drop(columns='_strength').reset_index(drop=True)
+
+
+def _screen_chunk(args):
+    closes, fast_span, slow_span, lookback = args
+    return screen_closes(closes, fast_span, slow_span, lookback)
+
+
+# Screen a frame of closes, splitting the tickers across a process pool when
+# the universe is large enough for it to pay off
+def screen(closes, fast_span=5, slow_span=13, lookback=1, workers=None):
+    workers = workers or os.cpu_count() or 1
+    n_tickers = closes.shape[1]
+    if workers <= 1 or n_tickers < 2 or closes.size < PARALLEL_MIN_CELLS:
+        return screen_closes(closes, fast_span, slow_span, lookback)
+
+    chunks = np.array_split(np.arange(n_tickers), workers)
+    jobs = [(closes.iloc[:, chunk], fast_span, slow_span, lookback) for chunk in chunks if len(chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tables = [table for table in pool.map(_screen_chunk, jobs) if not table.empty]
+    if not tables:
+        return pd.DataFrame(columns=TABLE_COLUMNS)
+    table = pd.concat(tables, ignore_index=True)
+    table['_strength'] = table['Spread %'].abs()
+    table = table.sort_values(['Bars Ago', '_strength'], ascending=[True, False])
+    return table.drop(columns='_strength').reset_index(drop=True)
+
+
+# Load and screen a ticker universe; returns the ranked table and timing stats
+def run_screener(tickers, days=60, fast_span=5, slow_span=13, lookback=1, workers=None, store=None):
+    tickers = [ticker.strip().upper() for ticker in tickers if ticker.strip()]
+    started = time.perf_counter()
+    closes = load_closes(tickers, days=days, store=store)
+    loaded = time.perf_counter()
+    table = screen(closes, fast_span, slow_span, lookback, workers)
+    finished = time.perf_counter()
+
+    stats = {
+        'tickers': len(tickers),
+        'load_seconds': loaded - started,
+        'screen_seconds': finished - loaded,
+        'total_seconds': finished - started,
+    }
+    stats['screen_tickers_per_second'] = len(tickers) / stats['screen_seconds'] if stats['screen_seconds'] else float('inf')
+    stats['total_tickers_per_second'] = len(tickers) / stats['total_seconds'] if stats['total_seconds'] else float('inf')
+    logging.info(f"Screened {stats['tickers']} tickers in {stats['total_seconds']:.2f}s "
+                 f"({stats['total_tickers_per_second']:.1f} tickers/s, "
+                 f"{stats['screen_tickers_per_second']:.1f} tickers/s excluding data load)")
+    return table, stats
+
+
+def read_ticker_file(path):
+    with open(path) as f:
+        return [line.split('#')[0].strip() for line in f if line.split('#')[0].strip()]
+
+
+# Dash page: a ticker list box and a results table
+def screener_layout():
+    from dash import dash_table, dcc, html
+    return html.Div([
+        html.H1("5/13 EMA Crossover Screener"),
+        dcc.Textarea(id='screener-tickers', value='SOL-USD, BTC-USD, ETH-USD, AAPL, MSFT',
+                     style={'width': '100%', 'height': 80}),
+        html.Button(id='screener-button', n_clicks=0, children='Screen'),
+        html.Div(id='screener-stats', style={'marginTop': '10px'}),
+        dash_table.DataTable(id='screener-table', columns=[{'name': col, 'id': col} for col in TABLE_COLUMNS],
+                             sort_action='native', page_size=50),
+    ])
+
+
+def register_screener_callbacks(app, store=None):
+    from dash.dependencies import Input, Output, State
+
+    @app.callback(
+        [Output('screener-table', 'data'),
+         Output('screener-stats', 'children')],
+        [Input('screener-button', 'n_clicks')],
+        [State('screener-tickers', 'value')]
+    )
+    def update_screener(n_clicks, tickers):
+        try:
+            tickers = [ticker for ticker in tickers.replace(',', ' ').split()]
+            table, stats = run_screener(tickers, store=store)
+            table = table.assign(Date=table['Date'].astype(str)).round(4)
+            message = (f"{len(table)} fresh crossovers in {stats['tickers']} tickers, "
+                       f"{stats['total_seconds']:.2f}s ({stats['total_tickers_per_second']:.1f} tickers/s)")
+            return table.to_dict('records'), message
+        except Exception as e:
+            logging.error(f"Error occurred: {e}")
+            return [], f"Error: {str(e)}"
+
+    return update_screener
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen a ticker universe for fresh 5/13 EMA crossovers.")
+    parser.add_argument('tickers', nargs='*', help="Tickers to screen")
+    parser.add_argument('--file', help="File with one ticker per line")
+    parser.add_argument('--days', type=int, default=60, help="Days of history to load (default: 60)")
+    parser.add_argument('--fast', type=int, default=5, help="Fast EMA span (default: 5)")
+    parser.add_argument('--slow', type=int, default=13, help="Slow EMA span (default: 13)")
+    parser.add_argument('--lookback', type=int, default=1, help="Report crossovers within this many bars (default: 1)")
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument('--store', action='store_true', help="Read prices through the local price store")
+    parser.add_argument('--serve', action='store_true', help="Serve the screener as a Dash page")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = None
+    if args.store:
+        from price_store import default_store
+        store = default_store()
+
+    if args.serve:
+        from dash import Dash
+        app = Dash(__name__)
+        app.layout = screener_layout()
+        register_screener_callbacks(app, store=store)
+        port = int(os.environ.get("PORT", 8080))
+        app.run(debug=False, host='0.0.0.0', port=port)
+        return
+
+    tickers = list(args.tickers)
+    if args.file:
+        tickers += read_ticker_file(args.file)
+    if not tickers:
+        parser.error("no tickers given")
+
+    table, stats = run_screener(tickers, days=args.days, fast_span=args.fast, slow_span=args.slow,
+                                lookback=args.lookback, workers=args.workers, store=store)
+    print(table.to_string(index=False) if not table.empty else "No fresh crossovers.")
+    print(f"\n{stats['tickers']} tickers: load {stats['load_seconds']:.2f}s, screen {stats['screen_seconds']:.3f}s, "
+          f"{stats['total_tickers_per_second']:.1f} tickers/s overall, "
+          f"{stats['screen_tickers_per_second']:.1f} tickers/s screening")
+
+
+if __name__ == '__main__':
+    main()
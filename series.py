@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Float type of the price columns; float32 halves their memory at the cost of
+# about seven significant digits
+DEFAULT_DTYPE = np.dtype(os.environ.get('EMA_SERIES_DTYPE', 'float64'))
+
+
+# Compact price series used on the update_graph path: one int64 timestamp
+# array (nanoseconds since the epoch) plus one contiguous float array per
+# column actually used, instead of a full OHLCV DataFrame. Built straight from
+# the store's memory-mapped bars (see PriceStore.read_series): float64 columns
+# are views of the map and other dtypes are converted once. Columns are read
+# with series['Close'] and added with series['EMA_5'] = values; `index` is a
+# datetime64 view of the timestamps, which lets figures.price_figure draw a
+# PriceSeries like a frame.
+class PriceSeries:
+    __slots__ = ('ticker', 'interval', 'dates', 'columns')
+
+    def __init__(self, ticker, dates, columns, interval='1d'):
+        self.ticker = ticker
+        self.interval = interval
+        self.dates = dates
+        self.columns = columns
+
+    # From anything indexable by column name with a 'Date' column of int64
+    # nanoseconds, e.g. price_store.Bars or structured records
+    @classmethod
+    def from_records(cls, ticker, records, columns=('Close',), dtype=DEFAULT_DTYPE, interval='1d'):
+        dates = np.asarray(records['Date'], dtype=np.int64)
+        return cls(ticker, dates, {col: np.ascontiguousarray(records[col], dtype=dtype) for col in columns}, interval)
+
+    # From a Date-indexed frame, e.g. a provider's output
+    @classmethod
+    def from_frame(cls, ticker, frame, columns=('Close',), dtype=DEFAULT_DTYPE, interval='1d'):
+        dates = np.asarray(frame.index.values.astype('datetime64[ns]').view(np.int64))
+        return cls(ticker, dates, {col: np.ascontiguousarray(frame[col].to_numpy(), dtype=dtype) for col in columns},
+                   interval)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def __setitem__(self, column, values):
+        values = np.ascontiguousarray(values)
+        if len(values) != len(self.dates):
+            raise ValueError(f"{column} has {len(values)} values for {len(self.dates)} bars")
+        self.columns[column] = values
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    @property
+    def empty(self):
+        return len(self.dates) == 0
+
+    @property
+    def index(self):
+        return self.dates.view('datetime64[ns]')
+
+    def last_date(self):
+        return pd.Timestamp(int(self.dates[-1]))
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + sum(values.nbytes for values in self.columns.values())
+
+    # DataFrame copy, for code that still needs one (forecasting, debugging)
+    def to_frame(self):
+        return pd.DataFrame(self.columns, index=pd.DatetimeIndex(self.index, name='Date'))
+
+    # The last `n` bars as text; only called when debug logging is on
+    def tail(self, n=5):
+        return self.to_frame().tail(n).to_string()
+
+    def __repr__(self):
+        if self.empty:
+            return f"PriceSeries({self.ticker} {self.interval}, empty)"
+        first, last = pd.Timestamp(int(self.dates[0])), self.last_date()
+        return (f"PriceSeries({self.ticker} {self.interval}, {len(self)} bars {first} to {last}, "
+                f"columns={list(self.columns)}, {self.nbytes:,} bytes)")
@@ -0,0 +1,131 @@
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+# Directory of the host-wide cache; on Linux /dev/shm keeps it in memory
+DEFAULT_SHARED_DIR = os.environ.get('EMA_SHARED_CACHE_DIR') or (
+    os.path.join('/dev/shm', 'ema_strategy') if os.path.isdir('/dev/shm') else
+    os.path.join(tempfile.gettempdir(), 'ema_strategy'))
+
+# Bytes of arrays kept before the least recently used entries are evicted
+DEFAULT_SHARED_BYTES = int(os.environ.get('EMA_SHARED_CACHE_BYTES', 512 * 2**20))
+
+
+# Array cache shared by every process on a host, e.g. the workers of a
+# pre-fork server. Each entry is one .npy file in `root`:
+#   - put() writes it to a temp file and renames it into place, so an entry
+#     is published atomically and readers see either nothing or all of it;
+#   - get() memory-maps it, so however many workers read an entry, its
+#     pages are held once, in the page cache;
+#   - once the entries exceed `max_bytes`, the least recently used ones are
+#     deleted (workers still mapping a deleted entry keep their view).
+# lock() is a host-wide lock (flock on a file in `root`), used to let one
+# worker fetch or compute something while the others wait and then read it.
+class SharedArrayCache:
+    def __init__(self, root=DEFAULT_SHARED_DIR, max_bytes=DEFAULT_SHARED_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'locks'), exist_ok=True)
+
+    # File name for `key`: readable, and unique thanks to a hash of the key
+    def path(self, key):
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        return os.path.join(self.root, f"{re.sub(r'[^A-Za-z0-9._=^-]', '_', key)[:80]}.{digest}.npy")
+
+    # The array stored under `key` as a read-only memory map, or None
+    def get(self, key):
+        path = self.path(key)
+        try:
+            array = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            # Reads bump the access time that eviction goes by
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return array
+
+    def put(self, key, array):
+        array = np.ascontiguousarray(array)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self.puts += 1
+        if self.max_bytes is not None:
+            self.evict()
+
+    # Delete least recently used entries until the total fits in max_bytes
+    def evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.name.endswith('.npy') and entry.is_file():
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        if total <= self.max_bytes:
+            return 0
+        evicted = 0
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            evicted += 1
+            if total <= self.max_bytes:
+                break
+        with self._lock:
+            self.evictions += evicted
+        logging.debug(f"Evicted {evicted} shared cache entries")
+        return evicted
+
+    # Host-wide exclusive lock named `name`
+    @contextmanager
+    def lock(self, name):
+        path = os.path.join(self.root, 'locks', re.sub(r'[^A-Za-z0-9._=^-]', '_', name))
+        with open(path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'puts': self.puts, 'evictions': self.evictions}
+
+
+# The host-wide cache when EMA_SHARED_CACHE_DIR is set, else None
+def default_shared_cache():
+    if os.environ.get('EMA_SHARED_CACHE_DIR'):
+        return SharedArrayCache()
+    return None
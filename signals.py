@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+
+# Compute an EMA the same way update_graph does (pandas ewm with adjust=False).
+# Works on a Series (one ticker) or a DataFrame (one column per ticker).
+# ignore_na=True makes the gaps in a multi-ticker frame (e.g. weekends for
+# stocks next to crypto) behave as if each column had been dropna'd first.
+def ema(close, span):
+    return close.ewm(span=span, adjust=False, ignore_na=True).mean()
+
+
+# ema() for a 1-D NumPy array, returned as an array of the same dtype.
+# The array is wrapped without copying, so only the result is allocated.
+def ema_values(values, span):
+    values = np.asarray(values)
+    result = pd.Series(values, copy=False).ewm(span=span, adjust=False, ignore_na=True).mean().to_numpy()
+    return result.astype(values.dtype, copy=False) if values.dtype.kind == 'f' else result
+
+
+# Boolean buy/sell masks for fast/slow EMA crossovers.
+# A buy fires on bar i when fast crosses above slow:
+#     fast[i] > slow[i] and fast[i-1] <= slow[i-1]
+# A sell fires on bar i when fast crosses below slow:
+#     fast[i] < slow[i] and fast[i-1] >= slow[i-1]
+# Inputs may be 1-D (bars) or 2-D (bars x tickers); the first axis is time.
+def crossover_masks(fast, slow):
+    fast = np.asarray(fast, dtype=np.float64)
+    slow = np.asarray(slow, dtype=np.float64)
+    if fast.shape != slow.shape:
+        raise ValueError(f"fast and slow must have the same shape, got {fast.shape} and {slow.shape}")
+
+    buy = np.zeros(fast.shape, dtype=bool)
+    sell = np.zeros(fast.shape, dtype=bool)
+    if fast.shape[0] < 2:
+        return buy, sell
+
+    curr_fast, curr_slow = fast[1:], slow[1:]
+    prev_fast, prev_slow = fast[:-1], slow[:-1]
+    np.logical_and(curr_fast > curr_slow, prev_fast <= prev_slow, out=buy[1:])
+    np.logical_and(curr_fast < curr_slow, prev_fast >= prev_slow, out=sell[1:])
+    return buy, sell
+
+
+# Row indices of buy and sell crossovers.
+# For 1-D input each result is an array of bar positions; for 2-D input each
+# result is a (bar_positions, column_positions) tuple as returned by np.nonzero.
+def crossover_indices(fast, slow):
+    buy, sell = crossover_masks(fast, slow)
+    if buy.ndim == 1:
+        return np.flatnonzero(buy), np.flatnonzero(sell)
+    return np.nonzero(buy), np.nonzero(sell)
+
+
+# Compute the fast/slow EMAs of `close` and return their crossover masks.
+# `close` is a Series or a DataFrame with one column per ticker.
+def ema_crossovers(close, fast_span=5, slow_span=13):
+    if fast_span >= slow_span:
+        raise ValueError(f"fast_span must be smaller than slow_span, got {fast_span} and {slow_span}")
+    fast = ema(close, fast_span)
+    slow = ema(close, slow_span)
+    buy, sell = crossover_masks(fast.to_numpy(), slow.to_numpy())
+    if isinstance(close, pd.DataFrame):
+        return (pd.DataFrame(buy, index=close.index, columns=close.columns),
+                pd.DataFrame(sell, index=close.index, columns=close.columns))
+    return pd.Series(buy, index=close.index), pd.Series(sell, index=close.index)
+
+
+# Build the (date, close) signal lists used by the Dash apps from a frame that
+# already holds the Close and EMA columns.
+def signal_points(data, fast_col='EMA_5', slow_col='EMA_13', dates=None):
+    buy_idx, sell_idx = crossover_indices(data[fast_col].to_numpy(), data[slow_col].to_numpy())
+    dates = data.index if dates is None else pd.Index(dates)
+    close = data['Close'].to_numpy()
+    buy_signals = list(zip(dates[buy_idx], close[buy_idx]))
+    sell_signals = list(zip(dates[sell_idx], close[sell_idx]))
+    return buy_signals, sell_signals
@@ -0,0 +1,64 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+# Deterministic geometric Brownian motion closes, shape (n_bars, n_tickers).
+# mu and sigma are per-bar drift and volatility of the log returns.
+def gbm_paths(n_bars, n_tickers=1, seed=0, mu=0.0002, sigma=0.02, start_price=100.0, dtype=np.float64):
+    rng = np.random.default_rng(seed)
+    paths = rng.normal(mu - 0.5 * sigma * sigma, sigma, size=(n_bars, n_tickers)).astype(dtype)
+    paths[0] = 0.0
+    np.cumsum(paths, axis=0, out=paths)
+    np.exp(paths, out=paths)
+    paths *= start_price
+    return paths
+
+
+def synthetic_tickers(n_tickers):
+    return [f"SYN{i:05d}" for i in range(n_tickers)]
+
+
+# Bars x tickers frame of GBM closes on a daily (or `freq`) calendar
+def gbm_closes(n_bars, n_tickers=1, seed=0, freq='D', start='2000-01-01', **kwargs):
+    index = pd.date_range(start, periods=n_bars, freq=freq, name='Date')
+    return pd.DataFrame(gbm_paths(n_bars, n_tickers, seed, **kwargs), index=index, columns=synthetic_tickers(n_tickers))
+
+
+# Single-ticker OHLCV frame shaped like a flattened yf.download result.
+# Open is the previous close; High/Low add intrabar noise around Open/Close.
+def gbm_ohlcv(n_bars, seed=0, freq='D', start='2000-01-01', sigma=0.02, **kwargs):
+    close = gbm_paths(n_bars, 1, seed, sigma=sigma, **kwargs)[:, 0]
+    rng = np.random.default_rng(seed + 1)
+    open_ = np.empty_like(close)
+    open_[0] = close[0]
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.normal(0.0, sigma / 2, size=(2, n_bars)))
+    high = np.maximum(open_, close) * (1.0 + wick[0])
+    low = np.minimum(open_, close) * (1.0 - wick[1])
+    volume = rng.integers(1_000, 1_000_000, size=n_bars).astype(np.float64)
+    index = pd.date_range(start, periods=n_bars, freq=freq, name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+
+# Offline stand-in for yfinance_provider: every ticker gets its own
+# deterministic GBM history (seeded from the ticker name) on a daily calendar
+# starting at `origin`, and requests are answered from it.
+class SyntheticProvider:
+    def __init__(self, origin='2000-01-01', days=None):
+        self.origin = pd.Timestamp(origin)
+        self.days = days or (pd.Timestamp.now().normalize() - self.origin).days + 1
+        self.calls = 0
+        self._frames = {}
+
+    def frame(self, ticker):
+        if ticker not in self._frames:
+            seed = zlib.crc32(ticker.encode())
+            self._frames[ticker] = gbm_ohlcv(self.days, seed=seed, start=self.origin)
+        return self._frames[ticker]
+
+    def __call__(self, ticker, start, end, interval):
+        self.calls += 1
+        data = self.frame(ticker)
+        return data.loc[(data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))]
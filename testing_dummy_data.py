@@ -1,18 +1,21 @@
-import yfinance as yf
 import pandas as pd
-import numpy as np
 import plotly.graph_objs as go
 from datetime import datetime, timedelta
 from dash import Dash, dcc, html
 from dash.dependencies import Input, Output, State
-import socket
 import os
 import traceback
 import logging
 
+from figures import price_figure
+from synthetic import SyntheticProvider
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# Deterministic synthetic prices, so this app runs without network access
+provider = SyntheticProvider()
+
 # Initialize the Dash app
 app = Dash(__name__)
 
@@ -25,16 +28,6 @@ app.layout = html.Div([
     html.Div(id='current-price', style={'marginTop': '20px'}),
 ])
 
-# Test internet connection
-def test_internet():
-    try:
-        socket.create_connection(("www.google.com", 80), timeout=5)
-        logging.info("Internet connection: OK")
-        return True
-    except OSError:
-        logging.info("Internet connection: FAILED")
-        return False
-
 # Callback to update the graph
 @app.callback(
     [Output('price-graph', 'figure'),
@@ -48,16 +41,14 @@ def update_graph(n_clicks, ticker):
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=60)
 
-        # Download the data for the last 60 days (daily intervals)
-        logging.info(f"Fetching data for {ticker}...")
-        data = yf.download(ticker, start=start_date, end=end_date, interval='1d')
+        # Generate dummy data for the last 60 days (daily intervals)
+        logging.info(f"Generating data for {ticker}...")
+        data = provider(ticker.upper(), start_date, end_date, '1d')
 
-        # Debugging information
-        logging.info(f"Data columns for {ticker}: {data.columns}")
-        logging.info(f"First few rows of data for {ticker}:")
-        logging.info(data.head())
-        logging.info(f"Full data for {ticker}:")
-        logging.info(data)
+        # Debug dumps are only rendered when debug logging is on
+        logging.debug("Data columns for %s: %s", ticker, data.columns)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"First few rows of data for {ticker}:\n{data.head()}")
 
         if data.empty:
             logging.info("No data retrieved.")
@@ -86,51 +77,13 @@ def update_graph(n_clicks, ticker):
         data['EMA_8'] = data['Close'].ewm(span=8, adjust=False).mean()
 
         # Debug prints
-        logging.info("Close prices:")
-        logging.info(data['Close'].tail())
-        logging.info("EMA_5:")
-        logging.info(data['EMA_5'].tail())
-
-        # Generate buy/sell signals
-        buy_signals = []
-        sell_signals = []
-
-        for i in range(1, len(data)):
-            if data['EMA_5'].iloc[i] > data['EMA_13'].iloc[i] and data['EMA_5'].iloc[i-1] <= data['EMA_13'].iloc[i-1]:
-                buy_signals.append((data.index[i], data['Close'].iloc[i]))
-            elif data['EMA_5'].iloc[i] < data['EMA_13'].iloc[i] and data['EMA_5'].iloc[i-1] >= data['EMA_13'].iloc[i-1]:
-                sell_signals.append((data.index[i], data['Close'].iloc[i]))
-
-        # Create figure
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=data.index, y=data['Close'], mode='lines', name='Close'))
-        fig.add_trace(go.Scatter(x=data.index, y=data['EMA_5'], mode='lines', name='EMA 5'))
-        fig.add_trace(go.Scatter(x=data.index, y=data['EMA_13'], mode='lines', name='EMA 13'))
-        fig.add_trace(go.Scatter(x=data.index, y=data['EMA_8'], mode='lines', name='EMA 8'))
-
-        # Add buy signals
-        for signal in buy_signals:
-            fig.add_trace(go.Scatter(
-                x=[signal[0]], y=[signal[1]], mode='markers+text', name='Buy Signal',
-                marker=dict(symbol='triangle-up', size=15, color='green'),
-                text=[f'Buy: {signal[1]:.2f}'], textposition='top center'
-            ))
-
-        # Add sell signals
-        for signal in sell_signals:
-            fig.add_trace(go.Scatter(
-                x=[signal[0]], y=[signal[1]], mode='markers+text', name='Sell Signal',
-                marker=dict(symbol='triangle-down', size=15, color='red'),
-                text=[f'Sell: {signal[1]:.2f}'], textposition='bottom center'
-            ))
-
-        # Update layout
-        fig.update_layout(
-            title=f"{ticker.upper()} Prices with 5, 13, and 8-day EMAs and Buy/Sell Signals",
-            xaxis_title="Date",
-            yaxis_title="Price",
-            template="plotly_white"
-        )
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"Close prices:\n{data['Close'].tail()}")
+            logging.debug(f"EMA_5:\n{data['EMA_5'].tail()}")
+
+        # Create the figure: one trace per line and per signal type, WebGL and
+        # LTTB downsampling for long histories
+        fig = price_figure(data, ticker)
 
         # Current price
         current_price = data['Close'].iloc[-1]
@@ -149,4 +102,4 @@ def update_graph(n_clicks, ticker):
 if __name__ == '__main__':
     logging.info("Starting Dash app...")
     port = int(os.environ.get("PORT", 8080))
-    app.run_server(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
+    app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from figures import CHART_DTYPE, epoch_ms, lttb_indices, price_figure_dict, typed_array
+from synthetic import gbm_closes
+
+
+# The bucket-by-bucket LTTB figures.py started with, kept as the oracle
+def loop_lttb(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        next_lo, next_hi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(np.argmax(area))
+        out[b + 1] = prev
+    return out
+
+
+def daily_ms(n):
+    return np.arange(n, dtype=np.float64) * 86_400_000.0
+
+
+# Bucket widths from 1 to 50 points: both the table and the loop paths
+@pytest.mark.parametrize('n', [10, 2001, 2500, 10_000, 30_000, 100_000])
+@pytest.mark.parametrize('n_out', [3, 50, 2000])
+def test_lttb_matches_loop(n, n_out):
+    y = gbm_closes(n, seed=n)['SYN00000'].to_numpy()
+    x = daily_ms(n)
+    np.testing.assert_array_equal(lttb_indices(x, y, n_out), loop_lttb(x, y, n_out))
+
+
+def test_lttb_flat_prices_match_loop():
+    x, y = daily_ms(10_000), np.full(10_000, 100.0)
+    np.testing.assert_array_equal(lttb_indices(x, y, 2000), loop_lttb(x, y, 2000))
+
+
+def test_short_series_are_not_downsampled():
+    np.testing.assert_array_equal(lttb_indices(daily_ms(100), np.ones(100), 2000), np.arange(100))
+
+
+def test_figure_lines_share_the_close_points():
+    close = gbm_closes(5000, seed=1)['SYN00000']
+    data = pd.DataFrame({'Close': close})
+    for span in (5, 13, 8):
+        data[f'EMA_{span}'] = close.ewm(span=span, adjust=False).mean()
+    fig = price_figure_dict(data, 'SYN', max_points=1000)
+    lines = [trace for trace in fig['data'] if trace['mode'] == 'lines']
+    keep = lttb_indices(epoch_ms(data.index), close.to_numpy(), 1000)
+    assert [trace['name'] for trace in lines] == ['Close', 'EMA 5', 'EMA 13', 'EMA 8']
+    assert all(trace['x'] == typed_array(epoch_ms(data.index)[keep]) for trace in lines)
+    assert lines[0]['y'] == typed_array(close.to_numpy()[keep], CHART_DTYPE)
+    assert lines[2]['y'] == typed_array(data['EMA_13'].to_numpy()[keep], CHART_DTYPE)
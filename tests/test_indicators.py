@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import DEFAULT_SPANS, EMAState
+from intraday import BarRing
+from synthetic import gbm_closes
+
+SEEDS = range(8)
+
+
+def pandas_emas(closes, spans=DEFAULT_SPANS):
+    closes = pd.Series(closes)
+    return np.column_stack([closes.ewm(span=span, adjust=False).mean().to_numpy() for span in spans])
+
+
+def closes_for(seed, n_bars=300, n_tickers=1):
+    return gbm_closes(n_bars, n_tickers=n_tickers, seed=seed).to_numpy()
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_update_batch_matches_pandas(seed):
+    closes = closes_for(seed)[:, 0]
+    state = EMAState()
+    # Split in uneven batches: each continues from the last
+    out = np.concatenate([state.update_batch('SYN', chunk) for chunk in np.array_split(closes, [1, 40, 41, 200])])
+    np.testing.assert_allclose(out, pandas_emas(closes), rtol=1e-12)
+    assert state.count('SYN') == len(closes)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_single_updates_match_pandas(seed):
+    closes = closes_for(seed)[:, 0]
+    state = EMAState()
+    out = np.array([state.update('SYN', close) for close in closes])
+    np.testing.assert_allclose(out, pandas_emas(closes), rtol=1e-12)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_update_many_matches_pandas_per_ticker(seed):
+    closes = closes_for(seed, n_tickers=5)
+    tickers = [f'T{i}' for i in range(closes.shape[1])]
+    state = EMAState()
+    for row in closes:
+        state.update_many(tickers, row)
+    for column, ticker in enumerate(tickers):
+        expected = pandas_emas(closes[:, column])[-1]
+        np.testing.assert_allclose(list(state.value(ticker).values()), expected, rtol=1e-12)
+
+
+def test_nan_closes_are_skipped():
+    closes = closes_for(0)[:, 0].copy()
+    closes[[10, 11, 50]] = np.nan
+    state = EMAState()
+    out = state.update_batch('SYN', closes)
+    expected = pd.Series(closes).ewm(span=5, adjust=False, ignore_na=True).mean().to_numpy()
+    np.testing.assert_allclose(out[:, 0], expected, rtol=1e-12)
+    assert state.count('SYN') == len(closes) - 3
+
+
+def test_save_and_load_continue_the_same(tmp_path):
+    closes = closes_for(1)[:, 0]
+    state = EMAState()
+    state.update_batch('SYN', closes[:100])
+    state.save(tmp_path / 'state')
+    restored = EMAState.load(tmp_path / 'state')
+    np.testing.assert_allclose(restored.update_batch('SYN', closes[100:]), pandas_emas(closes)[100:], rtol=1e-12)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_bar_ring_appends_match_pandas(seed):
+    closes = closes_for(seed)[:, 0]
+    dates = np.arange(len(closes), dtype=np.int64)
+    ring = BarRing(capacity=100)
+    ring.extend(dates[:50], closes[:50])
+    for date, close in zip(dates[50:], closes[50:]):
+        ring.append(date, close)
+    expected = pandas_emas(closes)[-100:]
+    np.testing.assert_array_equal(ring.dates(), dates[-100:])
+    for i, span in enumerate(ring.spans):
+        np.testing.assert_allclose(ring.ema(span), expected[:, i], rtol=1e-12)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_bar_ring_revising_newest_bar_matches_pandas(seed):
+    closes = closes_for(seed)[:, 0]
+    dates = np.arange(len(closes), dtype=np.int64)
+    ring = BarRing(capacity=100)
+    ring.extend(dates[:-1], closes[:-1])
+    # The bar in progress is revised several times before the final close
+    for revision in (closes[-1] * 1.01, closes[-1] * 0.98, closes[-1]):
+        ring.append(dates[-1], revision)
+    assert not ring.append(dates[-2], closes[-2])
+    expected = pandas_emas(closes)[-100:]
+    assert len(ring) == 100
+    for i, span in enumerate(ring.spans):
+        np.testing.assert_allclose(ring.ema(span), expected[:, i], rtol=1e-12)
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+from result_cache import ResultCache
+
+THREADS = 16
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# Calls get_or_compute for each of `keys` from its own thread, all released
+# at once, and returns the results and the exceptions raised
+def contend(cache, keys, compute):
+    barrier = threading.Barrier(len(keys))
+    results = [None] * len(keys)
+    errors = [None] * len(keys)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = cache.get_or_compute(keys[i], lambda: compute(keys[i]))
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(keys))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results, errors
+
+
+def slow_counter():
+    calls = {}
+    lock = threading.Lock()
+
+    def compute(key):
+        with lock:
+            calls[key] = calls.get(key, 0) + 1
+        # Long enough for every other thread to arrive while this one runs
+        time.sleep(0.05)
+        return ('result', key)
+
+    return compute, calls
+
+
+def test_one_compute_per_key_under_contention():
+    cache = ResultCache()
+    compute, calls = slow_counter()
+    results, errors = contend(cache, ['AAPL'] * THREADS, compute)
+    assert errors == [None] * THREADS
+    assert results == [('result', 'AAPL')] * THREADS
+    assert calls == {'AAPL': 1}
+    stats = cache.stats()
+    assert stats['misses'] == 1
+    assert stats['coalesced'] + stats['hits'] == THREADS - 1
+    assert stats['inflight'] == 0
+
+
+def test_distinct_keys_are_computed_separately():
+    cache = ResultCache()
+    compute, calls = slow_counter()
+    keys = [f'T{i % 4}' for i in range(THREADS)]
+    results, errors = contend(cache, keys, compute)
+    assert errors == [None] * THREADS
+    assert results == [('result', key) for key in keys]
+    assert calls == {f'T{i}': 1 for i in range(4)}
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = ResultCache()
+    attempts = []
+
+    def failing(key):
+        attempts.append(key)
+        time.sleep(0.05)
+        raise RuntimeError('provider down')
+
+    results, errors = contend(cache, ['AAPL'] * THREADS, failing)
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert len(attempts) == 1
+    assert cache.get_or_compute('AAPL', lambda: 'ok') == 'ok'
+
+
+def test_recompute_after_ttl_expires():
+    clock = FakeClock()
+    cache = ResultCache(ttl=60, clock=clock)
+    values = iter(['first', 'second'])
+    assert cache.get_or_compute('AAPL', lambda: next(values)) == 'first'
+    clock.now = 59.9
+    assert cache.get_or_compute('AAPL', lambda: next(values)) == 'first'
+    clock.now = 60.0
+    assert cache.get_or_compute('AAPL', lambda: next(values)) == 'second'
+    assert cache.stats()['expired'] == 1
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_expired_entry_is_recomputed_once_under_contention():
+    clock = FakeClock()
+    cache = ResultCache(ttl=60, clock=clock)
+    compute, calls = slow_counter()
+    cache.get_or_compute('AAPL', lambda: compute('AAPL'))
+    clock.now = 61
+    results, errors = contend(cache, ['AAPL'] * THREADS, compute)
+    assert errors == [None] * THREADS
+    assert calls == {'AAPL': 2}
+
+
+@pytest.mark.parametrize('ttl', [0.0, float('inf')])
+def test_per_entry_ttl_overrides_the_default(ttl):
+    clock = FakeClock()
+    cache = ResultCache(ttl=60, clock=clock)
+    cache.get_or_compute('AAPL', lambda: 'pinned', ttl=ttl)
+    clock.now = 10**9
+    expected = 'fresh' if ttl == 0.0 else 'pinned'
+    assert cache.get_or_compute('AAPL', lambda: 'fresh') == expected
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResultCache(max_entries=2)
+    for key in ('A', 'B'):
+        cache.get_or_compute(key, lambda: key)
+    cache.get_or_compute('A', lambda: 'recomputed')
+    cache.get_or_compute('C', lambda: 'C')
+    assert cache.get_or_compute('A', lambda: 'recomputed') == 'A'
+    assert cache.get_or_compute('B', lambda: 'recomputed') == 'recomputed'
+    assert cache.stats()['evicted'] == 2
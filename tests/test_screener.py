@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from screener import screen_closes
+from synthetic import gbm_closes
+
+SEEDS = range(8)
+
+
+# Crypto trades every day, stocks only on weekdays: the union index the
+# screener gets for the default universe. The last row is a Sunday.
+def mixed_calendar(seed, n_bars=120, n_tickers=6):
+    closes = gbm_closes(n_bars, n_tickers=n_tickers, seed=seed)
+    closes.index = pd.date_range(end='2024-06-02', periods=n_bars, freq='D', name='Date')
+    stocks = list(closes.columns[n_tickers // 2:])
+    closes.loc[closes.index.dayofweek >= 5, stocks] = np.nan
+    return closes, stocks
+
+
+def own_calendar(closes, ticker, lookback):
+    return screen_closes(closes[[ticker]].dropna(), lookback=lookback)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('lookback', [1, 3])
+def test_bars_ago_counts_each_tickers_own_bars(seed, lookback):
+    closes, _ = mixed_calendar(seed)
+    table = screen_closes(closes, lookback=lookback).set_index('Ticker')
+    for ticker in closes.columns:
+        expected = own_calendar(closes, ticker, lookback)
+        if expected.empty:
+            assert ticker not in table.index
+            continue
+        row = table.loc[ticker]
+        assert row['Signal'] == expected['Signal'].iloc[0]
+        assert row['Bars Ago'] == expected['Bars Ago'].iloc[0]
+        assert row['Date'] == expected['Date'].iloc[0]
+        assert row['Close'] == pytest.approx(expected['Close'].iloc[0])
+
+
+def test_friday_stock_crossover_is_fresh_on_sunday():
+    found = 0
+    for seed in range(40):
+        closes, stocks = mixed_calendar(seed)
+        table = screen_closes(closes, lookback=1).set_index('Ticker')
+        for ticker in stocks:
+            expected = own_calendar(closes, ticker, 1)
+            if not expected.empty:
+                assert expected['Date'].iloc[0].dayofweek == 4
+                assert table.loc[ticker, 'Bars Ago'] == 0
+                found += 1
+    assert found
+
+
+def test_no_fresh_signal_returns_empty_table():
+    closes = pd.DataFrame({'AAA': np.full(30, 100.0)}, index=pd.date_range('2024-01-01', periods=30, name='Date'))
+    assert screen_closes(closes).empty
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from signals import crossover_indices, crossover_masks, ema, signal_points
+from synthetic import gbm_closes
+
+SEEDS = range(8)
+
+
+# The crossover loop update_graph ran before signals.py, kept as the oracle
+def loop_signals(data):
+    buy_signals = []
+    sell_signals = []
+    for i in range(1, len(data)):
+        if data['EMA_5'].iloc[i] > data['EMA_13'].iloc[i] and data['EMA_5'].iloc[i-1] <= data['EMA_13'].iloc[i-1]:
+            buy_signals.append((data.index[i], data['Close'].iloc[i]))
+        elif data['EMA_5'].iloc[i] < data['EMA_13'].iloc[i] and data['EMA_5'].iloc[i-1] >= data['EMA_13'].iloc[i-1]:
+            sell_signals.append((data.index[i], data['Close'].iloc[i]))
+    return buy_signals, sell_signals
+
+
+def with_emas(close):
+    data = pd.DataFrame({'Close': close})
+    data['EMA_5'] = data['Close'].ewm(span=5, adjust=False).mean()
+    data['EMA_13'] = data['Close'].ewm(span=13, adjust=False).mean()
+    return data
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_signal_points_match_loop(seed):
+    data = with_emas(gbm_closes(500, seed=seed)['SYN00000'])
+    expected = loop_signals(data)
+    assert expected[0] and expected[1]
+    assert signal_points(data) == expected
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_crossover_indices_match_loop_1d(seed):
+    data = with_emas(gbm_closes(500, seed=seed)['SYN00000'])
+    buy_idx, sell_idx = crossover_indices(data['EMA_5'].to_numpy(), data['EMA_13'].to_numpy())
+    expected_buy, expected_sell = loop_signals(data)
+    assert list(data.index[buy_idx]) == [date for date, _ in expected_buy]
+    assert list(data.index[sell_idx]) == [date for date, _ in expected_sell]
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_crossover_masks_match_loop_2d(seed):
+    closes = gbm_closes(300, n_tickers=6, seed=seed)
+    buy, sell = crossover_masks(ema(closes, 5).to_numpy(), ema(closes, 13).to_numpy())
+    assert buy.shape == sell.shape == closes.shape
+    for column, ticker in enumerate(closes.columns):
+        expected_buy, expected_sell = loop_signals(with_emas(closes[ticker]))
+        assert list(closes.index[buy[:, column]]) == [date for date, _ in expected_buy]
+        assert list(closes.index[sell[:, column]]) == [date for date, _ in expected_sell]
+
+
+def test_flat_prices_never_cross():
+    data = with_emas(pd.Series(np.full(50, 100.0), index=pd.date_range('2024-01-01', periods=50, name='Date')))
+    assert loop_signals(data) == ([], [])
+    assert signal_points(data) == ([], [])
+
+
+def test_short_and_mismatched_input():
+    buy, sell = crossover_masks([1.0], [2.0])
+    assert not buy.any() and not sell.any()
+    with pytest.raises(ValueError):
+        crossover_masks([1.0, 2.0], [1.0])
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from price_store import PriceStore
+from shared_cache import SharedArrayCache
+from synthetic import gbm_ohlcv
+from timeframes import TimeframeCache
+
+# timeframe: (base interval, base bar frequency, pandas resample rule)
+CASES = {
+    '1d': ('1d', 'B', 'D'),
+    '1wk': ('1d', 'B', 'W-MON'),
+    '1mo': ('1d', 'B', 'MS'),
+    '1h': ('15m', '15min', 'h'),
+}
+AGG = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+
+def base_bars(timeframe, n_bars=400, seed=0):
+    return gbm_ohlcv(n_bars, seed=seed, freq=CASES[timeframe][1])
+
+
+# pandas' answer for the bars now stored
+def reference(store, timeframe, spans):
+    base, _, rule = CASES[timeframe]
+    expected = store.read('SYN', base).resample(rule, closed='left', label='left').agg(AGG)
+    expected = expected.dropna(subset=['Close'])
+    for span in spans:
+        expected[f'EMA_{span}'] = expected['Close'].ewm(span=span, adjust=False).mean()
+    return expected
+
+
+def assert_matches(cache, store, timeframe):
+    entry = cache.aggregate('SYN', timeframe)
+    expected = reference(store, timeframe, cache.spans)
+    np.testing.assert_array_equal(entry.dates, expected.index.values.astype('datetime64[ns]').view(np.int64))
+    for name in cache.names:
+        np.testing.assert_allclose(entry.columns[name], expected[name].to_numpy(), rtol=1e-12, err_msg=name)
+
+
+# A copy of one stored bar with new prices, as a backfill import or a
+# re-fetch would write over it
+def revised(bars, i, factor):
+    bar = bars.iloc[[i]].copy()
+    bar[['Open', 'High', 'Low', 'Close']] *= factor
+    return bar
+
+
+@pytest.mark.parametrize('timeframe', CASES)
+def test_appends_extend_and_match_resample(tmp_path, timeframe):
+    bars = base_bars(timeframe)
+    store = PriceStore(str(tmp_path), offline=True)
+    store.write('SYN', bars.iloc[:250], CASES[timeframe][0])
+    cache = TimeframeCache(store)
+    assert_matches(cache, store, timeframe)
+    for stop in range(257, len(bars) + 1, 7):
+        store.write('SYN', bars.iloc[stop - 7:stop], CASES[timeframe][0])
+        assert_matches(cache, store, timeframe)
+    assert cache.builds == 1
+    assert cache.extends == (len(bars) - 250) // 7
+    assert_matches(cache, store, timeframe)
+    assert cache.hits == 1
+
+
+@pytest.mark.parametrize('timeframe', CASES)
+def test_revised_bar_in_history_rebuilds(tmp_path, timeframe):
+    bars = base_bars(timeframe)
+    store = PriceStore(str(tmp_path), offline=True)
+    store.write('SYN', bars, CASES[timeframe][0])
+    cache = TimeframeCache(store)
+    assert_matches(cache, store, timeframe)
+    store.write('SYN', revised(bars, 100, 1.5), CASES[timeframe][0])
+    assert_matches(cache, store, timeframe)
+    assert cache.builds == 2
+
+
+@pytest.mark.parametrize('timeframe', CASES)
+def test_revised_newest_bar_extends(tmp_path, timeframe):
+    bars = base_bars(timeframe)
+    store = PriceStore(str(tmp_path), offline=True)
+    store.write('SYN', bars, CASES[timeframe][0])
+    cache = TimeframeCache(store)
+    assert_matches(cache, store, timeframe)
+    store.write('SYN', revised(bars, len(bars) - 1, 0.9), CASES[timeframe][0])
+    assert_matches(cache, store, timeframe)
+    assert (cache.builds, cache.extends) == (1, 1)
+
+
+# Writes by another process are not in this store's write log: the digest
+# of the kept bars tells an append from a revision
+@pytest.mark.parametrize('timeframe', CASES)
+def test_writes_outside_the_log_are_checked_by_digest(tmp_path, timeframe):
+    bars = base_bars(timeframe)
+    interval = CASES[timeframe][0]
+    store = PriceStore(str(tmp_path), offline=True)
+    other = PriceStore(str(tmp_path), offline=True)
+    store.write('SYN', bars.iloc[:300], interval)
+    cache = TimeframeCache(store)
+    assert_matches(cache, store, timeframe)
+    seen = cache.aggregate('SYN', timeframe).base_version
+    other.write('SYN', bars.iloc[300:], interval)
+    assert store.revised_from('SYN', interval, seen) is None
+    assert_matches(cache, store, timeframe)
+    assert (cache.builds, cache.extends) == (1, 1)
+    other.write('SYN', revised(bars, 100, 1.5), interval)
+    assert_matches(cache, store, timeframe)
+    assert cache.builds == 2
+
+
+@pytest.mark.parametrize('timeframe', CASES)
+def test_shared_aggregates_follow_revisions(tmp_path, timeframe):
+    bars = base_bars(timeframe)
+    interval = CASES[timeframe][0]
+    shared = SharedArrayCache(str(tmp_path / 'shared'))
+    stores = [PriceStore(str(tmp_path / 'store'), offline=True, shared=shared) for _ in range(2)]
+    caches = [TimeframeCache(store) for store in stores]
+    stores[0].write('SYN', bars.iloc[:300], interval)
+    for cache, store in zip(caches, stores):
+        assert_matches(cache, store, timeframe)
+    assert caches[1].shared_hits == 1
+    stores[0].write('SYN', bars.iloc[300:], interval)
+    stores[1].write('SYN', revised(bars, 100, 1.5), interval)
+    for cache, store in zip(caches, stores):
+        assert_matches(cache, store, timeframe)
+    # The second cache never computes: it reads what the first published
+    assert caches[0].builds == 2
+    assert (caches[1].builds, caches[1].shared_hits) == (0, 2)
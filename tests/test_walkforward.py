@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+import walkforward
+from synthetic import gbm_closes
+from walkforward import RECORD_KEY, run_walkforward
+
+# Holt fits in milliseconds, so the whole walk-forward runs in the test
+FORECASTER = 'holt'
+SETTINGS = dict(forecaster=FORECASTER, history_days=60, periods=30, step=21, chunk_size=4)
+
+
+@pytest.fixture
+def closes():
+    return gbm_closes(500, n_tickers=3, seed=0)
+
+
+def by_key(table):
+    return table.sort_values(list(RECORD_KEY)).reset_index(drop=True)
+
+
+# _fit_chunk that raises KeyboardInterrupt once `chunks` chunks are done
+def interrupt_after(chunks):
+    fit_chunk = walkforward._fit_chunk
+    calls = []
+
+    def fit(args):
+        if len(calls) == chunks:
+            raise KeyboardInterrupt
+        calls.append(args)
+        return fit_chunk(args)
+
+    return fit
+
+
+@pytest.mark.parametrize('chunks', [1, 3])
+def test_resume_after_interruption_matches_uninterrupted_run(tmp_path, monkeypatch, closes, chunks):
+    expected = run_walkforward(closes, workers=1, **SETTINGS)
+    assert len(expected) > 4 * chunks and expected['error'].isna().all()
+
+    path = str(tmp_path / 'wf.jsonl')
+    with monkeypatch.context() as patch:
+        patch.setattr(walkforward, '_fit_chunk', interrupt_after(chunks))
+        with pytest.raises(KeyboardInterrupt):
+            run_walkforward(closes, workers=1, checkpoint=path, **SETTINGS)
+    with open(path) as f:
+        assert len(f.readlines()) == 4 * chunks
+
+    resumed = run_walkforward(closes, workers=1, checkpoint=path, **SETTINGS)
+    pd.testing.assert_frame_equal(by_key(resumed), by_key(expected))
+    with open(path) as f:
+        assert len(f.readlines()) == len(expected)
+
+
+def test_resume_skips_finished_fits(tmp_path, monkeypatch, closes):
+    path = str(tmp_path / 'wf.jsonl')
+    first = run_walkforward(closes, workers=1, checkpoint=path, **SETTINGS)
+
+    def fit(args):
+        raise AssertionError("a finished fit was run again")
+
+    monkeypatch.setattr(walkforward, '_fit_chunk', fit)
+    again = run_walkforward(closes, workers=1, checkpoint=path, **SETTINGS)
+    pd.testing.assert_frame_equal(by_key(again), by_key(first))
+
+
+def test_truncated_last_line_is_refitted(tmp_path, closes):
+    expected = run_walkforward(closes, workers=1, **SETTINGS)
+    path = tmp_path / 'wf.jsonl'
+    run_walkforward(closes, workers=1, checkpoint=str(path), **SETTINGS)
+    # Cut the last record short, as a crash mid-write would
+    data = path.read_bytes()
+    path.write_bytes(data[:data.rstrip(b'\n').rfind(b'\n') + 20])
+
+    resumed = run_walkforward(closes, workers=1, checkpoint=str(path), **SETTINGS)
+    pd.testing.assert_frame_equal(by_key(resumed), by_key(expected))
@@ -0,0 +1,322 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from indicators import DEFAULT_SPANS
+from series import PriceSeries
+from signals import ema_values
+
+DAY_NS = 86_400 * 10**9
+
+# Chart timeframes: how bars are bucketed and which stored intervals can feed
+# them. Daily and longer are built from '1d' bars; intraday timeframes from
+# the coarsest stored interval that divides them (coarser intervals go
+# further back), and are only available when such bars are stored, e.g.
+# after a backfill.py import.
+TIMEFRAMES = {
+    '15m': (900, ('15m', '5m', '1m')),
+    '1h': (3600, ('60m', '30m', '15m', '5m', '1m')),
+    '1d': ('day', ('1d',)),
+    '1wk': ('week', ('1d',)),
+    '1mo': ('month', ('1d',)),
+}
+
+# (ticker, timeframe) aggregates kept in memory, least recently used dropped
+DEFAULT_MAX_ENTRIES = int(os.environ.get('EMA_TIMEFRAME_ENTRIES', 128))
+
+
+# Start of the bucket each int64 ns timestamp falls in. Weeks start on Monday
+# and months on the 1st; buckets are labelled by their start.
+def bucket_starts(dates, unit):
+    if unit == 'day':
+        return dates // DAY_NS * DAY_NS
+    if unit == 'week':
+        days = dates // DAY_NS
+        # 1970-01-01 was a Thursday
+        return (days - (days + 3) % 7) * DAY_NS
+    if unit == 'month':
+        return dates.view('datetime64[ns]').astype('datetime64[M]').astype('datetime64[ns]').view(np.int64)
+    step = unit * 10**9
+    return dates // step * step
+
+
+# OHLCV bars (a price_store.Bars, in date order) aggregated into buckets:
+# returns (bucket dates, {column: values})
+def resample(bars, unit):
+    buckets = bucket_starts(np.asarray(bars['Date']), unit)
+    if not len(buckets):
+        return buckets, {col: np.empty(0) for col in ('Open', 'High', 'Low', 'Close', 'Volume')}
+    firsts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    lasts = np.r_[firsts[1:] - 1, len(buckets) - 1]
+    return buckets[firsts], {
+        'Open': np.asarray(bars['Open'])[firsts],
+        'High': np.fmax.reduceat(bars['High'], firsts),
+        'Low': np.fmin.reduceat(bars['Low'], firsts),
+        'Close': np.asarray(bars['Close'])[lasts],
+        'Volume': np.add.reduceat(np.nan_to_num(bars['Volume']), firsts),
+    }
+
+
+# Running digest of the first bars of a price_store.Bars: one hash per row
+# of its words, fed up to `count` bars. Feeding bars [0, j) and then [j, k)
+# gives the same digest as feeding [0, k) at once.
+class BarsDigest:
+    def __init__(self, rows):
+        self._hashes = [hashlib.blake2b(digest_size=16) for _ in range(rows)]
+        self.count = 0
+
+    # Feed bars [count, stop) of `bars`
+    def update(self, bars, stop):
+        for digest, row in zip(self._hashes, bars.words):
+            digest.update(row[self.count:stop])
+        self.count = stop
+        return self
+
+    def copy(self):
+        other = BarsDigest(0)
+        other._hashes = [digest.copy() for digest in self._hashes]
+        other.count = self.count
+        return other
+
+    def hexdigest(self):
+        return ''.join(digest.hexdigest() for digest in self._hashes)
+
+
+# BarsDigest of the base bars before the bucket starting at `last_bucket`,
+# continuing (a copy of) the BarsDigest `prefix` unless it already went past
+# them, so only the bars after `prefix` are hashed
+def prefix_digest(bars, last_bucket, prefix):
+    start = int(np.searchsorted(bars['Date'], last_bucket))
+    if start < prefix.count:
+        prefix = BarsDigest(len(bars.words))
+    return prefix.copy().update(bars, start)
+
+
+# Resampled bars of one (ticker, timeframe) and their EMAs over the whole
+# stored history, plus what they were built from: the base interval, its
+# first and last bar, how many base bars that was, the version of the
+# store's file (PriceStore.version) and a BarsDigest of the base bars before
+# the last bucket (the ones an extension keeps). Arrays are never modified
+# once built, so readers can keep views while a newer Aggregate replaces
+# this one.
+class Aggregate:
+    __slots__ = ('dates', 'columns', 'base', 'base_first', 'base_last', 'base_count', 'base_version', 'base_prefix')
+
+    def __init__(self, dates, columns, base, base_first, base_last, base_count, base_version=None, base_prefix=None):
+        self.dates = dates
+        self.columns = columns
+        self.base = base
+        self.base_first = base_first
+        self.base_last = base_last
+        self.base_count = base_count
+        self.base_version = base_version
+        self.base_prefix = base_prefix
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + sum(values.nbytes for values in self.columns.values())
+
+    # As one (1 + columns, n) int64 array: the dates, then each column's
+    # float64 bit pattern (the layout of price_store.Bars)
+    def to_words(self, names):
+        words = np.empty((1 + len(names), len(self.dates)), dtype=np.int64)
+        words[0] = self.dates
+        for i, name in enumerate(names, start=1):
+            words[i] = np.asarray(self.columns[name], dtype=np.float64).view(np.int64)
+        return words
+
+    # Back from to_words(); the arrays are views of `words`
+    @classmethod
+    def from_words(cls, words, names, *info):
+        columns = {name: words[i].view(np.float64) for i, name in enumerate(names, start=1)}
+        return cls(words[0], columns, *info)
+
+
+# Resampled OHLCV and EMAs per (ticker, timeframe), built from the bars in a
+# price_store.PriceStore. The first request for a pair resamples the whole
+# stored history once; later requests only look at the base bars stored
+# since: when there are none the cached aggregate is returned as it is, and
+# otherwise the last (possibly partial) bucket is rebuilt and new buckets are
+# appended, with EMAs continuing from the last complete bucket. Whether there
+# is anything new is told by the version of the store's file, so bars
+# revised in place (a re-fetched last bar, a backfill import winning on
+# overlap) are picked up too; if the bars before the last bucket changed,
+# the pair is rebuilt. The store's write log (PriceStore.revised_from) tells
+# whether they can have; when it does not reach back far enough, a digest
+# of them does. The digest is kept running, so extending only hashes the
+# new bars. Pairs are updated under a lock of their own, so one being
+# rebuilt does not hold up requests for the others.
+# Nothing here fetches: callers top up the store first (PriceStore.refresh).
+#
+# With a shared_cache.SharedArrayCache (by default the store's), aggregates
+# are published there and read back as memory maps, so the workers of a
+# multi-process server resample and compute EMAs for a given set of base
+# bars once between them, and hold the result once.
+class TimeframeCache:
+    def __init__(self, store, spans=DEFAULT_SPANS, max_entries=DEFAULT_MAX_ENTRIES, shared=None):
+        self.store = store
+        self.spans = tuple(spans)
+        self.max_entries = max_entries
+        self.shared = shared if shared is not None else getattr(store, 'shared', None)
+        self.names = ('Open', 'High', 'Low', 'Close', 'Volume') + tuple(f'EMA_{span}' for span in self.spans)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.builds = 0
+        self.extends = 0
+        self.hits = 0
+        self.shared_hits = 0
+
+    # Stored interval feeding `timeframe` for `ticker`, or None if there is none
+    def base_interval(self, ticker, timeframe):
+        for interval in TIMEFRAMES[timeframe][1]:
+            if self.store.coverage(ticker, interval) is not None:
+                return interval
+        return None
+
+    def _build(self, bars, unit, base):
+        dates, columns = resample(bars, unit)
+        for span in self.spans:
+            columns[f'EMA_{span}'] = ema_values(columns['Close'], span)
+        base_dates = bars['Date']
+        return Aggregate(dates, columns, base, int(base_dates[0]), int(base_dates[-1]), len(base_dates))
+
+    # Rebuild the last bucket of `entry` and append later ones from the new base bars
+    def _extend(self, entry, bars, unit):
+        base_dates = bars['Date']
+        keep = len(entry) - 1
+        tail_dates, tail = resample(bars[int(np.searchsorted(base_dates, entry.dates[-1])):], unit)
+        columns = {}
+        for col, values in tail.items():
+            columns[col] = np.concatenate([entry.columns[col][:keep], values])
+        for span in self.spans:
+            name = f'EMA_{span}'
+            if keep:
+                # An adjust=False EMA of [seed, x...] continues from seed
+                continued = ema_values(np.r_[entry.columns[name][keep - 1], tail['Close']], span)[1:]
+            else:
+                continued = ema_values(tail['Close'], span)
+            columns[name] = np.concatenate([entry.columns[name][:keep], continued])
+        return Aggregate(np.concatenate([entry.dates[:keep], tail_dates]), columns, entry.base,
+                         entry.base_first, int(base_dates[-1]), len(base_dates))
+
+    # The new Aggregate for `bars`, with its version and prefix digest set.
+    # `prefix` is a BarsDigest of `bars` fed up to the old last bucket.
+    def _update(self, entry, bars, unit, base, rebuild, prefix, version):
+        if rebuild:
+            entry = self._build(bars, unit, base)
+        else:
+            entry = self._extend(entry, bars, unit)
+        with self._lock:
+            if rebuild:
+                self.builds += 1
+            else:
+                self.extends += 1
+        entry.base_version = version
+        entry.base_prefix = prefix_digest(bars, entry.dates[-1], prefix)
+        return entry
+
+    # _update() through the shared cache: take the aggregate another process
+    # published for these exact base bars, or compute and publish it while
+    # holding the host-wide lock for the pair, so it is computed once. The
+    # shared key holds a digest of every base bar, so an aggregate of bars
+    # since revised (or left in the cache by an earlier run) is never reused.
+    def _update_shared(self, key, entry, bars, unit, base, rebuild, prefix, version):
+        if self.shared is None:
+            return self._update(entry, bars, unit, base, rebuild, prefix, version)
+        base_dates = bars['Date']
+        info = (base, int(base_dates[0]), int(base_dates[-1]), len(base_dates))
+        spans = '_'.join(str(span) for span in self.spans)
+        content = prefix.copy().update(bars, len(bars)).hexdigest()
+        shared_key = f"tf-{key[0]}-{key[1]}-{spans}-{base}-{content}"
+        words = self.shared.get(shared_key)
+        if words is None:
+            with self.shared.lock(f"tf-{key[0]}-{key[1]}"):
+                words = self.shared.get(shared_key)
+                if words is None:
+                    entry = self._update(entry, bars, unit, base, rebuild, prefix, version)
+                    self.shared.put(shared_key, entry.to_words(self.names))
+                    words = self.shared.get(shared_key)
+                    # None if evicted straight away (a tiny max_bytes): keep ours
+                    return entry if words is None else Aggregate.from_words(
+                        words, self.names, *info, entry.base_version, entry.base_prefix)
+        with self._lock:
+            self.shared_hits += 1
+        return Aggregate.from_words(words, self.names, *info, version, prefix_digest(bars, words[0][-1], prefix))
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    # BarsDigest of the base bars `entry` keeps when extended (those before
+    # its last bucket) if they are unchanged in `bars`, else None
+    def _kept_prefix(self, ticker, entry, bars):
+        if entry is None or int(bars['Date'][0]) != entry.base_first:
+            return None
+        revised = self.store.revised_from(ticker, entry.base, entry.base_version)
+        if revised is not None:
+            return entry.base_prefix if revised >= entry.dates[-1] else None
+        kept = BarsDigest(len(bars.words)).update(bars, int(np.searchsorted(bars['Date'], entry.dates[-1])))
+        return kept if kept.hexdigest() == entry.base_prefix.hexdigest() else None
+
+    # The up-to-date Aggregate for (ticker, timeframe), or None with no base bars
+    def aggregate(self, ticker, timeframe):
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unknown timeframe {timeframe!r}; use one of {', '.join(TIMEFRAMES)}")
+        ticker = ticker.upper()
+        key = (ticker, timeframe)
+        unit = TIMEFRAMES[timeframe][0]
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+            base = entry.base if entry is not None else self.base_interval(ticker, timeframe)
+            if base is None:
+                return None
+            version = self.store.version(ticker, base)
+            if entry is not None and version is not None and version == entry.base_version:
+                with self._lock:
+                    self.hits += 1
+            else:
+                bars = self.store.slice(ticker, base)
+                if not len(bars):
+                    with self._lock:
+                        self._entries.pop(key, None)
+                    return None
+                # Extend only if the bars the kept buckets came from are unchanged
+                prefix = self._kept_prefix(ticker, entry, bars)
+                rebuild = prefix is None
+                if rebuild:
+                    prefix = BarsDigest(len(bars.words))
+                entry = self._update_shared(key, entry, bars, unit, base, rebuild, prefix, version)
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return entry
+
+    # Buckets starting in [start, end) as a series.PriceSeries of views: Close
+    # and the EMA_<span> columns, plus any other `columns` asked for
+    def series(self, ticker, timeframe, start=None, end=None, columns=()):
+        entry = self.aggregate(ticker, timeframe)
+        names = ('Close',) + tuple(f'EMA_{span}' for span in self.spans) + tuple(columns)
+        if entry is None:
+            return PriceSeries(ticker.upper(), np.empty(0, dtype=np.int64),
+                               {name: np.empty(0) for name in names}, timeframe)
+        lo = 0 if start is None else int(np.searchsorted(entry.dates, pd.Timestamp(start).value, side='left'))
+        hi = len(entry) if end is None else int(np.searchsorted(entry.dates, pd.Timestamp(end).value, side='left'))
+        return PriceSeries(ticker.upper(), entry.dates[lo:hi], {name: entry.columns[name][lo:hi] for name in names},
+                           timeframe)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'builds': self.builds, 'extends': self.extends,
+                    'hits': self.hits, 'shared_hits': self.shared_hits,
+                    'bytes': sum(entry.nbytes for entry in self._entries.values())}
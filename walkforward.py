@@ -0,0 +1,301 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from forecast import DEFAULT_FORECASTER, get_forecaster, get_suggested_prices
+
+# Walk-forward evaluation of the suggested prices shown by
+# working_version_with_suggestions.py. For every ticker the forecaster is
+# re-fitted on a rolling window of `history_days` calendar days ending at a
+# fit origin (every `step` bars), exactly as the app fits on the last 60
+# days, and the suggestion it gives (yhat_lower / yhat_upper `periods` days
+# out) is checked against the closes of the following `periods` days: did
+# the price reach the buy level, the sell level, and was the close at the
+# horizon inside the band.
+#
+#     python walkforward.py --synthetic 50 --bars 1500 --checkpoint wf.jsonl
+#     python walkforward.py --file tickers.txt --years 5 --store --checkpoint wf.jsonl --workers 8
+#
+# Fits are independent, so they are spread over a process pool in chunks.
+# Each finished chunk is appended to the checkpoint (one JSON line per fit)
+# and re-running with the same checkpoint skips every fit already in it, so
+# an interrupted run resumes where it stopped.
+
+# Fits per pool task: enough to amortize pickling, few enough that an
+# interruption loses little work
+DEFAULT_CHUNK_SIZE = 8
+
+# Fit windows with fewer bars are skipped
+MIN_BARS = 20
+
+RECORD_KEY = ('ticker', 'origin', 'forecaster', 'history_days', 'periods')
+
+
+# Positions of the fit origins (last bar of each fit window) in `dates`: every
+# `step` bars, once a full `history_days` window lies behind and a full
+# `periods` day outcome window lies ahead
+def fit_origins(dates, history_days, periods, step):
+    if not len(dates):
+        return np.empty(0, dtype=np.int64)
+    first = int(np.searchsorted(dates, dates[0] + np.timedelta64(history_days, 'D')))
+    last = int(np.searchsorted(dates, dates[-1] - np.timedelta64(periods, 'D'), side='right')) - 1
+    return np.arange(first, last + 1, step)
+
+
+# One job per (ticker, origin) not already `done`: the window to fit on and
+# the closes that followed
+def make_jobs(closes, forecaster, history_days=60, periods=30, step=21, done=()):
+    done = set(done)
+    jobs = []
+    for ticker in closes.columns:
+        close = closes[ticker].dropna()
+        dates = close.index.values.astype('datetime64[ns]')
+        values = close.to_numpy(dtype=np.float64)
+        for i in fit_origins(dates, history_days, periods, step):
+            origin = dates[i]
+            key = (str(ticker), pd.Timestamp(origin).isoformat(), forecaster, history_days, periods)
+            if key in done:
+                continue
+            lo = int(np.searchsorted(dates, origin - np.timedelta64(history_days, 'D')))
+            hi = int(np.searchsorted(dates, origin + np.timedelta64(periods, 'D'), side='right'))
+            if i + 1 - lo < MIN_BARS:
+                continue
+            jobs.append({'key': key, 'dates': dates[lo:i + 1], 'closes': values[lo:i + 1],
+                         'future_dates': dates[i + 1:hi], 'future_closes': values[i + 1:hi]})
+    return jobs
+
+
+# Days from `origin` to the first of `dates` where `hit` is set, or None
+def _days_to_first(hit, dates, origin):
+    if not hit.any():
+        return None
+    return int((dates[int(np.argmax(hit))] - origin) // np.timedelta64(1, 'D'))
+
+
+# Score one suggestion against the closes that followed it. Levels count as
+# reached when a close gets there; intrabar highs and lows are not used.
+def score(key, buy, sell, last_close, future_dates, future_closes):
+    ticker, origin, forecaster, history_days, periods = key
+    origin_date = np.datetime64(origin, 'ns')
+    buy_days = _days_to_first(future_closes <= buy, future_dates, origin_date)
+    sell_days = _days_to_first(future_closes >= sell, future_dates, origin_date)
+    end_close = float(future_closes[-1]) if len(future_closes) else float('nan')
+    return {
+        'ticker': ticker, 'origin': origin, 'forecaster': forecaster,
+        'history_days': history_days, 'periods': periods,
+        'last_close': float(last_close), 'buy': float(buy), 'sell': float(sell),
+        'buy_hit': buy_days is not None, 'sell_hit': sell_days is not None,
+        'buy_days': buy_days, 'sell_days': sell_days,
+        'end_close': end_close, 'in_band': bool(buy <= end_close <= sell),
+        'error': None,
+    }
+
+
+def _quiet_prophet():
+    logging.getLogger('prophet').setLevel(logging.WARNING)
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+
+# Fit and score one chunk of jobs; runs in a pool worker. A failed fit is
+# recorded with its error, so it is not retried on resume.
+def _fit_chunk(args):
+    forecaster_name, jobs = args
+    _quiet_prophet()
+    forecaster = get_forecaster(forecaster_name)
+    records = []
+    for job in jobs:
+        ticker, origin, _, _, periods = job['key']
+        data = pd.DataFrame({'Date': job['dates'], 'Close': job['closes']})
+        try:
+            buy, sell = get_suggested_prices(forecaster.forecast(data, periods=periods))
+            records.append(score(job['key'], buy, sell, job['closes'][-1], job['future_dates'], job['future_closes']))
+        except Exception as e:
+            logging.error(f"Fit for {ticker} at {origin} failed: {e}")
+            records.append({**dict(zip(RECORD_KEY, job['key'])), 'error': str(e)})
+    return records
+
+
+# Append-only JSON-lines record of finished fits. A last line cut short by an
+# interruption is dropped on load, so appends start on a fresh line.
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+        if os.path.exists(path):
+            with open(path, 'rb+') as f:
+                data = f.read()
+                complete = data.rfind(b'\n') + 1
+                if complete < len(data):
+                    logging.warning(f"Dropping a truncated last line in {path}")
+                    f.truncate(complete)
+            for line in data[:complete].decode().splitlines():
+                if line.strip():
+                    self.records.append(json.loads(line))
+
+    def keys(self):
+        return {tuple(record[field] for field in RECORD_KEY) for record in self.records}
+
+    def append(self, records):
+        with open(self.path, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.records.extend(records)
+
+
+# Run the walk-forward over a bars x tickers frame of daily closes and return
+# one row per fit (including any loaded from `checkpoint`, a path or None)
+def run_walkforward(closes, forecaster=None, history_days=60, periods=30, step=21, workers=None,
+                    checkpoint=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    forecaster = forecaster or DEFAULT_FORECASTER
+    checkpoint = Checkpoint(checkpoint) if isinstance(checkpoint, str) else checkpoint
+    done = checkpoint.keys() if checkpoint is not None else set()
+    jobs = make_jobs(closes, forecaster, history_days, periods, step, done)
+    records = list(checkpoint.records) if checkpoint is not None else []
+    logging.info(f"{len(jobs)} fits to run ({len(done)} already in the checkpoint)")
+
+    chunks = [(forecaster, jobs[i:i + chunk_size]) for i in range(0, len(jobs), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, max(len(chunks), 1))
+    started = time.perf_counter()
+    finished = 0
+
+    def collect(chunk_records):
+        nonlocal finished
+        if checkpoint is not None:
+            checkpoint.append(chunk_records)
+        else:
+            records.extend(chunk_records)
+        finished += len(chunk_records)
+        elapsed = time.perf_counter() - started
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        eta = (len(jobs) - finished) / rate if rate else float('nan')
+        logging.info(f"{finished}/{len(jobs)} fits, {rate:.1f} fits/s, about {eta:.0f}s left")
+
+    if workers <= 1:
+        for chunk in chunks:
+            collect(_fit_chunk(chunk))
+    else:
+        # Keep a bounded number of chunks in flight so an interruption
+        # cancels queued work instead of waiting for it
+        with ProcessPoolExecutor(max_workers=workers, initializer=_quiet_prophet) as pool:
+            pending = set()
+            queued = iter(chunks)
+            try:
+                for chunk in queued:
+                    pending.add(pool.submit(_fit_chunk, chunk))
+                    if len(pending) >= 2 * workers:
+                        completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in completed:
+                            collect(future.result())
+                for future in list(pending):
+                    collect(future.result())
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    if checkpoint is not None:
+        records = checkpoint.records
+    table = pd.DataFrame(records, columns=list(RECORD_KEY) + [
+        'last_close', 'buy', 'sell', 'buy_hit', 'sell_hit', 'buy_days', 'sell_days', 'end_close', 'in_band', 'error'])
+    # Only this run's settings, when a checkpoint mixes several
+    return table[(table['forecaster'] == forecaster) & (table['history_days'] == history_days)
+                 & (table['periods'] == periods)].reset_index(drop=True)
+
+
+# Hit rates per ticker plus an 'ALL' row: how often the price reached the
+# suggested buy level, the sell level, either and both within the horizon,
+# how often the horizon close ended inside the band, the median days to each
+# hit and the mean band width as a % of the last close
+def summarize(table):
+    fits = table[table['error'].isna()].copy()
+    if fits.empty:
+        return pd.DataFrame()
+    fits['either'] = fits['buy_hit'] | fits['sell_hit']
+    fits['both'] = fits['buy_hit'] & fits['sell_hit']
+    fits['width'] = 100.0 * (fits['sell'] - fits['buy']) / fits['last_close']
+    fits['buy_days'] = pd.to_numeric(fits['buy_days'])
+    fits['sell_days'] = pd.to_numeric(fits['sell_days'])
+
+    def rates(group):
+        return pd.Series({
+            'Fits': len(group),
+            'Buy Hit %': 100.0 * group['buy_hit'].mean(),
+            'Sell Hit %': 100.0 * group['sell_hit'].mean(),
+            'Either %': 100.0 * group['either'].mean(),
+            'Both %': 100.0 * group['both'].mean(),
+            'In Band %': 100.0 * group['in_band'].mean(),
+            'Days to Buy': group['buy_days'].median(),
+            'Days to Sell': group['sell_days'].median(),
+            'Band Width %': group['width'].mean(),
+        })
+
+    per_ticker = pd.DataFrame({ticker: rates(group) for ticker, group in fits.groupby('ticker')}).T
+    per_ticker.loc['ALL'] = rates(fits)
+    per_ticker['Fits'] = per_ticker['Fits'].astype(int)
+    return per_ticker.rename_axis('Ticker').reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward evaluation of the forecast-based suggested prices.")
+    parser.add_argument('tickers', nargs='*', help="Tickers to evaluate")
+    parser.add_argument('--file', help="File with one ticker per line")
+    parser.add_argument('--years', type=float, default=5, help="Years of history (default: 5)")
+    parser.add_argument('--store', action='store_true', help="Read prices through the local price store")
+    parser.add_argument('--synthetic', type=int, help="Evaluate this many synthetic GBM tickers instead")
+    parser.add_argument('--bars', type=int, default=1260, help="Bars per synthetic ticker (default: 1260)")
+    parser.add_argument('--forecaster', default=None, help=f"Forecaster backend (default: {DEFAULT_FORECASTER})")
+    parser.add_argument('--history-days', type=int, default=60, help="Calendar days per fit window (default: 60)")
+    parser.add_argument('--periods', type=int, default=30, help="Forecast horizon in days (default: 30)")
+    parser.add_argument('--step', type=int, default=21, help="Bars between fit origins (default: 21)")
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Fits per pool task")
+    parser.add_argument('--checkpoint', help="JSON-lines file of finished fits; resumes from it when it exists")
+    parser.add_argument('--out', help="Write every fit to this CSV file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    _quiet_prophet()
+    if args.synthetic:
+        from synthetic import gbm_closes
+        closes = gbm_closes(args.bars, args.synthetic)
+    else:
+        from screener import load_closes, read_ticker_file
+        tickers = list(args.tickers)
+        if args.file:
+            tickers += read_ticker_file(args.file)
+        if not tickers:
+            parser.error("no tickers given")
+        store = None
+        if args.store:
+            from price_store import default_store
+            store = default_store()
+        closes = load_closes([ticker.upper() for ticker in tickers], days=int(args.years * 365), store=store)
+
+    started = time.perf_counter()
+    try:
+        table = run_walkforward(closes, args.forecaster, args.history_days, args.periods, args.step,
+                                args.workers, args.checkpoint, args.chunk_size)
+    except KeyboardInterrupt:
+        if args.checkpoint:
+            print(f"\nInterrupted; finished fits are in {args.checkpoint}, re-run to resume.")
+        return 1
+    elapsed = time.perf_counter() - started
+
+    if args.out:
+        table.to_csv(args.out, index=False)
+    print(summarize(table).to_string(index=False, float_format=lambda x: f"{x:.1f}"))
+    print(f"\n{len(table)} fits ({int(table['error'].notna().sum())} failed) over {closes.shape[1]} tickers "
+          f"in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,53 @@
-import yfinance as yf
-import pandas as pd
-import numpy as np
 import plotly.graph_objs as go
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from dash import Dash, dcc, html
 from dash.dependencies import Input, Output, State
-import socket
+from flask import jsonify
 import os
 import traceback
 import logging
 
+from figures import price_figure_dict
+from health import default_monitor, health_collector, register_health_routes
+from metrics import cache_collector, instrumented, register_metrics_routes, registry, stage
+from price_store import default_store
+from result_cache import ResultCache
+from signals import crossover_indices
+from timeframes import TIMEFRAMES, TimeframeCache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# Data-provider reachability, probed in the background
+health = default_monitor()
+
+# Local OHLCV store; only bars missing from disk are downloaded, and nothing
+# is fetched while the provider is down
+store = default_store(health=health)
+
+# Resampled bars and EMAs per (ticker, timeframe), extended as bars arrive, so
+# switching timeframe reads a cached aggregate instead of resampling
+timeframes = TimeframeCache(store)
+TIMEFRAME_OPTIONS = [
+    {'label': 'Daily', 'value': '1d'},
+    {'label': 'Weekly', 'value': '1wk'},
+    {'label': 'Monthly', 'value': '1mo'},
+    {'label': 'Hourly', 'value': '1h'},
+    {'label': '15 min', 'value': '15m'},
+]
+DEFAULT_TIMEFRAME = '1d'
+
+# Chart windows, in days back from today; 'max' asks for everything from
+# MAX_HISTORY_START. Reads are a binary search into the store's memory map, so
+# a 5y or max window over backfilled history (see backfill.py) costs about
+# the same to read as the default 60 days.
+WINDOWS = {'60d': 60, '1y': 365, '5y': 5 * 365 + 1, 'max': None}
+DEFAULT_WINDOW = '60d'
+MAX_HISTORY_START = date(1970, 1, 1)
+
+# Computed charts keyed by (ticker, timeframe, window, last bar), shared by all users
+results = ResultCache(ttl=float(os.environ.get('RESULT_CACHE_TTL', 60)))
+
 # Initialize the Dash app
 app = Dash(__name__)
 
@@ -20,134 +55,127 @@ app = Dash(__name__)
 app.layout = html.Div([
     html.H1("Stock Prices with 5, 13, and 8-day EMAs and Buy/Sell Signals"),
     dcc.Input(id='ticker-input', type='text', value='SOL-USD', style={'marginRight': '10px'}),
+    dcc.Dropdown(id='timeframe-input', options=TIMEFRAME_OPTIONS, value=DEFAULT_TIMEFRAME, clearable=False,
+                 style={'width': '120px', 'display': 'inline-block', 'verticalAlign': 'middle', 'marginRight': '10px'}),
+    dcc.Dropdown(id='window-input', options=list(WINDOWS), value=DEFAULT_WINDOW, clearable=False,
+                 style={'width': '100px', 'display': 'inline-block', 'verticalAlign': 'middle', 'marginRight': '10px'}),
     html.Button(id='submit-button', n_clicks=0, children='Submit'),
     dcc.Graph(id='price-graph'),
     html.Div(id='current-price', style={'marginTop': '20px'}),
 ])
 
-# Test internet connection
-def test_internet():
-    try:
-        socket.create_connection(("www.google.com", 80), timeout=5)
-        logging.info("Internet connection: OK")
-        return True
-    except OSError:
-        logging.info("Internet connection: FAILED")
-        return False
+# Build the chart from a series.PriceSeries of closes and EMAs (as served by
+# the timeframe cache)
+def build_chart(ticker, series):
+    # Debug dumps are only rendered when debug logging is on
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug(f"Last bars for {ticker}:\n{series.tail()}")
+
+    # Find the 5/13 crossovers
+    with stage('update_graph', 'signals'):
+        signals = crossover_indices(series['EMA_5'], series['EMA_13'])
+
+    # Create the figure as a plain dict: one trace per line and per signal
+    # type, WebGL and LTTB downsampling for long histories, and every series
+    # sent as a binary typed array
+    with stage('update_graph', 'figure'):
+        fig = price_figure_dict(series, ticker, signals=signals)
+
+    # Current price
+    current_price = float(series['Close'][-1])
+
+    return fig, f"Current Price: {current_price:.2f}"
+
+# Start date of a chart window ending at `end_date`
+def window_start(window, end_date):
+    days = WINDOWS[window]
+    return MAX_HISTORY_START if days is None else end_date - timedelta(days=days)
+
+# Identical requests for the same timeframe, window and last bar share one
+# computation. The last bucket of a weekly or monthly chart keeps its date as
+# new daily bars arrive, so its close is part of the key.
+def cached_chart(ticker, series, window=DEFAULT_WINDOW, ttl=None):
+    key = (ticker.upper(), series.interval, window, series.last_date().isoformat(), float(series['Close'][-1]))
+    return results.get_or_compute(key, lambda: build_chart(ticker, series), ttl=ttl)
+
+# Build charts for `tickers` from stored bars only (nothing is fetched). Run
+# by wsgi.py in the master process of a pre-fork server, so every worker
+# starts with these charts in its result cache. They are kept there until
+# evicted rather than expiring after RESULT_CACHE_TTL; a new bar changes the
+# key, so they are only served while they still end on the latest bar.
+def preload(tickers, window=DEFAULT_WINDOW, timeframe=DEFAULT_TIMEFRAME):
+    end_date = datetime.now().date()
+    start_date = window_start(window, end_date)
+    for ticker in tickers:
+        series = timeframes.series(ticker, timeframe, start_date, end_date)
+        if not series.empty:
+            cached_chart(ticker, series, window, ttl=float('inf'))
 
 # Callback to update the graph
 @app.callback(
     [Output('price-graph', 'figure'),
      Output('current-price', 'children')],
     [Input('submit-button', 'n_clicks')],
-    [State('ticker-input', 'value')]
+    [State('ticker-input', 'value'),
+     State('window-input', 'value'),
+     State('timeframe-input', 'value')]
 )
-def update_graph(n_clicks, ticker):
+@instrumented('update_graph')
+def update_graph(n_clicks, ticker, window=DEFAULT_WINDOW, timeframe=DEFAULT_TIMEFRAME):
     try:
-        # Calculate the date range for the last 60 days
+        # Calculate the date range for the selected window
+        window = window if window in WINDOWS else DEFAULT_WINDOW
+        timeframe = timeframe if timeframe in TIMEFRAMES else DEFAULT_TIMEFRAME
         end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=60)
-
-        # Download the data for the last 60 days (daily intervals)
-        logging.info(f"Fetching data for {ticker}...")
-        data = yf.download(ticker, start=start_date, end=end_date, interval='1d')
-
-        # Debugging information
-        logging.info(f"Data columns for {ticker}: {data.columns}")
-        logging.info(f"First few rows of data for {ticker}:")
-        logging.info(data.head())
-        logging.info(f"Full data for {ticker}:")
-        logging.info(data)
-
-        if data.empty:
+        start_date = window_start(window, end_date)
+
+        # Top up the daily bars for the window, fetching only bars missing
+        # from the store; intraday timeframes use stored bars as they are
+        daily = TIMEFRAMES[timeframe][1] == ('1d',)
+        if daily:
+            logging.info(f"Fetching data for {ticker}...")
+            with stage('update_graph', 'fetch'):
+                store.refresh(ticker, start_date, end_date, interval='1d')
+
+        # Bars and EMAs for the timeframe, from the timeframe cache
+        with stage('update_graph', 'resample'):
+            series = timeframes.series(ticker, timeframe, start_date, end_date)
+        logging.debug("Fetched %r", series)
+
+        if series.empty:
             logging.info("No data retrieved.")
+            if not daily:
+                return go.Figure(), "No stored intraday bars for the selected ticker; import some with backfill.py."
+            if not health.is_up():
+                return go.Figure(), "Data provider unreachable and no stored prices for the selected ticker."
             return go.Figure(), "No valid data available for the selected ticker."
 
-        # Reset index and rename columns to ensure single-level index
-        data = data.reset_index()
-        data.columns = [col[0] if isinstance(col, tuple) else col for col in data.columns]
-
-        if 'Close' not in data.columns:
-            logging.info("No 'Close' column in data.")
-            return go.Figure(), "No 'Close' column available for the selected ticker."
-
-        # Set the index back to Date
-        data.set_index('Date', inplace=True)
-
-        # Drop NaNs
-        data = data.dropna(subset=['Close'])
-        if data.empty:
-            logging.info("No valid data remaining after dropping NaN values.")
-            return go.Figure(), "No valid data available for the selected ticker."
-
-        # Compute EMAs
-        data['EMA_5'] = data['Close'].ewm(span=5, adjust=False).mean()
-        data['EMA_13'] = data['Close'].ewm(span=13, adjust=False).mean()
-        data['EMA_8'] = data['Close'].ewm(span=8, adjust=False).mean()
-
-        # Debug prints
-        logging.info("Close prices:")
-        logging.info(data['Close'].tail())
-        logging.info("EMA_5:")
-        logging.info(data['EMA_5'].tail())
-
-        # Generate buy/sell signals
-        buy_signals = []
-        sell_signals = []
-
-        for i in range(1, len(data)):
-            if data['EMA_5'].iloc[i] > data['EMA_13'].iloc[i] and data['EMA_5'].iloc[i-1] <= data['EMA_13'].iloc[i-1]:
-                buy_signals.append((data.index[i], data['Close'].iloc[i]))
-            elif data['EMA_5'].iloc[i] < data['EMA_13'].iloc[i] and data['EMA_5'].iloc[i-1] >= data['EMA_13'].iloc[i-1]:
-                sell_signals.append((data.index[i], data['Close'].iloc[i]))
-
-        # Create figure
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=data.index, y=data['Close'], mode='lines', name='Close'))
-        fig.add_trace(go.Scatter(x=data.index, y=data['EMA_5'], mode='lines', name='EMA 5'))
-        fig.add_trace(go.Scatter(x=data.index, y=data['EMA_13'], mode='lines', name='EMA 13'))
-        fig.add_trace(go.Scatter(x=data.index, y=data['EMA_8'], mode='lines', name='EMA 8'))
-
-        # Add buy signals
-        for signal in buy_signals:
-            fig.add_trace(go.Scatter(
-                x=[signal[0]], y=[signal[1]], mode='markers+text', name='Buy Signal',
-                marker=dict(symbol='triangle-up', size=15, color='green'),
-                text=[f'Buy: {signal[1]:.2f}'], textposition='top center'
-            ))
-
-        # Add sell signals
-        for signal in sell_signals:
-            fig.add_trace(go.Scatter(
-                x=[signal[0]], y=[signal[1]], mode='markers+text', name='Sell Signal',
-                marker=dict(symbol='triangle-down', size=15, color='red'),
-                text=[f'Sell: {signal[1]:.2f}'], textposition='bottom center'
-            ))
-
-        # Update layout
-        fig.update_layout(
-            title=f"{ticker.upper()} Prices with 5, 13, and 8-day EMAs and Buy/Sell Signals",
-            xaxis_title="Date",
-            yaxis_title="Price",
-            template="plotly_white"
-        )
-
-        # Current price
-        current_price = data['Close'].iloc[-1]
-
-        # Ensure current_price is a single float value
-        if isinstance(current_price, pd.Series):
-            current_price = current_price.iloc[-1]
-
-        return fig, f"Current Price: {current_price:.2f}"
+        fig, current_price_message = cached_chart(ticker, series, window)
+        if not health.is_up():
+            current_price_message += " (data provider unreachable, showing stored prices)"
+        return fig, current_price_message
 
     except Exception as e:
         logging.error(f"Error occurred: {e}")
         return go.Figure(), f"Error: {str(e)}"
 
+# Result cache counters, for sizing the cache
+@app.server.route('/cache-stats')
+def cache_stats():
+    shared = store.shared.stats() if store.shared is not None else None
+    return jsonify({**results.stats(), 'timeframes': timeframes.stats(), 'shared': shared})
+
+# Stage timings and cache counters on /metrics (Prometheus text format)
+registry.add_collector(cache_collector(results))
+registry.add_collector(health_collector(health))
+register_metrics_routes(app.server)
+
+# Provider reachability on /healthz
+register_health_routes(app.server, health)
+
 # Run the app
 if __name__ == '__main__':
     logging.info("Starting Dash app...")
     port = int(os.environ.get("PORT", 8080))
-    app.run_server(debug=False, host='0.0.0.0', port=port)
+    app.run(debug=False, host='0.0.0.0', port=port)
 
@@ -1,13 +1,36 @@
-import pandas as pd
-from prophet import Prophet
 import logging
 import os
 import plotly.graph_objects as go
-import yfinance as yf
 from dash import Dash, dcc, html
 from dash.dependencies import Input, Output, State
+from flask import jsonify
 from datetime import datetime, timedelta
 
+from figures import price_figure_dict
+from health import default_monitor, health_collector, register_health_routes
+from forecast import ForecastWorker, forecast_key, predict_future_prices
+from metrics import cache_collector, instrumented, register_metrics_routes, registry, stage
+from price_store import default_store
+from result_cache import ResultCache
+from signals import crossover_indices, ema_values
+
+# Data-provider reachability, probed in the background
+health = default_monitor()
+
+# Local OHLCV store; only bars missing from disk are downloaded, and nothing
+# is fetched while the provider is down
+store = default_store(health=health)
+
+# Prophet fits run here, off the request path; suggestions are LRU-cached,
+# and shared between server processes through the store's shared cache
+forecasts = ForecastWorker(predict_future_prices, shared=store.shared)
+
+# Days of daily closes charted and fitted
+CHART_DAYS = 60
+
+# Computed charts keyed by (ticker, interval, last bar), shared by all users
+results = ResultCache(ttl=float(os.environ.get('RESULT_CACHE_TTL', 60)))
+
 # Initialize the Dash app
 app = Dash(__name__)
 
@@ -17,151 +40,154 @@ app.layout = html.Div([
     html.Button(id='submit-button', n_clicks=0, children='Submit'),
     dcc.Graph(id='price-graph'),
     html.Div(id='current-price'),
-    html.Div(id='suggested-prices')
+    html.Div(id='suggested-prices'),
+    dcc.Store(id='forecast-key'),
+    dcc.Interval(id='forecast-poll', interval=2000, disabled=True)
 ])
 
-def check_internet_connection():
-    try:
-        # Check internet connection
-        return True
-    except OSError:
-        logging.info("Internet connection: FAILED")
-        return False
+# Compute the EMAs and build the chart from a series.PriceSeries of closes
+def build_chart(ticker, series):
+    # Calculate EMAs
+    with stage('update_graph', 'ema'):
+        close = series['Close']
+        series['EMA_5'] = ema_values(close, 5)
+        series['EMA_13'] = ema_values(close, 13)
+        series['EMA_8'] = ema_values(close, 8)
+
+    # Find the 5/13 crossovers
+    with stage('update_graph', 'signals'):
+        signals = crossover_indices(series['EMA_5'], series['EMA_13'])
+
+    # Create the figure as a plain dict: one trace per line and per signal
+    # type, WebGL and LTTB downsampling for long histories, and every series
+    # sent as a binary typed array
+    with stage('update_graph', 'figure'):
+        fig = price_figure_dict(series, ticker, signals=signals)
+
+    # Current price
+    current_price = float(series['Close'][-1])
+
+    return fig, f"Current Price: {current_price:.2f}"
+
+# Identical requests for the same last bar share one chart computation
+def cached_chart(ticker, series, ttl=None):
+    key = (ticker.upper(), '1d', series.last_date().isoformat())
+    return results.get_or_compute(key, lambda: build_chart(ticker, series), ttl=ttl)
+
+# Build charts for `tickers` from stored bars only (nothing is fetched, no
+# forecasts are queued). Run by wsgi.py in the master process of a pre-fork
+# server, so every worker starts with these charts in its result cache. They
+# are kept there until evicted rather than expiring after RESULT_CACHE_TTL; a
+# new bar changes the key, so they are only served while they still end on
+# the latest bar.
+def preload(tickers, days=CHART_DAYS):
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days)
+    for ticker in tickers:
+        series = store.read_series(ticker, '1d', start_date, end_date)
+        if not series.empty:
+            cached_chart(ticker, series, ttl=float('inf'))
 
 # Callback to update the graph
 @app.callback(
     [Output('price-graph', 'figure'),
      Output('current-price', 'children'),
-     Output('suggested-prices', 'children')],
+     Output('forecast-key', 'data')],
     [Input('submit-button', 'n_clicks')],
     [State('ticker-input', 'value')]
 )
+@instrumented('update_graph')
 def update_graph(n_clicks, ticker):
     try:
         # Calculate the date range for the last 60 days
         end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=60)
+        start_date = end_date - timedelta(days=CHART_DAYS)
 
-        # Download the data for the last 60 days (daily intervals)
+        # Read the closes for the last 60 days (daily intervals), fetching
+        # only bars missing from the store
         logging.info(f"Fetching data for {ticker}...")
-        data = yf.download(ticker, start=start_date, end=end_date, interval='1d')
-
-        # Debugging information
-        logging.info(f"Data columns for {ticker}: {data.columns}")
-        logging.info(f"First few rows of data for {ticker}:")
-        logging.info(data.head())
-        logging.info(f"Full data for {ticker}:")
-        logging.info(data)
+        with stage('update_graph', 'fetch'):
+            series = store.get_series(ticker, start_date, end_date, interval='1d')
+        logging.debug("Fetched %r", series)
 
-        if data.empty:
+        if series.empty:
             logging.info("No data retrieved.")
+            if not health.is_up():
+                return go.Figure(), "Data provider unreachable and no stored prices for the selected ticker.", ""
             return go.Figure(), "No valid data available for the selected ticker.", ""
 
-        # Reset index and rename columns to ensure single-level index
-        data = data.reset_index()
-        data.columns = [col[0] if isinstance(col, tuple) else col for col in data.columns]
+        fig, current_price_message = cached_chart(ticker, series)
+        if not health.is_up():
+            current_price_message += " (data provider unreachable, showing stored prices)"
 
-        if 'Close' not in data.columns:
-            return go.Figure(), "No valid data available for the selected ticker.", ""
+        # Queue the forecast; the suggestions callback picks it up when ready
+        key = forecast_key(ticker, series)
+        forecasts.get_or_submit(key, series)
 
-        # Calculate EMAs
-        data['EMA_5'] = data['Close'].ewm(span=5, adjust=False).mean()
-        data['EMA_13'] = data['Close'].ewm(span=13, adjust=False).mean()
-        data['EMA_8'] = data['Close'].ewm(span=8, adjust=False).mean()
-
-        # Identify buy/sell signals
-        buy_signals = []
-        sell_signals = []
-        for i in range(1, len(data)):
-            if data['EMA_5'].iloc[i] > data['EMA_13'].iloc[i] and data['EMA_5'].iloc[i-1] <= data['EMA_13'].iloc[i-1]:
-                buy_signals.append((data['Date'].iloc[i], data['Close'].iloc[i]))
-            elif data['EMA_5'].iloc[i] < data['EMA_13'].iloc[i] and data['EMA_5'].iloc[i-1] >= data['EMA_13'].iloc[i-1]:
-                sell_signals.append((data['Date'].iloc[i], data['Close'].iloc[i]))
-
-        # Create the figure
-        fig = go.Figure()
-
-        # Add price line
-        fig.add_trace(go.Scatter(x=data['Date'], y=data['Close'], mode='lines', name='Close'))
-
-        # Add EMAs
-        fig.add_trace(go.Scatter(x=data['Date'], y=data['EMA_5'], mode='lines', name='EMA 5'))
-        fig.add_trace(go.Scatter(x=data['Date'], y=data['EMA_13'], mode='lines', name='EMA 13'))
-        fig.add_trace(go.Scatter(x=data['Date'], y=data['EMA_8'], mode='lines', name='EMA 8'))
-
-        # Add buy signals
-        for signal in buy_signals:
-            fig.add_trace(go.Scatter(
-                x=[signal[0]], y=[signal[1]], mode='markers+text', name='Buy Signal',
-                marker=dict(symbol='triangle-up', size=15, color='green'),
-                text=[f'Buy: {signal[1]:.2f}'], textposition='top center'
-            ))
-
-        # Add sell signals
-        for signal in sell_signals:
-            fig.add_trace(go.Scatter(
-                x=[signal[0]], y=[signal[1]], mode='markers+text', name='Sell Signal',
-                marker=dict(symbol='triangle-down', size=15, color='red'),
-                text=[f'Sell: {signal[1]:.2f}'], textposition='bottom center'
-            ))
-
-        # Update layout
-        fig.update_layout(
-            title=f"{ticker.upper()} Prices with 5, 13, and 8-day EMAs and Buy/Sell Signals",
-            xaxis_title="Date",
-            yaxis_title="Price",
-            template="plotly_white"
-        )
-
-        # Current price
-        current_price = data['Close'].iloc[-1]
-
-        # Ensure current_price is a single float value
-        if isinstance(current_price, pd.Series):
-            current_price = current_price.iloc[-1]
-
-        # Predict future prices
-        forecast = predict_future_prices(data)
-
-        # Get suggested buy/sell prices
-        suggested_buy_price, suggested_sell_price = get_suggested_prices(forecast)
-
-        # Suggested prices message
-        suggested_prices_message = (
-            f"If price hits {suggested_buy_price:.2f}, you might want to consider buying. "
-            f"If price hits {suggested_sell_price:.2f}, you might want to consider selling."
-        )
-
-        return fig, f"Current Price: {current_price:.2f}", suggested_prices_message
+        return fig, current_price_message, list(key)
 
     except Exception as e:
         logging.error(f"Error occurred: {e}")
-        return go.Figure(), f"Error: {str(e)}", ""
-
-def predict_future_prices(data, periods=30):
-    # Prepare data for Prophet
-    df = data[['Date', 'Close']].rename(columns={'Date': 'ds', 'Close': 'y'})
-    
-    # Initialize and fit the model
-    model = Prophet()
-    model.fit(df)
-    
-    # Make future predictions
-    future = model.make_future_dataframe(periods=periods)
-    forecast = model.predict(future)
-    
-    return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
-
-def get_suggested_prices(forecast):
-    # Get the last predicted price
-    last_prediction = forecast.iloc[-1]
-    suggested_buy_price = last_prediction['yhat_lower']
-    suggested_sell_price = last_prediction['yhat_upper']
-    
-    return suggested_buy_price, suggested_sell_price
+        return go.Figure(), f"Error: {str(e)}", None
+
+# Result cache counters, for sizing the cache
+@app.server.route('/cache-stats')
+def cache_stats():
+    return jsonify(results.stats())
+
+# Stored closes the forecast under `key` is fitted on: the chart's window,
+# ending at the key's last bar. None if the store no longer matches the key.
+def forecast_series(key):
+    ticker, last_date, periods = key
+    last_date = datetime.fromisoformat(last_date)
+    start_date = datetime.now().date() - timedelta(days=CHART_DAYS)
+    series = store.read_series(ticker, '1d', start_date, last_date + timedelta(days=1))
+    if series.empty or forecast_key(ticker, series, periods) != key:
+        return None
+    return series
+
+# Callback to show suggested prices, polling while the forecast is pending
+@app.callback(
+    [Output('suggested-prices', 'children'),
+     Output('forecast-poll', 'disabled')],
+    [Input('forecast-key', 'data'),
+     Input('forecast-poll', 'n_intervals')]
+)
+def update_suggestions(key, n_intervals):
+    if not key:
+        return "", True
+    key = tuple(key)
+    status, suggestion = forecasts.poll(key)
+    if status == 'missing':
+        # The fit was queued by another server process and has not been
+        # published yet: queue it here too, from the stored bars
+        series = forecast_series(key)
+        if series is not None:
+            status, suggestion = forecasts.get_or_submit(key, series, periods=key[2])
+    if status == 'pending':
+        return "Forecast pending...", False
+    if status != 'ready':
+        return "Forecast unavailable for the selected ticker.", True
+
+    suggested_buy_price, suggested_sell_price = suggestion
+
+    # Suggested prices message
+    suggested_prices_message = (
+        f"If price hits {suggested_buy_price:.2f}, you might want to consider buying. "
+        f"If price hits {suggested_sell_price:.2f}, you might want to consider selling."
+    )
+    return suggested_prices_message, True
+
+# Stage timings and cache counters on /metrics (Prometheus text format)
+registry.add_collector(cache_collector(results))
+registry.add_collector(health_collector(health))
+register_metrics_routes(app.server)
+
+# Provider reachability on /healthz
+register_health_routes(app.server, health)
 
 # Run the app
 if __name__ == '__main__':
     logging.info("Starting Dash app...")
     port = int(os.environ.get("PORT", 8080))
-    app.run_server(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
+    app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,73 @@
+import gc
+import importlib
+import logging
+import os
+import time
+
+# App factory for serving the Dash apps from a pre-fork WSGI server:
+#
+#     gunicorn --preload --workers 4 --bind 0.0.0.0:8080 'wsgi:create_app()'
+#     gunicorn --preload --workers 4 --bind 0.0.0.0:8080 'wsgi:create_app("suggestions")'
+#
+# With --preload the master process imports the app and warms it once before
+# forking, so the workers share the loaded modules, the warmed Dash/plotly
+# state and any preloaded charts copy-on-write instead of each building its
+# own. EMA_PRELOAD_TICKERS (comma separated) names tickers whose charts are
+# built from the local price store during warm-up.
+#
+# The workers also share a host-wide shared_cache.SharedArrayCache (in
+# /dev/shm unless EMA_SHARED_CACHE_DIR says otherwise): one worker fetches a
+# ticker's missing bars while the others wait and read them, and resampled
+# bars and EMAs are computed once and memory-mapped by every worker.
+
+APPS = {
+    'chart': 'working_version',
+    'suggestions': 'working_version_with_suggestions',
+    'live': '5_13_8_ema_strategy_real_time_dash_app',
+    'dummy': 'testing_dummy_data',
+}
+
+DEFAULT_APP = os.environ.get('EMA_APP', 'chart')
+
+
+def preload_tickers():
+    return [ticker.strip() for ticker in os.environ.get('EMA_PRELOAD_TICKERS', '').split(',') if ticker.strip()]
+
+
+# Exercise the lazily initialised parts of Dash and plotly once: Dash sets up
+# its routes and serializes the layout on the first requests, and plotly loads
+# its trace validators and templates the first time a figure is built
+def warm_up(module):
+    client = module.app.server.test_client()
+    for path in ('/', '/_dash-layout', '/_dash-dependencies'):
+        client.get(path)
+
+    from figures import price_figure_dict
+    from synthetic import gbm_ohlcv
+    data = gbm_ohlcv(60)
+    for span in (5, 13, 8):
+        data[f'EMA_{span}'] = data['Close'].ewm(span=span, adjust=False).mean()
+    price_figure_dict(data, 'SYN')
+
+    preload = getattr(module, 'preload', None)
+    tickers = preload_tickers()
+    if preload is not None and tickers:
+        preload(tickers)
+
+
+# Import, warm and return the Flask server of one of the APPS. Background
+# threads (health probes, forecast workers) start on first use, so none are
+# running in the master when gunicorn forks.
+def create_app(name=DEFAULT_APP):
+    from shared_cache import DEFAULT_SHARED_DIR
+    os.environ.setdefault('EMA_SHARED_CACHE_DIR', DEFAULT_SHARED_DIR)
+    started = time.perf_counter()
+    module = importlib.import_module(APPS.get(name, name))
+    imported = time.perf_counter()
+    warm_up(module)
+    # Move everything loaded so far out of the collector's generations, so
+    # collections in the workers do not write to (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+    logging.info(f"Loaded {name} in {imported - started:.2f}s, warmed up in {time.perf_counter() - imported:.2f}s")
+    return module.app.server